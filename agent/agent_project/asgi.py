@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agent_project.settings')
 
 application = get_asgi_application()
+
+# Build the agents before the first request, see api.apps.warm_up
+from api.apps import warm_up  # noqa: E402
+
+warm_up()
@@ -10,11 +10,28 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import atexit
+import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent.parent / 'agno2' / '.env')
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Test runs keep their agent sessions in a throwaway database instead of
+# tmp/sessions.db; set before the api app imports agno2.agent
+if sys.argv[1:2] == ['test']:
+    _test_tmp = tempfile.mkdtemp(prefix='agent-test-')
+    atexit.register(shutil.rmtree, _test_tmp, ignore_errors=True)
+    os.environ['SESSION_DB'] = os.path.join(_test_tmp, 'sessions.db')
+    os.environ.pop('SESSION_STORAGE', None)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -51,6 +68,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in gzip of the responses for clients sending Accept-Encoding: gzip (the mobile app's fetch does)
+if os.getenv('PAYLOAD_GZIP') == '1':
+    MIDDLEWARE.insert(0, 'django.middleware.gzip.GZipMiddleware')
+
 ROOT_URLCONF = 'agent_project.urls'
 
 TEMPLATES = [
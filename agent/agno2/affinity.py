@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from agno.storage.base import Storage
+from agno.storage.session.agent import AgentSession
+from dotenv import load_dotenv
+
+from .sessions import detached, session_version
+
+load_dotenv()
+
+
+def shard_for(session_id, shards):
+    """Map a session to one of ``shards`` workers; stable across processes and restarts."""
+    digest = hashlib.blake2b(session_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+class SessionCache(Storage):
+    """
+    LRU of hot sessions in front of the persistent session storage.
+
+    Back-to-back turns of a conversation read the session they wrote a moment
+    ago; here it is served from process memory instead of being loaded and
+    deserialized again. Sessions are assigned to ``shards`` workers with
+    :func:`shard_for` and a worker only caches the sessions of its own
+    ``shard``, which the load balancer routes to it. Other sessions go
+    straight to ``storage``.
+
+    With ``validate`` (and a storage that has ``version``), a hit is checked
+    against the stored session's version, a single-row lookup, so a turn
+    another worker handled is never served stale. Disable it only when the
+    routing guarantees affinity.
+    """
+
+    def __init__(self, storage, max_sessions=1024, shard=0, shards=1, validate=True):
+        super().__init__(mode="agent")
+        self.storage = storage
+        self.max_sessions = max_sessions
+        self.shard = shard
+        self.shards = shards
+        self.validate = validate and hasattr(storage, "version")
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Storage specific extras (flush, version, ...) are the wrapped storage's
+        if name == "storage":
+            raise AttributeError(name)
+        return getattr(self.storage, name)
+
+    def owns(self, session_id):
+        return self.shards <= 1 or shard_for(session_id, self.shards) == self.shard
+
+    def _put(self, session, version):
+        with self._lock:
+            self._entries[session.session_id] = (session, version)
+            self._entries.move_to_end(session.session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def read(self, session_id: str, user_id: Optional[str] = None) -> Optional[AgentSession]:
+        if not self.owns(session_id):
+            self._count("bypassed")
+            return self.storage.read(session_id, user_id=user_id)
+
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+        if entry is not None:
+            session, version = entry
+            if not self.validate or self.storage.version(session_id) == version:
+                self._count("hits")
+                if user_id is not None and session.user_id != user_id:
+                    return None
+                return detached(session)
+            self._count("stale")
+        else:
+            self._count("misses")
+
+        session = self.storage.read(session_id)
+        if session is not None:
+            self._put(session, session_version(session))
+            if user_id is not None and session.user_id != user_id:
+                return None
+            return detached(session)
+        return None
+
+    def upsert(self, session: AgentSession) -> Optional[AgentSession]:
+        result = self.storage.upsert(session)
+        if self.owns(session.session_id):
+            self._put(session, session_version(session))
+        return result
+
+    def evict(self, session_id=None):
+        """Drop one session, or every session, from the cache."""
+        with self._lock:
+            if session_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(session_id, None)
+
+    def delete_session(self, session_id: Optional[str] = None):
+        self.evict(session_id)
+        self.storage.delete_session(session_id)
+
+    def create(self) -> None:
+        self.storage.create()
+
+    def drop(self) -> None:
+        self.evict()
+        self.storage.drop()
+
+    def upgrade_schema(self) -> None:
+        self.storage.upgrade_schema()
+
+    def get_all_sessions(self, user_id: Optional[str] = None, agent_id: Optional[str] = None) -> List[AgentSession]:
+        return self.storage.get_all_sessions(user_id=user_id, agent_id=agent_id)
+
+    def get_all_session_ids(self, user_id: Optional[str] = None, agent_id: Optional[str] = None) -> List[str]:
+        return self.storage.get_all_session_ids(user_id=user_id, agent_id=agent_id)
+
+    def compact(self, **kwargs):
+        summary = self.storage.compact(**kwargs)
+        self.evict()
+        return summary
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_sessions": self.max_sessions,
+                "shard": self.shard,
+                "shards": self.shards,
+            }
+
+
+def with_session_cache(storage):
+    """
+    Put a :class:`SessionCache` in front of ``storage`` as configured in the environment.
+
+    SESSION_CACHE_SIZE hot sessions are kept (0 disables the cache). With
+    SESSION_SHARDS workers, SESSION_SHARD is this worker's index; set
+    SESSION_CACHE_VALIDATE=0 only when the load balancer pins every session
+    to its shard.
+    """
+    max_sessions = int(os.getenv("SESSION_CACHE_SIZE", "1024"))
+    if max_sessions <= 0:
+        return storage
+    return SessionCache(
+        storage,
+        max_sessions=max_sessions,
+        shard=int(os.getenv("SESSION_SHARD", "0")),
+        shards=int(os.getenv("SESSION_SHARDS", "1")),
+        validate=os.getenv("SESSION_CACHE_VALIDATE", "1") != "0",
+    )
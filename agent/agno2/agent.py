@@ -2,7 +2,6 @@ from langtrace_python_sdk import langtrace  # Must precede other imports
 
 from dotenv import load_dotenv
 from agno.agent import Agent
-from agno.models.aws import AwsBedrock
 from .tools import (
     get_outstanding_invoices,
     get_user_information,
@@ -13,14 +12,25 @@ from .tools import (
     get_available_packages,
     activate_package,
 )
-from agno.storage.agent.sqlite import SqliteAgentStorage
 from textwrap import dedent
-from agno.models.openai import OpenAIChat
+from .models import chat_model
+from .descriptors import ScreenDescriptor
+from .components import SinglePassScreen
+from .knowledge import KNOWLEDGE_DIR, knowledge_vector_db
+from .router import process_router
+from .memo import memo_scope
+from .projections import tool_view
+from .sessions import create_session_storage
+from .metrics import metrics, span
+from .affinity import with_session_cache
+from .history import CompactMemory, compact_history, history_token_budget, remember_facts
+from agno.run.response import RunResponse
 from agno.knowledge.text import TextKnowledgeBase
-from agno.vectordb.pgvector import PgVector
 import readline
 import os
 import atexit
+import asyncio
+from contextlib import contextmanager
 
 load_dotenv()
 
@@ -52,27 +62,43 @@ def start_console_tools():
 # langtrace.init()
 
 knowledge_base = TextKnowledgeBase(
-    path="data/txt_files",
-    # Table name: ai.text_documents
-    vector_db=PgVector(
-        table_name="text_documents",
-        db_url="postgresql+psycopg://ai:ai@localhost:5532/ai",
-    ),
+    path=KNOWLEDGE_DIR,
+    vector_db=knowledge_vector_db(),
 )
 
-# Create a storage backend using the Sqlite database
-storage = SqliteAgentStorage(table_name="agent_sessions", db_file="tmp/data.db")
-
-
-def start_agent(session_id=None):
+# Session storage: append-only SQLite in WAL mode behind an LRU of hot
+# sessions, see agno2/sessions.py and agno2/affinity.py
+storage = with_session_cache(create_session_storage())
+
+# Single-pass mode: the process agent also does the JSX agent's job
+SINGLE_PASS_INSTRUCTIONS = dedent("""
+    Screen:
+    6. Build the screen showing your reply in screen, using only View, Text, Button, Image, TextInput and TouchableOpacity.
+    7. Always include your reply text in the screen.
+    8. Fields inside necessary_fields are TextInput, with a name prop and onChangeText "storeData".
+    9. Default actions are Buttons with onPress "handleSubmit".
+""")
+
+
+def start_agent(session_id=None, structured=False, single_pass=False):
+    """
+    Build the process agent.
+
+    With ``structured=True`` the agent answers with a ScreenDescriptor that is
+    rendered locally, instead of text for the JSX agent. With
+    ``single_pass=True`` it answers with a SinglePassScreen, its reply and the
+    component tree in one generation, so the JSX agent is not called. With
+    AGENT_HISTORY=compact the history is capped by HISTORY_TOKEN_BUDGET
+    instead of the last 15 runs, see :class:`CompactMemory`.
+    """
+    compact = compact_history()
 
     agent = Agent(
-        # model=AwsBedrock(id="us.anthropic.claude-3-7-sonnet-20250219-v1:0", temperature=0), 
         session_id=session_id,
-        model=OpenAIChat(id="gpt-4o-mini", temperature=0),
+        model=chat_model("reasoning"),
         description=dedent("""
             You are a helpful assistant.
-            The first tool you need to call is search_knowledge_base.
+            The first tool you need to call is search_knowledge_base, unless the process is already provided inside <process> tags.
             You can only help with questions related to the knowledge base and you can only use the tools provided to you.
             DO NOT reply to anything that is not related to the knowledge base.
             Never explain the process you need to follow to execute the user's request.
@@ -85,9 +111,10 @@ def start_agent(session_id=None):
             3. If the process is found, use the tools to answer the user\'s question.
             4. If there's a default action that is needed from the user add it inside <default_action> tags.
             5. if there are necessary fields that are needed from the user add them inside <necessary_fields> tags.
-        """),
+        """) + (SINGLE_PASS_INSTRUCTIONS if single_pass else ""),
         add_history_to_messages=True,
-        num_history_responses=15,
+        num_history_responses=None if compact else 15,
+        memory=CompactMemory(token_budget=history_token_budget()) if compact else None,
         tools=[
             get_outstanding_invoices,
             get_user_information,
@@ -103,12 +130,87 @@ def start_agent(session_id=None):
         storage=storage,
         knowledge=knowledge_base,
         search_knowledge=True,
+        response_model=SinglePassScreen if single_pass else ScreenDescriptor if structured else None,
+        # Skip the per-run telemetry request to the agno API
+        telemetry=False,
         # debug_mode=True
     )
 
     return agent
 
-# agent.knowledge.load(recreate=True)
+
+def run_agent(agent, message, **kwargs):
+    """
+    Run an agent after routing the message to its knowledge base process.
+
+    The session is read before the run so the router sees the active process
+    and, with a :class:`CompactMemory`, the session facts are refreshed;
+    ``run`` reads it again, which is a single SQLite lookup.
+    """
+    with span("agent.session"):
+        agent.initialize_agent()
+        agent.read_from_storage()
+        process = _prepare_turn(agent, message)
+    # A stream only runs while it is consumed, so it re-enters the turn scope
+    with turn_scope(process):
+        response = agent.run(message, **kwargs)
+    if isinstance(response, RunResponse):
+        return response
+    return _stream_in_turn_scope(response, process)
+
+
+def _prepare_turn(agent, message):
+    process = process_router.route(agent, message)
+    if isinstance(agent.memory, CompactMemory):
+        remember_facts(agent)
+    return process
+
+
+@contextmanager
+def turn_scope(process):
+    """Memoize tool reads and compact tool results for ``process`` for one agent turn."""
+    with memo_scope() as memo, tool_view(process):
+        try:
+            yield
+        finally:
+            metrics.inc("tool_memo_lookups_total", memo.hits, result="hit")
+            metrics.inc("tool_memo_lookups_total", memo.misses, result="miss")
+
+
+def _stream_in_turn_scope(chunks, process):
+    with turn_scope(process):
+        yield from chunks
+
+
+async def arun_agent(agent, message):
+    """
+    Run an agent with ``arun`` without blocking the event loop on storage.
+
+    agno reads and writes the session synchronously inside ``arun``; here the
+    session is loaded and saved in a worker thread and the storage is detached
+    for the duration of the model call. The turn is prepared like in
+    :func:`run_agent`.
+    """
+    storage = agent.storage
+    agent.initialize_agent()
+    if storage is None:
+        process = _prepare_turn(agent, message)
+        with turn_scope(process):
+            return await agent.arun(message)
+
+    with span("agent.session"):
+        await asyncio.to_thread(agent.read_from_storage)
+        process = _prepare_turn(agent, message)
+    agent.storage = None
+    try:
+        with turn_scope(process):
+            response = await agent.arun(message)
+    finally:
+        agent.storage = storage
+    await asyncio.to_thread(agent.write_to_storage)
+    return response
+
+# Index the knowledge base with: ./manage.py sync_knowledge
 
 if __name__ == "__main__":
     start_console_tools()
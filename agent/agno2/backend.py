@@ -0,0 +1,336 @@
+import copy
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+import httpx
+from dotenv import load_dotenv
+
+from .store import SubscriberStore
+
+load_dotenv()
+
+BACKEND_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=10, keepalive_expiry=30)
+
+
+class BackendError(Exception):
+    """Raised when a backend system cannot be reached or rejects a request."""
+
+
+class TelcoBackend(ABC):
+    """
+    Data access for the agent tools: billing, CRM and payment systems.
+
+    Reads go through :meth:`account`, which fetches a subscriber's profile,
+    credit, invoices and payment methods in one round trip and keeps them for
+    ``account_ttl`` seconds, so the several lookups one conversation turn does
+    for the same ``user_id`` cost a single call. Mutations drop the cached
+    account. Subclasses implement the ``fetch_*`` and mutation methods.
+    """
+
+    def __init__(self, account_ttl=5.0):
+        self.account_ttl = account_ttl
+        self._accounts = {}
+        self._accounts_lock = threading.Lock()
+        self.account_fetches = 0
+
+    @abstractmethod
+    def fetch_account(self, user_id):
+        """
+        Return ``{"user", "credit", "invoices", "payment_methods"}`` for a subscriber, or None if unknown.
+        """
+
+    @abstractmethod
+    def fetch_packages(self):
+        """Return the packages a subscriber can activate."""
+
+    @abstractmethod
+    def add_card(self, user_id, card_number, expiration_date):
+        """Store a card and return the new payment method."""
+
+    @abstractmethod
+    def pay_invoice(self, user_id, invoice_id, payment_method_id=None):
+        """Pay an invoice and return ``(invoice, transaction_id)``, or None if the invoice is not outstanding."""
+
+    @abstractmethod
+    def activate_package(self, user_id, package_id):
+        """Make ``package_id`` the subscriber's plan."""
+
+    def account(self, user_id):
+        now = time.monotonic()
+        with self._accounts_lock:
+            cached = self._accounts.get(user_id)
+        if cached is not None and now - cached[0] < self.account_ttl:
+            return cached[1]
+        account = self.fetch_account(user_id)
+        with self._accounts_lock:
+            self.account_fetches += 1
+            self._accounts[user_id] = (now, account)
+        return account
+
+    def invalidate(self, user_id):
+        with self._accounts_lock:
+            self._accounts.pop(user_id, None)
+
+    def is_subscriber(self, user_id):
+        return self.account(user_id) is not None
+
+    def _section(self, user_id, name, default=None):
+        account = self.account(user_id)
+        return default if account is None else account[name]
+
+    def get_user(self, user_id):
+        return self._section(user_id, "user")
+
+    def get_credit(self, user_id):
+        return self._section(user_id, "credit")
+
+    def get_invoices(self, user_id):
+        return self._section(user_id, "invoices", [])
+
+    def get_cards(self, user_id):
+        return self._section(user_id, "payment_methods", [])
+
+    def get_packages(self):
+        return self.fetch_packages()
+
+
+DEMO_USER = {
+    "user_profile": {
+        "customer_id": "CUST123456",
+        "full_name": "John Doe",
+        "email": "john.doe@example.com",
+        "account_status": "active",
+        "registration_date": "2023-01-15T00:00:00Z",
+    },
+    "subscription": {
+        "plan_name": "Premium Plus",
+        "plan_type": "postpaid",
+        "start_date": "2023-01-15T00:00:00Z",
+        "renewal_date": "2024-01-15T00:00:00Z",
+        "auto_renewal": True,
+    },
+    "services": {"voice": True, "data": True, "sms": True, "roaming": True},
+    "billing": {
+        "billing_address": {
+            "street": "123 Main St",
+            "city": "New York",
+            "state": "NY",
+            "zip": "10001",
+            "country": "USA",
+        },
+        "payment_method": "credit_card",
+        "billing_cycle": "monthly",
+    },
+}
+
+DEMO_CREDIT = {
+    "available_credit": 100.00,
+    "last_updated": "2024-03-20T10:30:00Z",
+    "credit_status": "normal",
+    "pending_transactions": 0,
+    "currency": "USD",
+    "voice_balance": 50.00,
+    "data_balance": "2.5GB",
+    "sms_balance": 100,
+    "active_bundles": [
+        {
+            "name": "Premium Data",
+            "remaining": "1.5GB",
+            "expiry": "2024-03-25T23:59:59Z",
+        }
+    ],
+}
+
+DEMO_INVOICES = [
+    {
+        "invoice_id": "INV-2024-0342",
+        "issue_date": "2024-03-01T00:00:00Z",
+        "due_date": "2024-03-15T23:59:59Z",
+        "amount": 89.99,
+        "status": "overdue",
+        "description": "Monthly service charge - March 2024",
+    },
+]
+
+PACKAGES = [
+    {
+        "package_id": "PKG-001",
+        "name": "Premium Plus",
+        "price": 89.99,
+        "currency": "USD",
+        "billing_cycle": "monthly",
+        "data": {"amount": "Unlimited", "high_speed_cap": "50GB", "throttle_speed": "3Mbps"},
+        "voice": {"minutes": "Unlimited", "international": True},
+        "sms": {"messages": "Unlimited", "international": True},
+        "features": ["5G Access", "Mobile Hotspot (30GB)", "HD Streaming", "International Roaming"],
+    },
+    {
+        "package_id": "PKG-002",
+        "name": "Standard",
+        "price": 59.99,
+        "currency": "USD",
+        "billing_cycle": "monthly",
+        "data": {"amount": "25GB", "high_speed_cap": "25GB", "throttle_speed": "2Mbps"},
+        "voice": {"minutes": "Unlimited", "international": False},
+        "sms": {"messages": "Unlimited", "international": False},
+        "features": ["5G Access", "Mobile Hotspot (10GB)", "SD Streaming"],
+    },
+    {
+        "package_id": "PKG-003",
+        "name": "Basic",
+        "price": 39.99,
+        "currency": "USD",
+        "billing_cycle": "monthly",
+        "data": {"amount": "10GB", "high_speed_cap": "10GB", "throttle_speed": "1Mbps"},
+        "voice": {"minutes": 1000, "international": False},
+        "sms": {"messages": 1000, "international": False},
+        "features": ["4G Access", "Mobile Hotspot (5GB)"],
+    },
+]
+
+
+def demo_subscribers():
+    """The numbers listed in DEMO_SUBSCRIBERS (comma separated), or None when it is not set."""
+    numbers = {number.strip() for number in os.getenv("DEMO_SUBSCRIBERS", "").split(",") if number.strip()}
+    return numbers or None
+
+
+class MemoryBackend(TelcoBackend):
+    """
+    In-process stand-in for the backend systems, seeded with the demo data.
+
+    Every "+1" number is a subscriber with the demo profile and, until it is
+    paid, the demo invoice. With ``subscribers`` (by default
+    :func:`demo_subscribers`) only those numbers have an account. Invoices,
+    cards and plans are kept per subscriber in a :class:`SubscriberStore`.
+    """
+
+    def __init__(self, account_ttl=0.0, store=None, subscribers=None):
+        super().__init__(account_ttl=account_ttl)
+        self.store = store if store is not None else SubscriberStore(DEMO_INVOICES)
+        if subscribers is None:
+            subscribers = demo_subscribers()
+        self.subscribers = set(subscribers) if subscribers is not None else None
+
+    def add_subscriber(self, user_id):
+        """Seed an account for ``user_id`` when the accounts are restricted to ``subscribers``."""
+        if self.subscribers is not None:
+            self.subscribers.add(user_id)
+        self.invalidate(user_id)
+
+    def fetch_account(self, user_id):
+        if not (user_id in self.subscribers if self.subscribers is not None else user_id.startswith("+1")):
+            return None
+        user = copy.deepcopy(DEMO_USER)
+        user["user_profile"]["user_id"] = user_id
+        plan = self.store.plan(user_id)
+        if plan is not None:
+            user["subscription"]["plan_name"] = plan
+        return {
+            "user": user,
+            "credit": dict(copy.deepcopy(DEMO_CREDIT), user_id=user_id),
+            "invoices": self.store.invoices(user_id),
+            "payment_methods": self.store.cards(user_id),
+        }
+
+    def fetch_packages(self):
+        return copy.deepcopy(PACKAGES)
+
+    def add_card(self, user_id, card_number, expiration_date):
+        card = self.store.add_card(user_id, card_number, expiration_date)
+        self.invalidate(user_id)
+        return card
+
+    def pay_invoice(self, user_id, invoice_id, payment_method_id=None):
+        invoice = self.store.pay_invoice(user_id, invoice_id)
+        self.invalidate(user_id)
+        if invoice is None:
+            return None
+        return invoice, f"TXN-{uuid.uuid4().hex[:8].upper()}"
+
+    def activate_package(self, user_id, package_id):
+        package = next(package for package in PACKAGES if package["package_id"] == package_id)
+        self.store.set_plan(user_id, package["name"])
+        self.invalidate(user_id)
+
+
+class HttpBackend(TelcoBackend):
+    """
+    Backend systems behind a REST gateway.
+
+    One pooled ``httpx.Client`` is shared by every tool call in the process.
+    Each request gets the backend's ``timeout``, and failures are raised as
+    :class:`BackendError`.
+    """
+
+    def __init__(self, base_url, token=None, timeout=5.0, account_ttl=5.0, transport=None):
+        super().__init__(account_ttl=account_ttl)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.client = httpx.Client(
+            base_url=base_url, headers=headers, limits=BACKEND_LIMITS, timeout=timeout, transport=transport
+        )
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise BackendError(f"{method} {path} failed: {e}") from e
+        if response.status_code == 404:
+            return None
+        if response.is_error:
+            raise BackendError(f"{method} {path} returned {response.status_code}")
+        return response.json() if response.content else {}
+
+    def fetch_account(self, user_id):
+        return self._request("GET", f"/accounts/{user_id}", params={"include": "user,credit,invoices,payment_methods"})
+
+    def fetch_packages(self):
+        return self._request("GET", "/packages")
+
+    def add_card(self, user_id, card_number, expiration_date):
+        card = self._request(
+            "POST",
+            f"/accounts/{user_id}/payment-methods",
+            json={"card_number": card_number, "expiration_date": expiration_date},
+        )
+        self.invalidate(user_id)
+        return card
+
+    def pay_invoice(self, user_id, invoice_id, payment_method_id=None):
+        result = self._request(
+            "POST", f"/accounts/{user_id}/invoices/{invoice_id}/payments", json={"payment_method_id": payment_method_id}
+        )
+        self.invalidate(user_id)
+        if result is None:
+            return None
+        invoice, transaction_id = result.get("invoice"), result.get("transaction_id")
+        if invoice is None or transaction_id is None:
+            raise BackendError(f"Payment of {invoice_id} returned an unexpected response: {result}")
+        return invoice, transaction_id
+
+    def activate_package(self, user_id, package_id):
+        self._request("PUT", f"/accounts/{user_id}/package", json={"package_id": package_id})
+        self.invalidate(user_id)
+
+
+def create_backend():
+    """
+    Build the backend from the environment.
+
+    TELCO_BACKEND=http talks to the gateway at TELCO_API_URL (with optional
+    TELCO_API_TOKEN and TELCO_API_TIMEOUT seconds); anything else uses the
+    in-memory demo backend.
+    """
+    if os.getenv("TELCO_BACKEND") == "http":
+        return HttpBackend(
+            os.environ["TELCO_API_URL"],
+            token=os.getenv("TELCO_API_TOKEN"),
+            timeout=float(os.getenv("TELCO_API_TIMEOUT", "5")),
+        )
+    return MemoryBackend()
+
+
+backend = create_backend()
@@ -0,0 +1,382 @@
+"""
+Offline benchmarks for the agent pipeline.
+
+Run from the ``agent`` directory:
+
+    python -m agno2.bench jsx
+    python -m agno2.bench pool
+    python -m agno2.bench vectordb [--db-url postgresql+psycopg://ai:ai@localhost:5532/ai]
+    python -m agno2.bench store --subscribers 100000
+    python -m agno2.bench tokens [--user +15551234567]
+    python -m agno2.bench sessions --sessions 200 --turns 20 --concurrency 16
+    python -m agno2.bench payloads
+"""
+import argparse
+import copy
+import gzip
+import hashlib
+import json
+import random
+import statistics
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+from .jsx import compile_jsx
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "data" / "jsx_fixtures"
+
+
+def load_jsx_fixtures():
+    """Return a dict of fixture name -> JSX source for the golden corpus."""
+    return {path.stem: path.read_text() for path in sorted(FIXTURES_DIR.glob("*.jsx"))}
+
+
+def bench_jsx(args):
+    print(f"{'fixture':<24}{'bytes':>8}{'us/compile':>14}{'compiles/s':>14}")
+    for name, source in load_jsx_fixtures().items():
+        timer = timeit.Timer(lambda: compile_jsx(source))
+        best = min(timer.repeat(repeat=args.repeat, number=args.number)) / args.number
+        print(f"{name:<24}{len(source):>8}{best * 1e6:>14.1f}{1 / best:>14.0f}")
+
+
+def bench_pool(args):
+    from .agent import start_agent
+    from .pool import AgentPool
+
+    def build():
+        start_agent("bench").update_model()
+
+    pool = AgentPool()
+    pool.register("agent", start_agent)
+    pool.warm()
+
+    def checkout():
+        with pool.checkout("agent", "bench"):
+            pass
+
+    print(f"{'strategy':<24}{'us/request':>14}")
+    for name, func in (("construct per request", build), ("pool checkout", checkout)):
+        best = min(timeit.Timer(func).repeat(repeat=args.repeat, number=args.number)) / args.number
+        print(f"{name:<24}{best * 1e6:>14.1f}")
+    print(pool.stats()["agent"])
+
+
+def bench_vectordb(args):
+    import numpy as np
+    from agno.document import Document
+    from agno.embedder.base import Embedder
+    from agno.knowledge.text import TextKnowledgeBase
+
+    from .knowledge import KNOWLEDGE_DIR
+    from .vectordb import LocalVectorDb
+
+    class HashEmbedder(Embedder):
+        """Deterministic random embeddings, so only the vector store is measured."""
+
+        def get_embedding(self, text):
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+            return np.random.default_rng(seed).standard_normal(self.dimensions).tolist()
+
+        def get_embedding_and_usage(self, text):
+            return self.get_embedding(text), None
+
+    chunks = [
+        document
+        for documents in TextKnowledgeBase(path=KNOWLEDGE_DIR, vector_db=None).document_lists
+        for document in documents
+    ]
+    documents = [
+        Document(name=f"{chunk.name}_{i}", id=f"{chunk.id}_{i}", content=f"{chunk.content} #{i}")
+        for i in range(max(1, args.docs // len(chunks)))
+        for chunk in chunks
+    ]
+    queries = ["I want to pay my invoices", "What is my credit?", "Change my package", "Show my user info"]
+
+    def measure(vector_db):
+        vector_db.insert(documents)
+        for query in queries:
+            vector_db.search(query, limit=args.limit)
+        timings = []
+        for _ in range(args.number):
+            for query in queries:
+                started = time.perf_counter()
+                vector_db.search(query, limit=args.limit)
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+    print(f"{len(documents)} chunks, {args.number * len(queries)} queries, top {args.limit}")
+    print(f"{'vector db':<24}{'p50 us':>12}{'p95 us':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        p50, p95 = measure(LocalVectorDb(directory, embedder=HashEmbedder()))
+    print(f"{'LocalVectorDb':<24}{p50 * 1e6:>12.1f}{p95 * 1e6:>12.1f}")
+
+    try:
+        from agno.vectordb.pgvector import PgVector
+
+        vector_db = PgVector(table_name="bench_documents", db_url=args.db_url, embedder=HashEmbedder())
+        vector_db.drop()
+        vector_db.create()
+    except Exception as e:
+        print(f"{'PgVector':<24}unavailable ({e.__class__.__name__}: {e})")
+        return
+    try:
+        p50, p95 = measure(vector_db)
+        print(f"{'PgVector':<24}{p50 * 1e6:>12.1f}{p95 * 1e6:>12.1f}")
+    finally:
+        vector_db.drop()
+
+
+def bench_store(args):
+    from .store import SubscriberStore
+
+    user_ids = [f"+1555{i:07d}" for i in range(args.subscribers)]
+    invoice = {"issue_date": "2024-03-01T00:00:00Z", "amount": 89.99, "status": "overdue"}
+
+    # The global lists the tools used to scan, holding every subscriber's rows
+    invoices = []
+    cards = []
+    store = SubscriberStore()
+    started = time.perf_counter()
+    for i, user_id in enumerate(user_ids):
+        for n in range(2):
+            row = dict(invoice, invoice_id=f"INV-{i}-{n}", user_id=user_id)
+            invoices.append(row)
+            store.add_invoice(user_id, row)
+        cards.append({"user_id": user_id, "card_number": "4111", "expiration_date": "12/2030", "payment_method_id": f"card_{i}"})
+        store.add_card(user_id, "4111", "12/2030")
+    print(f"{args.subscribers} subscribers loaded in {time.perf_counter() - started:.2f}s")
+
+    def list_turn(i):
+        user_id = user_ids[i]
+        [row for row in invoices if row["user_id"] == user_id]
+        [row for row in cards if row["user_id"] == user_id]
+        row = next(row for row in invoices if row["invoice_id"] == f"INV-{i}-0")
+        invoices.remove(row)
+
+    def store_turn(i):
+        user_id = user_ids[i]
+        store.invoices(user_id)
+        store.cards(user_id)
+        store.pay_invoice(user_id, f"INV-{i}-0")
+
+    rng = random.Random(0)
+    sample = rng.sample(range(args.subscribers), args.number)
+    print(f"{'store':<24}{'us/turn':>12}")
+    for name, turn, count in (("global lists", list_turn, min(args.number, 50)), ("SubscriberStore", store_turn, args.number)):
+        started = time.perf_counter()
+        for i in sample[:count]:
+            turn(i)
+        print(f"{name:<24}{(time.perf_counter() - started) / count * 1e6:>12.1f}")
+
+
+def token_counter():
+    """Return a token counting function: tiktoken's o200k_base when available, else the 4 characters estimate."""
+    from .tokens import count_tokens
+
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        print("tiktoken encoding unavailable, estimating 4 characters per token")
+        return count_tokens
+    return lambda text: len(encoding.encode(text))
+
+
+def bench_tokens(args):
+    from . import tools
+    from .projections import PROCESS_VIEWS, tool_view
+
+    count = token_counter()
+    print(f"{'process':<26}{'tool':<38}{'full':>8}{'compact':>9}{'saved':>8}")
+    total_full = total_compact = 0
+    for process, views in PROCESS_VIEWS.items():
+        process_full = process_compact = 0
+        for name in views:
+            tool = getattr(tools, name)
+            full = count(tool(args.user))
+            with tool_view(process):
+                compact = count(tool(args.user))
+            process_full += full
+            process_compact += compact
+            print(f"{process:<26}{name:<38}{full:>8}{compact:>9}{1 - compact / full:>8.0%}")
+        print(
+            f"{process:<26}{'total, replayed ' + str(args.history) + ' turns':<38}"
+            f"{process_full * args.history:>8}{process_compact * args.history:>9}{1 - process_compact / process_full:>8.0%}"
+        )
+        total_full += process_full
+        total_compact += process_compact
+    print(f"{'all processes':<64}{total_full:>8}{total_compact:>9}{1 - total_compact / total_full:>8.0%}")
+
+
+def bench_sessions(args):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from agno.storage.agent.sqlite import SqliteAgentStorage
+    from agno.storage.session.agent import AgentSession
+
+    from .sessions import AppendOnlySqliteStorage
+
+    # A run as agno stores it: the user message, a tool call and its result, the reply
+    tool_result = json.dumps({"status": "success", "data": {"invoices": [{"invoice_id": "INV-1", "amount": 89.99}] * 8}})
+    run = {
+        "message": {"role": "user", "content": "I want to pay my invoice"},
+        "response": {
+            "content": "Which card do you want to use? " * 8,
+            "messages": [
+                {"role": "user", "content": "I want to pay my invoice"},
+                {"role": "assistant", "tool_calls": [{"id": "call_1", "function": {"name": "get_outstanding_invoices"}}]},
+                {"role": "tool", "tool_call_id": "call_1", "content": tool_result},
+                {"role": "assistant", "content": "Which card do you want to use? " * 8},
+            ],
+        },
+    }
+
+    def session(session_id, turn):
+        return AgentSession(
+            session_id=session_id,
+            agent_id="agent",
+            memory={"runs": [run] * turn, "messages": [{"role": "system", "content": "You are a helpful assistant."}]},
+            session_data={"session_state": {"process": "make_payment"}},
+        )
+
+    def measure(storage):
+        latencies = []
+
+        def conversation(session_id):
+            for turn in range(1, args.turns + 1):
+                storage.read(session_id)
+                started = time.perf_counter()
+                storage.upsert(session(session_id, turn))
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            list(executor.map(conversation, [f"session-{i}" for i in range(args.sessions)]))
+        if hasattr(storage, "flush"):
+            storage.flush()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+    print(f"{args.sessions} sessions x {args.turns} turns, {args.concurrency} threads")
+    print(f"{'storage':<28}{'turns/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        storages = (
+            ("agno SqliteStorage", lambda: SqliteAgentStorage(table_name="sessions", db_file=f"{directory}/agno.db"), "agno.db"),
+            ("append-only, WAL", lambda: AppendOnlySqliteStorage(db_file=f"{directory}/append.db"), "append.db"),
+            (
+                "append-only, write-behind",
+                lambda: AppendOnlySqliteStorage(db_file=f"{directory}/behind.db", write_behind=args.write_behind),
+                "behind.db",
+            ),
+        )
+        for name, build, file_name in storages:
+            storage = build()
+            storage.create()
+            elapsed, p50, p95 = measure(storage)
+            if hasattr(storage, "compact"):
+                storage.compact()
+            size = sum(path.stat().st_size for path in Path(directory).glob(f"{file_name}*")) / 1e6
+            print(f"{name:<28}{args.sessions * args.turns / elapsed:>10.0f}{p50 * 1e3:>10.2f}{p95 * 1e3:>10.2f}{size:>8.1f}")
+
+
+def bench_payloads(args):
+    from .descriptors import ScreenDescriptor, render_descriptor
+    from .payloads import encode_tree
+
+    invoices = render_descriptor(
+        ScreenDescriptor(
+            kind="choice",
+            text="Which invoice do you want to pay?",
+            rows=[{"title": f"INV-2024-{i:04d}", "details": ["$89.99", "due 2024-03-15", "overdue"]} for i in range(args.rows)],
+            fields=[{"name": "card_number", "label": "Card number", "kind": "card_number"}],
+            actions=["Pay"],
+        )
+    )
+    screens = {name: compile_jsx(source) for name, source in load_jsx_fixtures().items()}
+    screens["invoice_list"] = invoices
+
+    def next_step(tree):
+        # The next turn of a process usually keeps the layout and changes the text
+        changed = copy.deepcopy(tree)
+        node = changed
+        while isinstance(node.get("children"), list) and node["children"]:
+            node = node["children"][0]
+        node["children"] = "Your payment was received, anything else?"
+        return changed
+
+    names = list(screens)
+    scenarios = {
+        "next step, same layout": [(screens[name], next_step(screens[name])) for name in names],
+        "new screen": [(screens[name], screens[names[(i + 1) % len(names)]]) for i, name in enumerate(names)],
+    }
+    print(f"{'scenario':<24}{'format':<10}{'bytes':>8}{'gzip':>8}{'us/parse':>10}")
+    for scenario, pairs in scenarios.items():
+        for payload_format in ("tree", "interned", "patch"):
+            sizes, gzipped, parse = [], [], []
+            for i, (previous, tree) in enumerate(pairs):
+                session_id = f"bench-{i}"
+                base = encode_tree(previous, session_id, "interned")["digest"]
+                body = json.dumps(encode_tree(tree, session_id, payload_format, base), separators=(",", ":")).encode()
+                sizes.append(len(body))
+                gzipped.append(len(gzip.compress(body)))
+                parse.append(min(timeit.Timer(lambda: json.loads(body)).repeat(repeat=3, number=args.number)) / args.number)
+            print(
+                f"{scenario:<24}{payload_format:<10}{statistics.mean(sizes):>8.0f}{statistics.mean(gzipped):>8.0f}"
+                f"{statistics.mean(parse) * 1e6:>10.1f}"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    jsx_parser = subparsers.add_parser("jsx", help="JSX to JSON compiler microbenchmark")
+    jsx_parser.add_argument("--number", type=int, default=1000)
+    jsx_parser.add_argument("--repeat", type=int, default=5)
+    jsx_parser.set_defaults(func=bench_jsx)
+
+    pool_parser = subparsers.add_parser("pool", help="Agent construction vs pool checkout")
+    pool_parser.add_argument("--number", type=int, default=50)
+    pool_parser.add_argument("--repeat", type=int, default=3)
+    pool_parser.set_defaults(func=bench_pool)
+
+    vectordb_parser = subparsers.add_parser("vectordb", help="Knowledge search latency, LocalVectorDb vs PgVector")
+    vectordb_parser.add_argument("--db-url", default="postgresql+psycopg://ai:ai@localhost:5532/ai")
+    vectordb_parser.add_argument("--docs", type=int, default=500, help="Approximate number of chunks to index")
+    vectordb_parser.add_argument("--limit", type=int, default=5)
+    vectordb_parser.add_argument("--number", type=int, default=200)
+    vectordb_parser.set_defaults(func=bench_vectordb)
+
+    store_parser = subparsers.add_parser("store", help="Invoice and card lookups, global lists vs SubscriberStore")
+    store_parser.add_argument("--subscribers", type=int, default=100_000)
+    store_parser.add_argument("--number", type=int, default=10_000, help="Simulated turns (lookup invoices and cards, pay one)")
+    store_parser.set_defaults(func=bench_store)
+
+    tokens_parser = subparsers.add_parser("tokens", help="Prompt tokens of the tool results per process, full vs compact")
+    tokens_parser.add_argument("--user", default="+15551234567", help="Subscriber the tools are called for")
+    tokens_parser.add_argument("--history", type=int, default=15, help="Turns a tool result is replayed in (num_history_responses)")
+    tokens_parser.set_defaults(func=bench_tokens)
+
+    sessions_parser = subparsers.add_parser("sessions", help="Concurrent session writes, agno SqliteStorage vs append-only")
+    sessions_parser.add_argument("--sessions", type=int, default=200)
+    sessions_parser.add_argument("--turns", type=int, default=20)
+    sessions_parser.add_argument("--concurrency", type=int, default=16)
+    sessions_parser.add_argument("--write-behind", type=float, default=0.5, help="Flush interval in seconds")
+    sessions_parser.set_defaults(func=bench_sessions)
+
+    payloads_parser = subparsers.add_parser("payloads", help="Screen payload size and parse time, full tree vs interned vs patch")
+    payloads_parser.add_argument("--rows", type=int, default=10, help="Invoices in the list screen")
+    payloads_parser.add_argument("--number", type=int, default=2000)
+    payloads_parser.set_defaults(func=bench_payloads)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic differences in the agent output share a cache entry."""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def instructions_hash(agent):
+    """Hash everything in an agent's prompt that influences how it renders."""
+    prompt = json.dumps([agent.description, agent.instructions, agent.expected_output], default=str)
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Content-addressed cache of rendered component trees.
+
+    The JSX agent runs with temperature 0, so the same assistant text always
+    renders the same screen. Entries are keyed on the normalized text, the
+    model id and the JSX agent's instructions, kept in an in-memory LRU and,
+    when ``db_path`` is set, in a SQLite table that survives restarts and is
+    shared between worker processes.
+    """
+
+    def __init__(self, max_entries=1024, db_path=None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS render_cache (key TEXT PRIMARY KEY, tree TEXT NOT NULL)")
+
+    def key_for(self, agent, text):
+        """
+        Build the cache key for rendering ``text`` with ``agent``.
+
+        Args:
+            agent (Agent): The JSX agent that would render the text.
+            text (str): The assistant output to render.
+        """
+        model_id = agent.model.id if agent.model is not None else ""
+        material = "\0".join([model_id, instructions_hash(agent), normalize_text(text)])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _get_memory(self, key):
+        with self._lock:
+            tree = self._entries.get(key)
+            if tree is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return tree
+
+    def _get_disk(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT tree FROM render_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        tree = json.loads(row[0])
+        self._put_memory(key, tree)
+        with self._lock:
+            self.disk_hits += 1
+        return tree
+
+    def _put_memory(self, key, tree):
+        with self._lock:
+            self._entries[key] = tree
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _put_disk(self, key, tree):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO render_cache (key, tree) VALUES (?, ?)", (key, json.dumps(tree)))
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def get(self, key):
+        """Return the cached tree for ``key`` or None. Cached trees are shared and must not be mutated."""
+        tree = self._get_memory(key)
+        if tree is None and self._db is not None:
+            tree = self._get_disk(key)
+        if tree is None:
+            self._miss()
+        return tree
+
+    def set(self, key, tree):
+        self._put_memory(key, tree)
+        if self._db is not None:
+            self._put_disk(key, tree)
+
+    async def aget(self, key):
+        """Like :meth:`get`, reading the SQLite tier in a worker thread."""
+        tree = self._get_memory(key)
+        if tree is None and self._db is not None:
+            tree = await asyncio.to_thread(self._get_disk, key)
+        if tree is None:
+            self._miss()
+        return tree
+
+    async def aset(self, key, tree):
+        self._put_memory(key, tree)
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, key, tree)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM render_cache")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+render_cache = RenderCache(
+    max_entries=int(os.getenv("RENDER_CACHE_SIZE", "1024")),
+    db_path=os.getenv("RENDER_CACHE_DB") or None,
+)
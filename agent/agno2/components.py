@@ -0,0 +1,336 @@
+import json
+import re
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, Field
+
+# The components DynamicComponentRenderer (mobile-app/components) maps to React Native
+COMPONENT_TYPES = ("View", "Text", "Button", "Image", "TextInput", "TouchableOpacity")
+
+# Props each component accepts; a node without its required props cannot be rendered
+COMPONENT_PROPS = {
+    "View": {"style", "testID"},
+    "Text": {"style", "type", "numberOfLines", "testID"},
+    "Button": {"title", "onPress", "name", "value", "color", "disabled", "testID"},
+    "Image": {"source", "style", "resizeMode", "accessibilityLabel", "testID"},
+    "TextInput": {
+        "name",
+        "onChangeText",
+        "placeholder",
+        "keyboardType",
+        "secureTextEntry",
+        "maxLength",
+        "autoCapitalize",
+        "editable",
+        "multiline",
+        "value",
+        "style",
+        "testID",
+    },
+    "TouchableOpacity": {"onPress", "disabled", "style", "testID"},
+}
+REQUIRED_PROPS = {"Button": ("title",), "Image": ("source",), "TextInput": ("name",)}
+
+_FENCE = re.compile(r"^\s*```[\w-]*\s*\n?|\n?\s*```\s*$")
+_TRAILING_COMMA = re.compile(r",(\s*)$")
+
+
+class ComponentError(ValueError):
+    """Raised when a component tree cannot be parsed or does not follow the schema."""
+
+    def __init__(self, message, path=None):
+        if path is not None:
+            message = f"{message} (at {path})"
+        super().__init__(message)
+        self.path = path
+
+
+class Component(BaseModel):
+    """One node of the component tree the mobile app renders."""
+
+    type: Literal["View", "Text", "Button", "Image", "TextInput", "TouchableOpacity"] = Field(
+        ..., description="React Native component"
+    )
+    props: Optional[Dict[str, Any]] = Field(
+        None,
+        description=(
+            'Component props. TextInput needs name and onChangeText "storeData", '
+            'Button needs title and onPress "handleSubmit", styles go in style'
+        ),
+    )
+    children: Optional[Union[str, List["Component"]]] = Field(
+        None, description="The text of a Text, or the child components"
+    )
+
+    def as_tree(self):
+        """Return the node as the JSON tree the mobile app renders, without empty props or children."""
+        node = {"type": self.type}
+        if self.props:
+            node["props"] = self.props
+        if isinstance(self.children, str):
+            node["children"] = self.children
+        elif self.children:
+            node["children"] = [child.as_tree() for child in self.children]
+        return node
+
+
+class SinglePassScreen(BaseModel):
+    """
+    The process agent's reply and the screen showing it, from a single model call.
+
+    Returned in single-pass mode (AGENT_SCREENS=single) instead of text for
+    the JSX agent, which saves the second generation of every turn.
+    """
+
+    text: str = Field(..., description="Your reply to the user, FINISHED_PROCESS included when you conclude a process")
+    screen: Component = Field(..., description="The screen showing the reply, with its inputs and buttons, rooted in a View")
+
+
+def validate_node(node, path="$", problems=None):
+    """
+    Check a component tree against the schema and return a cleaned copy.
+
+    Unknown props are dropped, a single child object becomes a list, numbers
+    become text and an all-text children list is joined. A child that cannot
+    be rendered (unknown type, missing required props) is dropped, with the
+    reason appended to ``problems``; only a broken root raises.
+
+    Args:
+        node (dict): The tree, as parsed from JSON.
+        path (str): Where ``node`` is in the whole tree, for messages.
+        problems (list): Collects what was repaired or dropped.
+
+    Returns:
+        dict: The tree the mobile app can render.
+
+    Raises:
+        ComponentError: If ``node`` itself cannot be rendered.
+    """
+    problems = problems if problems is not None else []
+    if not isinstance(node, dict):
+        raise ComponentError("a component must be an object", path)
+    kind = node.get("type")
+    if kind not in COMPONENT_PROPS:
+        raise ComponentError(f"unsupported component type {kind!r}", path)
+
+    props = node.get("props") or {}
+    if not isinstance(props, dict):
+        raise ComponentError("props must be an object", path)
+    unknown = sorted(set(props) - COMPONENT_PROPS[kind])
+    if unknown:
+        problems.append(f"{path}: dropped props {', '.join(unknown)} of {kind}")
+    props = {key: value for key, value in props.items() if key in COMPONENT_PROPS[kind]}
+    missing = [prop for prop in REQUIRED_PROPS.get(kind, ()) if props.get(prop) in (None, "")]
+    if missing:
+        raise ComponentError(f"{kind} without {', '.join(missing)}", path)
+
+    cleaned = {"type": kind}
+    if props:
+        cleaned["props"] = props
+
+    children = node.get("children")
+    if isinstance(children, (dict, str, int, float)) and not isinstance(children, bool):
+        children = [children]
+    if children is None or children == []:
+        return cleaned
+    if not isinstance(children, list):
+        raise ComponentError("children must be text, a component or a list", path)
+
+    kept = []
+    for index, child in enumerate(children):
+        child_path = f"{path}.children[{index}]"
+        if isinstance(child, (int, float)) and not isinstance(child, bool):
+            child = str(child)
+        if isinstance(child, str):
+            kept.append(child)
+            continue
+        try:
+            kept.append(validate_node(child, child_path, problems))
+        except ComponentError as e:
+            problems.append(f"dropped {e}")
+    if kept and all(isinstance(child, str) for child in kept):
+        cleaned["children"] = "".join(kept)
+    elif kept:
+        cleaned["children"] = [child for child in kept if not isinstance(child, str) or child.strip()]
+    return cleaned
+
+
+def repair_json(text):
+    """
+    Fix the defects model written JSON commonly has, as far as they can be fixed locally.
+
+    Markdown fences and prose around the object are removed, trailing commas
+    are dropped, and a truncated object has its string and brackets closed;
+    a value cut off mid-way is dropped back to the last complete member.
+
+    Returns:
+        str: The repaired JSON text, still to be parsed.
+    """
+    text = _FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start < 0:
+        raise ComponentError("no JSON object in the output")
+
+    out = []
+    closers = []
+    # After each complete member, where the text can be cut and how to close it
+    cut_points = []
+    in_string = escaped = False
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if char not in closers:
+                continue
+            # Close whatever was left open inside, then drop a trailing comma
+            while closers[-1] != char:
+                _close(out, closers.pop())
+            _close(out, closers.pop())
+            if not closers:
+                break
+            cut_points.append((len(out), list(closers)))
+            continue
+        elif char == ",":
+            cut_points.append((len(out), list(closers)))
+        out.append(char)
+
+    if not closers:
+        return "".join(out)
+    candidate = "".join(out) + ('"' if in_string else "")
+    attempts = [(candidate, closers)] + [("".join(out[:end]), stack) for end, stack in reversed(cut_points)]
+    for body, stack in attempts:
+        repaired = _TRAILING_COMMA.sub(r"\1", body.rstrip()) + "".join(reversed(stack))
+        try:
+            json.loads(repaired)
+        except ValueError:
+            continue
+        return repaired
+    return candidate + "".join(reversed(closers))
+
+
+def _close(out, closer):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+    out.append(closer)
+
+
+def parse_tree(text, problems=None):
+    """
+    Parse and validate the component tree the JSON agent wrote.
+
+    The text is parsed as is first and repaired with :func:`repair_json` only
+    if that fails.
+
+    Returns:
+        dict: The component tree.
+
+    Raises:
+        ComponentError: If the text cannot be repaired into a renderable tree.
+    """
+    problems = problems if problems is not None else []
+    if not isinstance(text, str):
+        raise ComponentError("the output must be a string")
+    try:
+        data = json.loads(text)
+    except ValueError:
+        repaired = repair_json(text)
+        try:
+            data = json.loads(repaired)
+        except ValueError as e:
+            raise ComponentError(f"unrepairable JSON: {e}") from None
+        problems.append("repaired malformed JSON")
+    return validate_node(data, problems=problems)
+
+
+class TreeStreamParser:
+    """
+    Incrementally parse a JSON component tree as it is streamed from the model.
+
+    The JSON counterpart of :class:`~agno2.jsx.JSXStreamParser`: :meth:`feed`
+    returns the direct children of the root that have been fully received
+    and validated since the last call. Call :meth:`close` once the stream ends
+    to get the complete, repaired tree.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.problems = []
+        self.emitted = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None
+        self._children_depth = None
+        self._child_start = None
+
+    def feed(self, text):
+        """
+        Append streamed text.
+
+        Returns:
+            list: ``(index, node)`` pairs for each newly completed, valid child.
+        """
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buffer[self._string_start + 1 : self._pos]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_string == "children":
+                    self._children_depth = 2
+                elif char == "{" and self._children_depth is not None and self._depth == self._children_depth + 1:
+                    self._child_start = self._pos
+            elif char in "}]":
+                if char == "}" and self._child_start is not None and self._depth == self._children_depth + 1:
+                    node = self._child(buffer[self._child_start : self._pos + 1])
+                    if node is not None:
+                        completed.append((self.emitted, node))
+                    self.emitted += 1
+                    self._child_start = None
+                elif char == "]" and self._depth == self._children_depth:
+                    self._children_depth = None
+                self._depth -= 1
+            self._pos += 1
+        return completed
+
+    def _child(self, text):
+        path = f"$.children[{self.emitted}]"
+        try:
+            return validate_node(json.loads(text), path, self.problems)
+        except (ValueError, ComponentError) as e:
+            self.problems.append(f"{path}: {e}")
+            return None
+
+    def close(self):
+        """Parse the complete buffer and return the final component tree."""
+        # The whole tree is validated again, which reports every problem once
+        self.problems = []
+        return parse_tree(self.buffer, self.problems)
@@ -0,0 +1,22 @@
+```jsx
+<View style={{ padding: 16 }}>
+  {/* Outstanding invoices */}
+  <Text style={{ fontSize: 18, fontWeight: 'bold' }}>Outstanding invoices</Text>
+  <View style={{ marginVertical: 8 }}>
+    <Text>Invoice ID: INV-2024-0342</Text>
+    <Text>Amount: $89.99 &amp; due 2024-03-15</Text>
+    <Text>Status: {"overdue"}</Text>
+  </View>
+  <TouchableOpacity onPress={() => handleSubmit()} disabled={false}>
+    <Text>Pay now</Text>
+  </TouchableOpacity>
+  <TextInput
+    name="card_number"
+    placeholder="Card number"
+    keyboardType="numeric"
+    maxLength={16}
+    onChangeText={storeData}
+    editable
+  />
+</View>
+```
@@ -0,0 +1,57 @@
+<View
+    style={{
+    padding: 16,
+    backgroundColor: "#fff",
+    borderRadius: 8,
+    shadowColor: "#000",
+    shadowOffset: { width: 0, height: 2 },
+    shadowOpacity: 0.2,
+    shadowRadius: 4,
+    elevation: 5
+    }}
+>
+    <Text
+    style={{
+        fontSize: 16,
+        marginBottom: 8
+    }}
+    >
+    Email Address
+    </Text>
+    <TextInput
+    name="email"
+    style={{
+        height: 40,
+        borderColor: "#ccc",
+        borderWidth: 1,
+        borderRadius: 4,
+        paddingHorizontal: 10,
+        marginBottom: 12
+    }}
+    onChangeText={storeData}
+    keyboardType="email-address"
+    autoCapitalize="none"
+    />
+    <Text
+    style={{
+        fontSize: 16,
+        marginBottom: 8
+    }}
+    >
+    Password
+    </Text>
+    <TextInput
+    name="password"
+    style={{
+        height: 40,
+        borderColor: "#ccc",
+        borderWidth: 1,
+        borderRadius: 4,
+        paddingHorizontal: 10,
+        marginBottom: 12
+    }}
+    onChangeText={storeData}
+    secureTextEntry={true}
+    />
+    <Button title="Submit" onPress={handleSubmit} />
+</View>
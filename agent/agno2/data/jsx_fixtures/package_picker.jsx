@@ -0,0 +1,11 @@
+<>
+  <Text style={{ fontSize: 16, marginBottom: 8 }}>
+    Your current package is
+    Premium Plus.
+  </Text>
+  <View style={{ flexDirection: "row", gap: 8, shadowOffset: { width: 0, height: -1 } }}>
+    <Button title="Standard ($59.99)" onPress={handleSubmit} />
+    <Button title="Basic ($39.99)" onPress={handleSubmit} />
+  </View>
+  <Image source={{ uri: "https://example.com/logo.png" }} style={{ width: 40, height: 40 }} />
+</>
@@ -0,0 +1,9 @@
+<View style={{ padding: 10, backgroundColor: "#f0f0f0", borderRadius: 8 }}>
+    <Text type="subtitle" style={{ marginBottom: 10 }}>
+        Dynamic UI from JKAJHJAHSHJSH
+    </Text>
+    <Button title="Refresh Data" onPress={handleSubmit} />
+    <View style={{ marginTop: 15 }}>
+        <Text>This entire UI was rendered from a JSON response!</Text>
+    </View>
+</View>
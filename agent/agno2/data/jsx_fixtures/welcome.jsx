@@ -0,0 +1,9 @@
+<View>
+     <Text>What do you want do to today?</Text>
+     <TextInput 
+         name="message"
+         placeholder="Write here what you want" 
+         onChangeText={storeData}
+     />
+     <Button title="Let's go!" onPress={handleSubmit} />
+ </View>
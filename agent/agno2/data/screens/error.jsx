@@ -0,0 +1,9 @@
+<View>
+    <Text>Sorry, we could not show this screen. Please try again.</Text>
+    <TextInput 
+        name="message"
+        placeholder="Write here what you want" 
+        onChangeText={storeData}
+    />
+    <Button title="Try again" onPress={handleSubmit} />
+</View>
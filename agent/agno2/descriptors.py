@@ -0,0 +1,177 @@
+import logging
+import os
+from typing import List, Literal
+
+from pydantic import BaseModel, Field
+
+from .components import ComponentError, SinglePassScreen, validate_node
+
+logger = logging.getLogger(__name__)
+
+# Props for each kind of input field, matching the JSX agent's conventions
+FIELD_PROPS = {
+    "text": {},
+    "phone": {"keyboardType": "phone-pad"},
+    "number": {"keyboardType": "numeric"},
+    "card_number": {"keyboardType": "numeric", "maxLength": 19},
+    "expiry": {"keyboardType": "numeric", "placeholder": "MM/YYYY"},
+    "email": {"keyboardType": "email-address", "autoCapitalize": "none"},
+    "password": {"secureTextEntry": True},
+}
+
+LABEL_STYLE = {"fontSize": 16, "marginBottom": 8}
+INPUT_STYLE = {
+    "height": 40,
+    "borderColor": "#ccc",
+    "borderWidth": 1,
+    "borderRadius": 4,
+    "paddingHorizontal": 10,
+    "marginBottom": 12,
+}
+ROW_STYLE = {"marginVertical": 8}
+# Form key a picked choice row is submitted under, its title the value
+CHOICE_FIELD = "choice"
+
+
+class ScreenField(BaseModel):
+    name: str = Field(..., description="snake_case key the value is stored under, e.g. phone_number")
+    label: str = Field(..., description="Label shown above the input")
+    kind: Literal["text", "phone", "number", "card_number", "expiry", "email", "password"] = Field(
+        "text", description="Kind of value the user has to type"
+    )
+
+
+class ScreenRow(BaseModel):
+    title: str = Field(..., description="Main line of the row, e.g. an invoice id or a package name")
+    details: List[str] = Field(default_factory=list, description="Extra lines such as amount, due date or status")
+
+
+class ScreenDescriptor(BaseModel):
+    """
+    Typed description of the screen the agent wants to show.
+
+    Predictable process steps (asking for a phone number, listing invoices,
+    collecting card details, picking a package) are rendered locally from this
+    descriptor. ``kind="freeform"`` hands ``text`` to the JSX agent instead.
+    """
+
+    kind: Literal["form", "list", "choice", "message", "freeform"] = Field(
+        ...,
+        description=(
+            "form: ask for the necessary fields; list: show data rows; choice: the user picks one row; "
+            "message: text only; freeform: anything that does not fit the other kinds"
+        ),
+    )
+    text: str = Field(..., description="The message for the user, without the fields, rows or actions")
+    fields: List[ScreenField] = Field(default_factory=list, description="The <necessary_fields> the user must fill")
+    rows: List[ScreenRow] = Field(default_factory=list, description="Data rows, e.g. invoices, cards or packages")
+    actions: List[str] = Field(default_factory=list, description="Titles of the <default_action> buttons")
+
+    def as_text(self):
+        """Render the descriptor back to the tagged text the JSX agent expects."""
+        parts = [self.text]
+        for row in self.rows:
+            parts.append(" - ".join([row.title, *row.details]))
+        if self.fields:
+            names = ", ".join(field.label for field in self.fields)
+            parts.append(f"<necessary_fields>{names}</necessary_fields>")
+        for action in self.actions:
+            parts.append(f"<default_action>{action}</default_action>")
+        return "\n".join(parts)
+
+
+def structured_screens():
+    """Whether the agent returns screen descriptors (AGENT_SCREENS=structured) instead of text."""
+    return os.getenv("AGENT_SCREENS") == "structured"
+
+
+def single_pass_screens():
+    """Whether the agent returns its reply and the component tree in one call (AGENT_SCREENS=single)."""
+    return os.getenv("AGENT_SCREENS") == "single"
+
+
+def _text(children, style=None):
+    node = {"type": "Text"}
+    if style:
+        node["props"] = {"style": style}
+    node["children"] = children
+    return node
+
+
+def _button(title, value=None):
+    props = {"title": title, "onPress": "handleSubmit"}
+    if value is not None:
+        # The app stores name=value (storeData) before submitting the form
+        props.update(name=CHOICE_FIELD, value=value)
+    return {"type": "Button", "props": props}
+
+
+def _field(field):
+    props = {"name": field.name, "style": INPUT_STYLE, "onChangeText": "storeData"}
+    props.update(FIELD_PROPS[field.kind])
+    return [_text(field.label, LABEL_STYLE), {"type": "TextInput", "props": props}]
+
+
+def _row(row):
+    return {
+        "type": "View",
+        "props": {"style": ROW_STYLE},
+        "children": [_text(row.title, {"fontWeight": "bold"}), *(_text(detail) for detail in row.details)],
+    }
+
+
+def render_descriptor(descriptor):
+    """
+    Build the component tree for a screen descriptor.
+
+    Args:
+        descriptor (ScreenDescriptor): The descriptor returned by the agent.
+
+    Returns:
+        dict: The component tree, or None for ``freeform`` screens, which are
+        left to the JSX agent.
+    """
+    if descriptor.kind == "freeform":
+        return None
+
+    children = [_text(descriptor.text, LABEL_STYLE)]
+    if descriptor.kind == "choice":
+        children.extend(_button(" ".join([row.title, *row.details]), row.title) for row in descriptor.rows)
+    else:
+        children.extend(_row(row) for row in descriptor.rows)
+    for field in descriptor.fields:
+        children.extend(_field(field))
+    children.extend(_button(action) for action in descriptor.actions)
+    return {"type": "View", "props": {"style": {"padding": 16}}, "children": children}
+
+
+def render_screen(content):
+    """
+    Return the locally rendered tree for an agent reply, or None if the JSX agent has to render it.
+
+    A single-pass screen is checked like the JSON agent's trees: components
+    the app cannot render are dropped and logged, and a broken root leaves
+    the reply to the JSX agent.
+    """
+    if isinstance(content, ScreenDescriptor):
+        return render_descriptor(content)
+    if isinstance(content, SinglePassScreen):
+        problems = []
+        try:
+            tree = validate_node(content.screen.as_tree(), problems=problems)
+        except ComponentError as e:
+            logger.warning("Single-pass screen rejected, rendering with the JSX agent: %s", e)
+            return None
+        if problems:
+            logger.warning("Repaired the single-pass screen: %s", "; ".join(problems))
+        return tree
+    return None
+
+
+def screen_text(content):
+    """Return the text to hand to the JSX agent for an agent reply."""
+    if isinstance(content, ScreenDescriptor):
+        return content.as_text()
+    if isinstance(content, SinglePassScreen):
+        return content.text
+    return content
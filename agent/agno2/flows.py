@@ -0,0 +1,187 @@
+import json
+import re
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agno.models.message import Message
+
+from .knowledge import KNOWLEDGE_DIR
+from .router import FINISHED_MARKER
+from .stub import default_script, echo_tree
+
+PHONE = re.compile(r"\+1\d{6,}")
+ROUTED_PROCESS = re.compile(r"^<process>\n(.+)", re.MULTILINE)
+
+# Names the stub recognizes the pipeline's agents by, from their system prompts
+JSX_AGENT_MARKER = "React Native JSX"
+STRUCTURED_AGENT_MARKER = "<json_fields>"
+SINGLE_PASS_MARKER = '"screen"'
+
+
+@dataclass
+class Turn:
+    """
+    One user turn of a scripted process flow.
+
+    ``steps`` are the model responses that call tools, each a batch of
+    ``(tool, args)`` calls answered together, and ``reply`` is the final
+    answer. ``{phone}`` in the message or the arguments stands for the
+    subscriber's phone number.
+    """
+
+    message: str
+    reply: str
+    steps: List[List[Tuple[str, Dict[str, str]]]] = field(default_factory=list)
+
+
+def _identify(then):
+    return [[("validate_phone_number", {"phone_number": "{phone}"})], then]
+
+
+# The processes in data/txt_files, as a user and a well behaved model would go through them
+FLOWS = {
+    "make_payment": [
+        Turn("I want to pay my invoice", "Sure. What is the phone number on your account?"),
+        Turn(
+            "{phone}",
+            "You have one overdue invoice, INV-2024-0342, of $89.99 and no saved cards. "
+            "Please enter your card number and its expiration date.",
+            _identify([("get_outstanding_invoices", {"user_id": "{phone}"}), ("get_available_cards", {"user_id": "{phone}"})]),
+        ),
+        Turn(
+            "My card is 4111111111111111 and it expires 12/28",
+            f"Your card was saved and invoice INV-2024-0342 is paid. {FINISHED_MARKER}",
+            [
+                [("add_card", {"user_id": "{phone}", "card_number": "4111111111111111", "expiration_date": "12/28"})],
+                [("make_payment", {"user_id": "{phone}", "invoice_id": "INV-2024-0342"})],
+            ],
+        ),
+    ],
+    "change_bundle": [
+        Turn("I want to change my package bundle", "Sure. What is the phone number on your account?"),
+        Turn(
+            "{phone}",
+            "Your invoices are settled. Pick one of the available packages: Premium Plus, Standard or Basic.",
+            _identify([("get_outstanding_invoices", {"user_id": "{phone}"}), ("get_available_packages", {"user_id": "{phone}"})]),
+        ),
+        Turn(
+            "Standard",
+            f"The Standard package is now active. {FINISHED_MARKER}",
+            [[("activate_package", {"user_id": "{phone}", "package_name": "Standard"})]],
+        ),
+    ],
+    "retrieve_credit": [
+        Turn("How much credit do I have available?", "Sure. What is the phone number on your account?"),
+        Turn(
+            "{phone}",
+            f"Your account is active and you have $25.50 of available credit. {FINISHED_MARKER}",
+            # get_information_from_billing_system is not among the process agent's tools
+            _identify([("get_user_information", {"user_id": "{phone}"})]),
+        ),
+    ],
+    "retrieve_user_info": [
+        Turn("Retrieve my user data", "Sure. What is the phone number on your account?"),
+        Turn(
+            "{phone}",
+            f"Your account is active on the Premium Data plan. {FINISHED_MARKER}",
+            _identify([("get_user_information", {"user_id": "{phone}"})]),
+        ),
+    ],
+    "retrieve_user_payments": [
+        Turn("Show me the credit card details I have saved", "Sure. What is the phone number on your account?"),
+        Turn(
+            "{phone}",
+            f"You have no registered cards yet. {FINISHED_MARKER}",
+            _identify([("get_available_cards", {"user_id": "{phone}"})]),
+        ),
+    ],
+}
+
+
+def flow_messages(process, phone):
+    """Return the user messages of a flow for the subscriber ``phone``."""
+    return [turn.message.replace("{phone}", phone) for turn in FLOWS[process]]
+
+
+def _fill(value, phone):
+    return value.replace("{phone}", phone) if isinstance(value, str) else value
+
+
+class FlowScript:
+    """
+    StubModel script that plays the :data:`FLOWS` like a well behaved model would.
+
+    The process agent's turn is looked up by the user's message, with phone
+    numbers replaced by ``{phone}``, in the flow of the process the router
+    put in its context; it then calls the turn's tools one step at a time and
+    replies. The JSX agent gets a screen of the text it is given,
+    malformed for ``malformed_jsx`` of the texts (picked by a checksum, so
+    always the same ones) to exercise the JSON agent fallback. Messages that
+    are not part of a flow get :func:`default_script`'s replies.
+    """
+
+    def __init__(self, flows=None, malformed_jsx=0.0, directory=KNOWLEDGE_DIR):
+        flows = flows or FLOWS
+        self.turns = {(process, turn.message): turn for process, turns in flows.items() for turn in turns}
+        # The routed procedure is recognized by its first line, "Process Name: ..."
+        self.titles = {}
+        for process in flows:
+            path = Path(directory) / f"{process}.txt"
+            if path.exists():
+                self.titles[path.read_text().strip().splitlines()[0].strip()] = process
+        self.malformed_jsx = malformed_jsx
+
+    def __call__(self, messages: List[Message]):
+        system = messages[0].get_content_string() if messages and messages[0].role == "system" else ""
+        if JSX_AGENT_MARKER in system:
+            return self._jsx(messages)
+
+        last_user = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].role == "user"), None)
+        if last_user is None:
+            return default_script(messages)
+        routed = ROUTED_PROCESS.search(system)
+        process = self.titles.get(routed.group(1).strip()) if routed else None
+        text = messages[last_user].get_content_string().strip()
+        turn = self.turns.get((process, PHONE.sub("{phone}", text)))
+        phone = self._phone(messages)
+        if turn is None or (phone is None and turn.steps):
+            return default_script(messages)
+
+        step = sum(1 for message in messages[last_user + 1 :] if message.role == "assistant" and message.tool_calls)
+        if step < len(turn.steps):
+            return {"content": "", "tool_calls": self._tool_calls(turn.steps[step], phone, step)}
+        if STRUCTURED_AGENT_MARKER in system and SINGLE_PASS_MARKER in system:
+            return json.dumps({"text": turn.reply, "screen": echo_tree(turn.reply.replace(FINISHED_MARKER, "").strip())})
+        if STRUCTURED_AGENT_MARKER in system:
+            return json.dumps({"kind": "message", "text": turn.reply})
+        return turn.reply
+
+    @staticmethod
+    def _phone(messages) -> Optional[str]:
+        for message in messages:
+            if message.role == "user":
+                match = PHONE.search(message.get_content_string())
+                if match:
+                    return match.group()
+        return None
+
+    @staticmethod
+    def _tool_calls(batch, phone, step):
+        return [
+            {
+                "id": f"call_{step}_{index}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps({key: _fill(value, phone) for key, value in args.items()})},
+            }
+            for index, (name, args) in enumerate(batch)
+        ]
+
+    def _jsx(self, messages):
+        jsx = default_script(messages)
+        text = messages[-1].get_content_string() if messages else ""
+        if self.malformed_jsx and zlib.crc32(text.encode()) % 1000 < self.malformed_jsx * 1000:
+            # Unclosed root, which the compiler rejects
+            return jsx.removesuffix("</View>")
+        return jsx
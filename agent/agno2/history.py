@@ -0,0 +1,194 @@
+import json
+import os
+import re
+from typing import List, Optional
+
+from agno.memory.agent import AgentMemory
+from agno.models.message import Message
+from dotenv import load_dotenv
+
+from .router import finished_process
+from .tokens import count_tokens
+
+load_dotenv()
+
+# Facts that outlive the process they were learned in
+SESSION_FACTS = ("phone_number",)
+
+# What the user picked, as named in tool call arguments
+SELECTION_ARGS = ("invoice_id", "payment_method_id", "package_name")
+INVOICE_ID = re.compile(r"\bINV-[\w-]*\d\b")
+CARD_ID = re.compile(r"\bcard_\d+\b")
+
+
+def compact_history():
+    """Whether agents keep a token-budgeted history plus session facts; set AGENT_HISTORY=compact."""
+    return os.getenv("AGENT_HISTORY") == "compact"
+
+
+def history_token_budget():
+    return int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+
+
+def _message_tokens(message: Message) -> int:
+    tokens = count_tokens(message.get_content_string())
+    if message.tool_calls:
+        tokens += count_tokens(json.dumps(message.tool_calls))
+    return tokens
+
+
+def _conversation(messages: List[Message]) -> List[Message]:
+    """The user's messages and the agent's replies, without tool calls and results."""
+    return [
+        message for message in messages if message.role == "user" or (message.role == "assistant" and not message.tool_calls)
+    ]
+
+
+class CompactMemory(AgentMemory):
+    """
+    Agent memory whose history is capped by a token budget instead of a turn count.
+
+    The last ``full_runs`` runs are replayed as they are, tool calls and
+    results included. Older runs only contribute the user's message and the
+    agent's final reply, and runs are added newest first until
+    ``token_budget`` (estimated at 4 characters per token) is used up. The
+    latest run is always kept, reduced to its user message and final reply
+    if it does not fit on its own. What the dropped tool results established
+    is kept as facts in the session state, see :func:`remember_facts`.
+    """
+
+    token_budget: int = 2000
+    full_runs: int = 1
+
+    def get_messages_from_last_n_runs(
+        self, last_n: Optional[int] = None, skip_role: Optional[str] = None
+    ) -> List[Message]:
+        runs = self.runs if last_n is None else self.runs[-last_n:]
+        selected = []
+        used = 0
+        for age, run in enumerate(reversed(runs)):
+            if not (run.response and run.response.messages):
+                continue
+            messages = [
+                message
+                for message in run.response.messages
+                if message.role != skip_role and not getattr(message, "from_history", False)
+            ]
+            if age >= self.full_runs:
+                # Tool results only matter to the turn that made the calls
+                messages = _conversation(messages)
+            tokens = sum(_message_tokens(message) for message in messages)
+            if used + tokens > self.token_budget:
+                if selected:
+                    break
+                # A single large tool result must not drop the whole history
+                messages = _conversation(messages)
+                tokens = sum(_message_tokens(message) for message in messages)
+            used += tokens
+            selected.append(messages)
+        return [message for messages in reversed(selected) for message in messages]
+
+
+def _tool_result(message: Message):
+    if message.tool_call_error:
+        return None
+    try:
+        result = json.loads(message.get_content_string())
+    except ValueError:
+        return None
+    if not isinstance(result, dict) or result.get("status") != "success":
+        return None
+    return result.get("data") or {}
+
+
+def _user_selection(text):
+    """The invoice, card or choice row a user message names."""
+    facts = {}
+    try:
+        form = json.loads(text)
+    except ValueError:
+        form = None
+    if isinstance(form, dict) and isinstance(form.get("choice"), str):
+        facts["choice"] = form["choice"]
+    for key, pattern in (("invoice_id", INVOICE_ID), ("payment_method_id", CARD_ID)):
+        match = pattern.search(text)
+        if match:
+            facts[key] = match.group()
+    return facts
+
+
+def _tool_call_selection(tool_call):
+    try:
+        args = json.loads(tool_call.get("function", {}).get("arguments") or "{}")
+    except ValueError:
+        return {}
+    if not isinstance(args, dict):
+        return {}
+    return {key: args[key] for key in SELECTION_ARGS if isinstance(args.get(key), str) and args[key]}
+
+
+def extract_facts(messages: List[Message]) -> dict:
+    """
+    Return the facts established among ``messages``.
+
+    The invoice, card, package or choice row the user picked is recorded as
+    soon as their reply or a tool call names it, so a selection survives
+    the compaction of the run it was made in. The successful tool calls add
+    the validated phone number, a newly added card, the payment's
+    transaction and ``last_step``, the last tool that succeeded.
+    """
+    facts = {}
+    for message in messages:
+        if message.role == "user":
+            facts.update(_user_selection(message.get_content_string()))
+            continue
+        if message.role == "assistant" and message.tool_calls:
+            for tool_call in message.tool_calls:
+                facts.update(_tool_call_selection(tool_call))
+            continue
+        if message.role != "tool" or message.tool_name is None:
+            continue
+        data = _tool_result(message)
+        if data is None:
+            continue
+        args = message.tool_args or {}
+        name = message.tool_name
+        if name == "validate_phone_number":
+            facts["phone_number"] = args.get("phone_number")
+        elif name == "add_card":
+            facts["payment_method_id"] = (data.get("added_card") or {}).get("payment_method_id")
+        elif name == "make_payment":
+            facts["invoice_id"] = args.get("invoice_id")
+            facts["payment_method_id"] = args.get("payment_method_id") or facts.get("payment_method_id")
+            facts["transaction_id"] = data.get("transaction_id")
+        elif name == "activate_package":
+            facts["package_name"] = args.get("package_name")
+        facts["last_step"] = name
+    return {key: value for key, value in facts.items() if value is not None}
+
+
+def remember_facts(agent):
+    """
+    Update the session's facts from the agent's last run and add them to its context.
+
+    Call after :meth:`ProcessRouter.route`. When the last run finished its
+    process only the :data:`SESSION_FACTS` are kept.
+
+    Returns:
+        dict: The session's facts.
+    """
+    state = agent.session_state if agent.session_state is not None else {}
+    facts = dict(state.get("facts") or {})
+    if agent.memory is not None and agent.memory.runs:
+        response = agent.memory.runs[-1].response
+        if response is not None and response.messages:
+            facts.update(extract_facts(response.messages))
+        if finished_process(agent):
+            facts = {key: value for key, value in facts.items() if key in SESSION_FACTS}
+    state["facts"] = facts
+    agent.session_state = state
+
+    if facts:
+        block = f"<facts>\n{json.dumps(facts)}\n</facts>"
+        agent.additional_context = f"{agent.additional_context}\n{block}" if agent.additional_context else block
+    return facts
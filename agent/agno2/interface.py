@@ -1,15 +1,14 @@
 from dotenv import load_dotenv
 from agno.agent import Agent
 from textwrap import dedent
-from agno.models.openai import OpenAIChat
+from .models import chat_model
 
 load_dotenv()
 
 def start_agent_jsx(session_id=None):
 
     agent = Agent(
-        # model=AwsBedrock(id="anthropic.claude-3-haiku-20240307-v1:0", temperature=0),
-        model=OpenAIChat(id="gpt-4o-mini", temperature=0),
+        model=chat_model("jsx"),
         description=dedent("""
             You are a helpful assistant that converts text to a nice looking React Native JSX interface.
         """),
@@ -24,6 +23,7 @@ def start_agent_jsx(session_id=None):
             8. Always include a prop called name when the widget is a TextInput
             9. Always include onChangeText in TextInput, use the function "storeData"
         """),
+        telemetry=False,
         # debug_mode=True
     )
     return agent 
@@ -31,8 +31,7 @@ def start_agent_jsx(session_id=None):
 def start_agent_json(session_id=None):
 
     agent = Agent(
-        # model=AwsBedrock(id="anthropic.claude-3-haiku-20240307-v1:0", temperature=0),
-        model=OpenAIChat(id="gpt-4o-mini", temperature=0),
+        model=chat_model("json"),
         description=dedent("""
             You are a helpful assistant that converts JSX to a JSON object.
         """),
@@ -225,6 +224,7 @@ def start_agent_json(session_id=None):
                 ]
             }
         """),
+        telemetry=False,
         # debug_mode=True
     )
     return agent 
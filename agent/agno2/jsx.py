@@ -0,0 +1,477 @@
+import html
+import re
+
+
+class JSXSyntaxError(ValueError):
+    """Raised when the JSX source cannot be compiled to a component tree."""
+
+    def __init__(self, message, position=None):
+        if position is not None:
+            message = f"{message} (at offset {position})"
+        super().__init__(message)
+        self.position = position
+
+
+_NAME = re.compile(r"[A-Za-z_$][\w$.\-]*")
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+_NUMBER = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_WHITESPACE = re.compile(r"\s*")
+_FENCE = re.compile(r"^\s*```[\w-]*\s*\n?|\n?\s*```\s*$")
+_ARROW_HANDLER = re.compile(r"^\(\s*\)\s*=>\s*\{?\s*([A-Za-z_$][\w$]*)\s*\(\s*\)\s*;?\s*\}?$")
+_HANDLER_CALL = re.compile(r"^([A-Za-z_$][\w$]*)\s*\(\s*\)$")
+
+_LITERALS = {"true": True, "false": False, "null": None, "undefined": None}
+
+
+def _normalize_text(text):
+    """
+    Apply the JSX whitespace rules to a run of text between tags.
+
+    Lines are trimmed, blank lines are dropped and the remaining lines are
+    joined with a single space, which is what React does at compile time.
+    """
+    lines = text.replace("\r\n", "\n").split("\n")
+    if len(lines) == 1:
+        return html.unescape(text)
+
+    parts = []
+    for index, line in enumerate(lines):
+        if index > 0:
+            line = line.lstrip(" \t")
+        if index < len(lines) - 1:
+            line = line.rstrip(" \t")
+        if line:
+            parts.append(line)
+    return html.unescape(" ".join(parts))
+
+
+class _Parser:
+    def __init__(self, source):
+        self.source = source
+        self.pos = 0
+
+    # -- low level helpers -------------------------------------------------
+
+    def error(self, message):
+        raise JSXSyntaxError(message, self.pos)
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.source[index] if index < len(self.source) else ""
+
+    def startswith(self, text):
+        return self.source.startswith(text, self.pos)
+
+    def skip_whitespace(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.source, self.pos).end()
+            if self.startswith("//"):
+                end = self.source.find("\n", self.pos)
+                self.pos = len(self.source) if end == -1 else end
+            elif self.startswith("/*"):
+                end = self.source.find("*/", self.pos + 2)
+                if end == -1:
+                    self.error("Unterminated comment")
+                self.pos = end + 2
+            else:
+                return
+
+    def expect(self, text):
+        self.skip_whitespace()
+        if not self.startswith(text):
+            self.error(f"Expected {text!r}")
+        self.pos += len(text)
+
+    def match(self, pattern, what):
+        found = pattern.match(self.source, self.pos)
+        if not found:
+            self.error(f"Expected {what}")
+        self.pos = found.end()
+        return found.group(0)
+
+    # -- elements ----------------------------------------------------------
+
+    def parse_root(self):
+        self.skip_whitespace()
+        if not self.startswith("<"):
+            self.error("Expected a JSX element")
+        nodes = self.parse_element()
+        self.skip_whitespace()
+        if self.pos != len(self.source):
+            self.error("Unexpected content after the root element")
+        if isinstance(nodes, list):
+            # A root fragment becomes a View so the renderer gets one node.
+            node = {"type": "View"}
+            _set_children(node, nodes)
+            return node
+        return nodes
+
+    def parse_element(self):
+        """Parse an element or fragment; fragments return a list of children."""
+        name, props, self_closing = self.parse_open_tag()
+        if self_closing:
+            return _make_node(name, props, [])
+        children = self.parse_children(name)
+        if name is None:
+            return children
+        return _make_node(name, props, children)
+
+    def parse_open_tag(self):
+        """Parse ``<Name attr=...>``; returns the name (None for fragments), props and self-closing flag."""
+        self.expect("<")
+        self.skip_whitespace()
+        if self.peek() == ">":
+            self.pos += 1
+            return None, {}, False
+
+        name = self.match(_NAME, "a tag name")
+        props = {}
+        while True:
+            self.skip_whitespace()
+            if self.startswith("/>"):
+                self.pos += 2
+                return name, props, True
+            if self.peek() == ">":
+                self.pos += 1
+                return name, props, False
+            if self.startswith("{..."):
+                self.error("Spread attributes are not supported")
+            key = self.match(_NAME, "an attribute name")
+            self.skip_whitespace()
+            if self.peek() == "=":
+                self.pos += 1
+                self.skip_whitespace()
+                props[key] = self.parse_attribute_value()
+            else:
+                props[key] = True
+
+    def parse_attribute_value(self):
+        quote = self.peek()
+        if quote in ("'", '"'):
+            end = self.source.find(quote, self.pos + 1)
+            if end == -1:
+                self.error("Unterminated attribute string")
+            value = html.unescape(self.source[self.pos + 1 : end])
+            self.pos = end + 1
+            return value
+        if quote == "{":
+            return self.parse_expression_container()
+        if quote == "<":
+            return self.parse_element()
+        self.error("Expected an attribute value")
+
+    def parse_children(self, name):
+        children = []
+        while True:
+            if self.pos >= len(self.source):
+                self.error(f"Unclosed element <{name or ''}>")
+            if self.startswith("</"):
+                self.pos += 2
+                self.skip_whitespace()
+                closing = _NAME.match(self.source, self.pos)
+                closing_name = closing.group(0) if closing else None
+                if closing:
+                    self.pos = closing.end()
+                if closing_name != name:
+                    self.error(f"Expected closing tag for <{name or ''}>, got </{closing_name or ''}>")
+                self.expect(">")
+                return children
+            char = self.peek()
+            if char == "<":
+                child = self.parse_element()
+                if isinstance(child, list):
+                    children.extend(child)
+                else:
+                    children.append(child)
+            elif char == "{":
+                value = self.parse_child_expression()
+                if value is not None:
+                    children.append(value)
+            else:
+                end = self.pos
+                while end < len(self.source) and self.source[end] not in "<{":
+                    end += 1
+                text = _normalize_text(self.source[self.pos : end])
+                self.pos = end
+                if text:
+                    children.append(text)
+
+    def parse_child_expression(self):
+        self.pos += 1
+        self.skip_whitespace()
+        if self.peek() == "}":
+            # Empty container, typically {/* comment */}
+            self.pos += 1
+            return None
+        value = self.parse_value(stop="}")
+        self.expect("}")
+        if value is None or isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, (dict, list)):
+            self.error("Objects are not valid as JSX children")
+        return value
+
+    # -- expressions -------------------------------------------------------
+
+    def parse_expression_container(self):
+        self.pos += 1
+        self.skip_whitespace()
+        value = self.parse_value(stop="}")
+        self.expect("}")
+        return value
+
+    def parse_value(self, stop):
+        self.skip_whitespace()
+        char = self.peek()
+        if char == "{":
+            return self.parse_object()
+        if char == "[":
+            return self.parse_array()
+        if char in ("'", '"', "`"):
+            return self.parse_string()
+        if char == "<":
+            return self.parse_element()
+
+        number = _NUMBER.match(self.source, self.pos)
+        if number:
+            after = self.source[number.end() : number.end() + 1]
+            if not after or not (after.isalnum() or after in "_$"):
+                self.pos = number.end()
+                text = number.group(0)
+                if re.fullmatch(r"-?\d+", text):
+                    return int(text)
+                return float(text)
+
+        return self.parse_raw_expression(stop)
+
+    def parse_raw_expression(self, stop):
+        """
+        Consume an arbitrary expression up to the stop character.
+
+        Identifiers and handler expressions such as ``() => handleSubmit()``
+        are reduced to the handler name, which is how the renderer resolves
+        callbacks from its parent props.
+        """
+        start = self.pos
+        depth = 0
+        while self.pos < len(self.source):
+            char = self.source[self.pos]
+            if char in ("'", '"', "`"):
+                self.parse_string()
+                continue
+            if char in "([{":
+                depth += 1
+            elif char in ")]}":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and (char == "," or char in stop):
+                break
+            self.pos += 1
+        expression = self.source[start : self.pos].strip()
+        if not expression:
+            self.error("Expected an expression")
+        if expression in _LITERALS:
+            return _LITERALS[expression]
+        if _IDENTIFIER.fullmatch(expression):
+            return expression
+        handler = _ARROW_HANDLER.match(expression) or _HANDLER_CALL.match(expression)
+        if handler:
+            return handler.group(1)
+        return expression
+
+    def parse_string(self):
+        quote = self.peek()
+        self.pos += 1
+        chunks = []
+        while True:
+            if self.pos >= len(self.source):
+                self.error("Unterminated string")
+            char = self.source[self.pos]
+            if char == "\\":
+                escaped = self.peek(1)
+                chunks.append({"n": "\n", "t": "\t", "r": "\r"}.get(escaped, escaped))
+                self.pos += 2
+                continue
+            self.pos += 1
+            if char == quote:
+                return "".join(chunks)
+            chunks.append(char)
+
+    def parse_object(self):
+        self.expect("{")
+        result = {}
+        while True:
+            self.skip_whitespace()
+            if self.peek() == "}":
+                self.pos += 1
+                return result
+            if self.peek() in ("'", '"'):
+                key = self.parse_string()
+            else:
+                key = self.match(_IDENTIFIER, "an object key")
+            self.expect(":")
+            result[key] = self.parse_value(stop=",}")
+            self.skip_whitespace()
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() != "}":
+                self.error("Expected ',' or '}' in object")
+
+    def parse_array(self):
+        self.expect("[")
+        result = []
+        while True:
+            self.skip_whitespace()
+            if self.peek() == "]":
+                self.pos += 1
+                return result
+            result.append(self.parse_value(stop=",]"))
+            self.skip_whitespace()
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() != "]":
+                self.error("Expected ',' or ']' in array")
+
+
+def _set_children(node, children):
+    if not children:
+        return
+    if all(isinstance(child, str) for child in children):
+        node["children"] = "".join(children)
+    else:
+        # Whitespace between sibling elements carries no meaning on mobile
+        node["children"] = [child for child in children if not isinstance(child, str) or child.strip()]
+
+
+def _make_node(name, props, children):
+    node = {"type": name}
+    if props:
+        node["props"] = props
+    _set_children(node, children)
+    return node
+
+
+def strip_code_fences(source):
+    """
+    Remove markdown code fences and any prose before the first tag.
+
+    The JSX agent is told not to emit ```jsx``` blocks but occasionally does.
+    """
+    source = _FENCE.sub("", source.strip())
+    match = re.search(r"<[A-Za-z>]", source)
+    if match:
+        source = source[match.start() :]
+    return source
+
+
+_ROOT_START = re.compile(r"<[A-Za-z>]")
+
+
+class JSXStreamParser:
+    """
+    Incrementally compile JSX as it is streamed from the model.
+
+    Text is appended with :meth:`feed`, which returns the direct children of
+    the root element that have been fully received since the last call, so
+    the client can render them before the rest of the screen arrives. Call
+    :meth:`close` once the stream ends to get the complete tree.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.root = None
+        self.cursor = None
+        self.emitted = 0
+
+    def feed(self, text):
+        """
+        Append streamed text.
+
+        Returns:
+            list: ``(index, node)`` pairs for each newly completed child element.
+        """
+        self.buffer += text
+        if self.root is None and not self._parse_root_tag():
+            return []
+
+        completed = []
+        while self.cursor is not None:
+            parser = _Parser(self.buffer)
+            parser.pos = self.cursor
+            parser.skip_whitespace()
+            if parser.pos >= len(self.buffer) or parser.startswith("</"):
+                break
+            if parser.peek() != "<":
+                # Skip text and expressions; they only become final once the next tag starts
+                parser.pos = _skip_until_tag(self.buffer, parser.pos)
+                if parser.pos >= len(self.buffer):
+                    break
+                self.cursor = parser.pos
+                continue
+            try:
+                node = parser.parse_element()
+            except JSXSyntaxError:
+                # Most likely the element is still being streamed
+                break
+            self.cursor = parser.pos
+            for child in node if isinstance(node, list) else [node]:
+                completed.append((self.emitted, child))
+                self.emitted += 1
+        return completed
+
+    def _parse_root_tag(self):
+        match = _ROOT_START.search(self.buffer)
+        if match is None:
+            return False
+        parser = _Parser(self.buffer)
+        parser.pos = match.start()
+        try:
+            name, props, self_closing = parser.parse_open_tag()
+        except JSXSyntaxError:
+            return False
+        self.root = (name, props)
+        self.cursor = None if self_closing else parser.pos
+        return True
+
+    def close(self):
+        """Compile the complete buffer and return the final component tree."""
+        return compile_jsx(self.buffer)
+
+
+def _skip_until_tag(source, pos):
+    depth = 0
+    while pos < len(source):
+        char = source[pos]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif char == "<" and depth == 0:
+            return pos
+        pos += 1
+    return pos
+
+
+def compile_jsx(source):
+    """
+    Compile React Native JSX into the JSON component tree used by the mobile app.
+
+    The output follows the schema consumed by DynamicComponentRenderer:
+    ``{"type": ..., "props": {...}, "children": [...] | "text"}``. Handler
+    references such as ``{handleSubmit}`` are emitted as their name.
+
+    Args:
+        source (str): The JSX produced by the JSX agent.
+
+    Returns:
+        dict: The component tree.
+
+    Raises:
+        JSXSyntaxError: If the source is not valid JSX.
+    """
+    if not isinstance(source, str):
+        raise JSXSyntaxError("JSX source must be a string")
+    return _Parser(strip_code_fences(source)).parse_root()
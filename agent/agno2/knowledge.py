@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agno.embedder.base import Embedder
+from agno.embedder.openai import OpenAIEmbedder
+
+from .vectordb import LocalVectorDb
+
+KNOWLEDGE_DIR = Path(__file__).resolve().parent / "data" / "txt_files"
+MANIFEST_PATH = Path("tmp") / "knowledge_manifest.json"
+MANIFEST_VERSION = 1
+PGVECTOR_URL = "postgresql+psycopg://ai:ai@localhost:5532/ai"
+
+
+def knowledge_vector_db():
+    """
+    Return the vector db backing the knowledge base.
+
+    The process documents are indexed in a LocalVectorDb under
+    KNOWLEDGE_INDEX (default tmp/knowledge_index). Set KNOWLEDGE_DB=pgvector
+    to use the Postgres server at KNOWLEDGE_DB_URL instead.
+    """
+    if os.getenv("KNOWLEDGE_DB") == "pgvector":
+        from agno.vectordb.pgvector import PgVector
+
+        # Table name: ai.text_documents
+        return PgVector(table_name="text_documents", db_url=os.getenv("KNOWLEDGE_DB_URL", PGVECTOR_URL))
+    return LocalVectorDb(os.getenv("KNOWLEDGE_INDEX", "tmp/knowledge_index"))
+
+
+def file_digest(path):
+    """Return the sha256 of a knowledge file's content."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def index_signature(vector_db):
+    """
+    Describe the index the vectors were written to.
+
+    A manifest written for a different table, embedder or dimension count
+    does not describe the current index and forces a full rebuild.
+    """
+    embedder = vector_db.embedder
+    return {
+        "vector_db": type(vector_db).__name__,
+        "table": getattr(vector_db, "table_name", None) or str(getattr(vector_db, "path", "")),
+        "embedder": getattr(embedder, "id", type(embedder).__name__),
+        "dimensions": embedder.dimensions,
+    }
+
+
+def load_manifest(path):
+    try:
+        manifest = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically so a crash never leaves a half-written file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def embed_batch(embedder, texts, batch_size=100):
+    """
+    Embed many texts with as few provider requests as possible.
+
+    Args:
+        embedder (Embedder): The knowledge base's embedder.
+        texts (list[str]): The texts to embed.
+        batch_size (int): Maximum number of texts per embedding request.
+
+    Returns:
+        dict: text -> embedding.
+    """
+    unique = list(dict.fromkeys(texts))
+    embeddings = {}
+    if isinstance(embedder, OpenAIEmbedder):
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start : start + batch_size]
+            # The embeddings endpoint takes a list of inputs as well as a single string
+            response = embedder.response(text=batch)
+            for item in response.data:
+                embeddings[batch[item.index]] = item.embedding
+    else:
+        for text in unique:
+            embeddings[text] = embedder.get_embedding(text)
+    return embeddings
+
+
+@dataclass
+class PrecomputedEmbedder(Embedder):
+    """Serves embeddings computed by :func:`embed_batch` to ``vector_db.insert``."""
+
+    embedder: Optional[Embedder] = None
+    embeddings: Dict[str, List[float]] = field(default_factory=dict)
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding_and_usage(text)[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        embedding = self.embeddings.get(text)
+        if embedding is None:
+            return self.embedder.get_embedding_and_usage(text)
+        return embedding, None
+
+
+def delete_documents(vector_db, names):
+    """Delete every chunk of the named documents from the vector db."""
+    if not names:
+        return
+    if hasattr(vector_db, "delete_names"):
+        vector_db.delete_names(names)
+        return
+
+    # PgVector can only delete the whole table
+    from sqlalchemy import delete
+
+    with vector_db.Session() as sess:
+        sess.execute(delete(vector_db.table).where(vector_db.table.c.name.in_(list(names))))
+        sess.commit()
+
+
+def knowledge_files(knowledge_base):
+    """Return document name -> path for every file the knowledge base would load."""
+    root = Path(knowledge_base.path)
+    paths = [root] if root.is_file() else sorted(root.glob("**/*"))
+    return {path.stem: path for path in paths if path.suffix in knowledge_base.formats}
+
+
+def sync_knowledge(knowledge_base, manifest_path=MANIFEST_PATH, batch_size=100, recreate=False, dry_run=False):
+    """
+    Bring the vector db in line with the knowledge files, re-embedding only what changed.
+
+    Each file is hashed and compared with the manifest of the last sync.
+    Chunks of new and modified files are embedded in batched requests and
+    written with bulk inserts; rows of modified and deleted files are removed
+    first. The manifest is only updated after the vectors are written, so an
+    interrupted sync is redone on the next run.
+
+    Args:
+        knowledge_base (TextKnowledgeBase): The knowledge base to index.
+        manifest_path (str | Path): Where the record of indexed files is kept.
+        batch_size (int): Texts per embedding request and rows per insert.
+        recreate (bool): Drop the index and re-embed every file.
+        dry_run (bool): Only report what would change.
+
+    Returns:
+        dict: The ``added``, ``updated``, ``removed`` and ``unchanged`` document
+        names, the number of ``chunks`` embedded and ``seconds`` spent.
+    """
+    started = time.perf_counter()
+    vector_db = knowledge_base.vector_db
+    files = knowledge_files(knowledge_base)
+    digests = {name: file_digest(path) for name, path in files.items()}
+
+    manifest = load_manifest(manifest_path)
+    signature = index_signature(vector_db)
+    if recreate or manifest is None or manifest["index"] != signature or not vector_db.exists():
+        rebuild = True
+        indexed = {}
+    else:
+        rebuild = False
+        indexed = manifest["files"]
+
+    added = sorted(name for name in digests if name not in indexed)
+    updated = sorted(name for name in digests if name in indexed and indexed[name]["sha256"] != digests[name])
+    removed = sorted(name for name in indexed if name not in digests)
+    unchanged = sorted(name for name in digests if name in indexed and name not in updated)
+    summary = {"added": added, "updated": updated, "removed": removed, "unchanged": unchanged, "chunks": 0}
+
+    if dry_run:
+        summary["seconds"] = time.perf_counter() - started
+        return summary
+
+    if rebuild:
+        if vector_db.exists():
+            vector_db.drop()
+        vector_db.create()
+
+    delete_documents(vector_db, updated + removed)
+
+    documents = {name: knowledge_base.reader.read(file=files[name]) for name in added + updated}
+    chunks = [document for name in added + updated for document in documents[name]]
+    if chunks:
+        embedder = vector_db.embedder
+        embeddings = embed_batch(embedder, [chunk.content for chunk in chunks], batch_size)
+        vector_db.embedder = PrecomputedEmbedder(embedder=embedder, dimensions=embedder.dimensions, embeddings=embeddings)
+        try:
+            vector_db.insert(chunks, batch_size=batch_size)
+        finally:
+            vector_db.embedder = embedder
+
+    files_manifest = {name: entry for name, entry in indexed.items() if name in unchanged}
+    for name in added + updated:
+        files_manifest[name] = {
+            "path": str(files[name]),
+            "sha256": digests[name],
+            "chunks": len(documents[name]),
+        }
+    save_manifest(
+        manifest_path,
+        {"version": MANIFEST_VERSION, "index": signature, "files": files_manifest, "synced_at": time.time()},
+    )
+
+    summary["chunks"] = len(chunks)
+    summary["seconds"] = time.perf_counter() - started
+    return summary
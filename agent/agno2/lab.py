@@ -1,72 +1,236 @@
-import logging
-import boto3
 import json
+import logging
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError
 from dotenv import load_dotenv
-from pathlib import Path
 
+from .metrics import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
 
 # amazon.titan-text-premier-v1:0
 # us.meta.llama3-3-70b-instruct-v1:0
+DEFAULT_MODEL = "us.meta.llama3-3-70b-instruct-v1:0"
+
+BEDROCK_MAX_CONNECTIONS = int(os.getenv("BEDROCK_MAX_CONNECTIONS", "50"))
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "5"))
+# Full jitter backoff: attempt n sleeps a random time up to min(cap, base * 2**n) seconds
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 8.0
+# Error codes worth retrying; anything else is raised at once
+RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+}
+
+_runtimes = {}
+_runtimes_lock = threading.Lock()
+# Threads infer_many runs the prompts on, one per pooled connection
+_executor = ThreadPoolExecutor(max_workers=BEDROCK_MAX_CONNECTIONS, thread_name_prefix="bedrock")
+
+
+def shared_runtime(region, retries=False):
+    """
+    Return the process-wide bedrock-runtime client for ``region``.
+
+    boto3 clients are thread safe; sharing one keeps a single connection pool
+    of ``BEDROCK_MAX_CONNECTIONS`` connections. botocore's own retries are
+    off, :class:`BedrockClient` retries with jittered backoff itself. With
+    ``retries``, a separate client retries in botocore's standard mode (up
+    to ``BEDROCK_MAX_ATTEMPTS`` attempts), for callers like agno's AwsBedrock
+    that do not retry on their own.
+    """
+    key = (region, retries)
+    with _runtimes_lock:
+        client = _runtimes.get(key)
+        if client is None:
+            client = boto3.client(
+                service_name="bedrock-runtime",
+                region_name=region,
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                config=Config(
+                    max_pool_connections=BEDROCK_MAX_CONNECTIONS,
+                    connect_timeout=5,
+                    read_timeout=60,
+                    tcp_keepalive=True,
+                    retries=(
+                        {"mode": "standard", "total_max_attempts": BEDROCK_MAX_ATTEMPTS}
+                        if retries
+                        else {"total_max_attempts": 1}
+                    ),
+                ),
+            )
+            _runtimes[key] = client
+    return client
+
+
+def _error_code(error):
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code", "ClientError")
+    return type(error).__name__
+
+
+def _retryable(error):
+    return isinstance(error, BotoConnectionError) or _error_code(error) in RETRYABLE_ERRORS
+
+
+def _token_count(response, header, data, field):
+    headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+    value = headers.get(header, data.get(field))
+    return int(value) if value is not None else 0
 
 
 class BedrockClient:
-    def __init__(
-        self, region="us-east-1", model_id="us.meta.llama3-3-70b-instruct-v1:0"
-    ):
+    """
+    Text generation with a Bedrock model (Llama's request format).
+
+    Every instance for a region shares one pooled runtime client, see
+    :func:`shared_runtime`. Throttled and transiently failing calls are
+    retried up to ``max_attempts`` times with full jitter backoff, then the
+    last error is raised. Latencies, tokens, retries and errors are recorded
+    in :data:`agno2.metrics.metrics` as ``bedrock_*``; prompts and outputs are
+    never logged.
+    """
+
+    def __init__(self, region="us-east-1", model_id=DEFAULT_MODEL, client=None, max_attempts=BEDROCK_MAX_ATTEMPTS):
+        """
+        Args:
+            region (str): AWS region of the runtime endpoint.
+            model_id (str): Bedrock model or inference profile id.
+            client: A bedrock-runtime client to use instead of the shared one,
+                e.g. one wrapped in a botocore ``Stubber``.
+            max_attempts (int): Calls made before giving up on a retryable error.
+        """
+        self.bedrock_runtime = client or shared_runtime(region)
+        self.model_id = model_id
+        self.max_attempts = max_attempts
         self.inference_counter = 0
-        # Load environment variables
-        load_dotenv()
-
-        # Initialize Bedrock runtime client
-        self.bedrock_runtime = boto3.client(
-            service_name="bedrock-runtime",
-            region_name=region,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        self._counter_lock = threading.Lock()
+
+    def _body(self, prompt, temperature):
+        return json.dumps({"prompt": prompt, "temperature": temperature, "top_p": 0.9})
+
+    def _call(self, operation, body):
+        """Invoke ``operation`` with retries and return the response and the seconds it took."""
+        with self._counter_lock:
+            self.inference_counter += 1
+        call = getattr(self.bedrock_runtime, operation)
+        for attempt in range(self.max_attempts):
+            started = time.perf_counter()
+            try:
+                response = call(body=body, modelId=self.model_id, accept="application/json", contentType="application/json")
+                return response, time.perf_counter() - started
+            except (ClientError, BotoConnectionError) as e:
+                code = _error_code(e)
+                if not _retryable(e) or attempt + 1 == self.max_attempts:
+                    metrics.inc("bedrock_errors_total", model=self.model_id, code=code)
+                    raise
+                metrics.inc("bedrock_retries_total", model=self.model_id, code=code)
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+                logger.warning("BRC: %s on %s, retrying in %.2fs", code, self.model_id, delay)
+                time.sleep(delay)
+
+    def _record(self, seconds, input_tokens, output_tokens):
+        metrics.observe("bedrock_call_duration_seconds", seconds, model=self.model_id)
+        metrics.inc("bedrock_tokens_total", input_tokens, model=self.model_id, type="input")
+        metrics.inc("bedrock_tokens_total", output_tokens, model=self.model_id, type="output")
+        logger.debug(
+            "BRC: %s answered in %.3fs, %d input and %d output tokens", self.model_id, seconds, input_tokens, output_tokens
         )
-        self.model_id = model_id
 
-    def __del__(self):
-        print(f"BRC: num of inference counts: {self.inference_counter}")
+    def infer(self, prompt, logger=None, temperature=0.2):
+        """
+        Send an inference request and return the generated text.
+
+        Args:
+            prompt (str): Input prompt to the model.
+            logger (logging.Logger): Unused, kept for existing callers.
+            temperature (float): Sampling temperature.
 
-    def infer(self, prompt, logger=logging.getLogger(), temperature=0.2):
-        self.inference_counter += 1
-        newline = "\n"
-        logger.info(f"BRC: inferring {prompt.replace(newline, ' ')}")
+        Returns:
+            str: The model's generation, ``None`` if the response has none.
+
+        Raises:
+            botocore.exceptions.ClientError: If the model call fails, after
+                the retries for throttling and transient errors.
         """
-        Send inference request to AWS Bedrock model and return generated output.
-        :param prompt: str - Input prompt to the model
-        :param temperature: decimal - temperature
-        :return: str - Model-generated response
+        response, seconds = self._call("invoke_model", self._body(prompt, temperature))
+        data = json.loads(response["body"].read())
+        self._record(
+            seconds,
+            _token_count(response, "x-amzn-bedrock-input-token-count", data, "prompt_token_count"),
+            _token_count(response, "x-amzn-bedrock-output-token-count", data, "generation_token_count"),
+        )
+        return data.get("generation")
+
+    def infer_many(self, prompts, temperature=0.2, return_exceptions=False):
         """
-        # Prepare the request payload
-        body = json.dumps({"prompt": prompt, "temperature": temperature, "top_p": 0.9})
-
-        try:
-            # Send inference request
-            response = self.bedrock_runtime.invoke_model(
-                body=body,
-                modelId=self.model_id,
-                accept="application/json",
-                contentType="application/json",
-            )
+        Run :meth:`infer` for every prompt concurrently, on the shared connection pool.
 
-            # Read and decode response body
-            response_body = response["body"].read().decode("utf-8")
-            response_data = json.loads(response_body)
-            logger.info(f"BRC: inference results: {response_data}")
+        Args:
+            prompts (list): Input prompts.
+            temperature (float): Sampling temperature.
+            return_exceptions (bool): Put a failed prompt's exception in its
+                place in the results instead of raising it.
 
-            # Return the generated output
-            return response_data.get("generation", None)
+        Returns:
+            list: The generations, in the order of ``prompts``.
+        """
+        futures = [_executor.submit(self.infer, prompt, temperature=temperature) for prompt in prompts]
+        results = []
+        for future in futures:
+            error = future.exception()
+            if error is not None and not return_exceptions:
+                raise error
+            results.append(error if error is not None else future.result())
+        return results
 
-        except Exception as e:
-            print(f"❌ Error during inference: {e}")
-            return None
+    def infer_stream(self, prompt, temperature=0.2):
+        """
+        Stream the generation with ``invoke_model_with_response_stream``.
+
+        Only opening the stream is retried; an error in the middle of it is
+        raised, since the text already yielded cannot be taken back.
+
+        Yields:
+            str: Pieces of the generated text as they arrive.
+        """
+        response, opened = self._call("invoke_model_with_response_stream", self._body(prompt, temperature))
+        started = time.perf_counter() - opened
+        first = True
+        input_tokens = output_tokens = 0
+        for event in response["body"]:
+            if "chunk" not in event:
+                # Errors arrive as events, e.g. {"throttlingException": {"message": ...}}
+                code, detail = next(iter(event.items()))
+                metrics.inc("bedrock_errors_total", model=self.model_id, code=code)
+                raise RuntimeError(f"Bedrock stream failed with {code}: {detail.get('message', '')}")
+            data = json.loads(event["chunk"]["bytes"])
+            invocation = data.get("amazon-bedrock-invocationMetrics", {})
+            input_tokens = invocation.get("inputTokenCount", data.get("prompt_token_count") or input_tokens)
+            output_tokens = invocation.get("outputTokenCount", data.get("generation_token_count") or output_tokens)
+            if data.get("generation"):
+                if first:
+                    metrics.observe("bedrock_first_token_seconds", time.perf_counter() - started, model=self.model_id)
+                    first = False
+                yield data["generation"]
+        self._record(time.perf_counter() - started, input_tokens, output_tokens)
 
 
 if __name__ == "__main__":
-    load_dotenv()
     bedrock_control = boto3.client(
         service_name="bedrock",
         region_name="us-west-2",  # or your relevant region
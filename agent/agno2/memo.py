@@ -0,0 +1,76 @@
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_scope = ContextVar("memo_scope", default=None)
+
+
+class MemoScope:
+    __slots__ = ("entries", "locks", "hits", "misses")
+
+    def __init__(self):
+        self.entries = {}
+        self.locks = {}
+        self.hits = 0
+        self.misses = 0
+
+
+@contextmanager
+def memo_scope():
+    """
+    Memoize :func:`memoized` reads for the duration of the block, typically one agent turn.
+
+    Nested scopes share the outer one. Tool calls agno runs in worker threads
+    see the scope too, as ``asyncio.to_thread`` copies the context.
+    """
+    scope = _scope.get()
+    if scope is not None:
+        yield scope
+        return
+    scope = MemoScope()
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def memoized(func):
+    """
+    Cache a read-only function's result per argument tuple within the current memo scope.
+
+    Outside a scope the function is simply called. Cached values are shared
+    between callers and must not be mutated. Concurrent tool calls asking for
+    the same key wait for the first one instead of repeating the read.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        scope = _scope.get()
+        if scope is None:
+            return func(*args)
+        key = (func.__name__, *args)
+        try:
+            value = scope.entries[key]
+        except KeyError:
+            with scope.locks.setdefault(key, threading.Lock()):
+                if key in scope.entries:
+                    scope.hits += 1
+                    return scope.entries[key]
+                scope.misses += 1
+                value = scope.entries[key] = func(*args)
+        else:
+            scope.hits += 1
+        return value
+
+    return wrapper
+
+
+def invalidate(*args):
+    """Drop every memoized entry called with any of ``args``, e.g. after a write for a user_id."""
+    scope = _scope.get()
+    if scope is None:
+        return
+    for key in [key for key in scope.entries if any(arg in key[1:] for arg in args)]:
+        scope.entries.pop(key, None)
@@ -0,0 +1,246 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; the pipeline spans sub-millisecond compiles to multi-second model calls
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_trace = ContextVar("request_trace", default=None)
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(DURATION_BUCKETS, value)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    In-process counters and duration histograms, rendered in the Prometheus text format.
+
+    Besides what is recorded here, ``register_stats`` exports the ``stats()``
+    of the pools and caches as gauges when the metrics are rendered.
+    """
+
+    def __init__(self, namespace="agent"):
+        self.namespace = namespace
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._stats = []
+        self._lock = threading.Lock()
+
+    def _key(self, name, labels):
+        return f"{self.namespace}_{name}", tuple(sorted(labels.items()))
+
+    def describe(self, name, help_text):
+        self._help[f"{self.namespace}_{name}"] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def register_stats(self, name, stats, label=None):
+        """
+        Export a ``stats()`` callable as gauges named ``<name>_<key>``.
+
+        With ``label``, ``stats`` returns one dict of numbers per label value,
+        like :meth:`AgentPool.stats` does per pool.
+        """
+        with self._lock:
+            self._stats = [entry for entry in self._stats if entry[0] != name] + [(name, stats, label)]
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def histogram_count(self, name, **labels):
+        with self._lock:
+            histogram = self._histograms.get(self._key(name, labels))
+            return histogram.count if histogram is not None else 0
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _gauges(self):
+        with self._lock:
+            registered = list(self._stats)
+        gauges = {}
+        for name, stats, label in registered:
+            values = stats()
+            groups = values.items() if label else [(None, values)]
+            for label_value, group in groups:
+                labels = ((label, label_value),) if label else ()
+                for key, value in group.items():
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    gauges.setdefault(f"{self.namespace}_{name}_{key}", []).append((labels, value))
+        return gauges
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.buckets), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        previous = None
+        for (name, labels), value in counters:
+            if name != previous:
+                header(name, "counter")
+                previous = name
+            lines.append(f"{name}{_labels_text(labels)} {value}")
+
+        for (name, labels), (buckets, total, count) in histograms:
+            if name != previous:
+                header(name, "histogram")
+                previous = name
+            cumulative = 0
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_labels_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels_text(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {total}")
+            lines.append(f"{name}_count{_labels_text(labels)} {count}")
+
+        for name, samples in sorted(self._gauges().items()):
+            header(name, "gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("request_duration_seconds", "Time to answer an API request.")
+metrics.describe("stage_duration_seconds", "Time spent in each pipeline stage.")
+metrics.describe("tool_call_duration_seconds", "Time spent in each tool call.")
+metrics.describe("model_call_duration_seconds", "Time spent in each model call, per agent.")
+metrics.describe("tokens_total", "Model tokens, per agent and direction.")
+
+
+class Trace:
+    """Timing spans of one request, in the order they ended."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    def totals(self):
+        """Seconds per span name, repeated spans summed, in first-seen order."""
+        totals = {}
+        with self._lock:
+            for name, seconds in self.spans:
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def server_timing(self):
+        """Format the spans as a ``Server-Timing`` header value."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.totals().items())
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def request_trace(view):
+    """Collect the spans of one request to ``view`` and record its duration."""
+    trace = Trace()
+    token = _trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+        elapsed = time.perf_counter() - started
+        trace.add("total", elapsed)
+        metrics.observe("request_duration_seconds", elapsed, view=view)
+
+
+@contextmanager
+def span(stage, trace=None):
+    """
+    Time a pipeline stage into the stage histogram and a request's trace.
+
+    The trace defaults to the current request's; generators, which may be
+    resumed in another context, pass theirs explicitly.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("stage_duration_seconds", elapsed, stage=stage)
+        trace = trace or _trace.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+def record_run(agent, run_response, trace=None):
+    """
+    Record the model calls, tool calls and tokens of a finished agent run.
+
+    Args:
+        agent (str): The agent's pool name, used as a label.
+        run_response (RunResponse): The run's response; its ``metrics`` hold
+            the per model call times and token counts, its tool messages the
+            tool call times.
+        trace (Trace): The request's trace, by default the current one.
+    """
+    if run_response is None:
+        return
+    trace = trace or _trace.get()
+    run_metrics = run_response.metrics or {}
+    for seconds in run_metrics.get("time") or []:
+        metrics.observe("model_call_duration_seconds", seconds, agent=agent)
+    for direction in ("input", "output"):
+        tokens = sum(run_metrics.get(f"{direction}_tokens") or [])
+        if tokens:
+            metrics.inc("tokens_total", tokens, agent=agent, type=direction)
+    for message in run_response.messages or []:
+        if message.role != "tool" or message.from_history or message.metrics.time is None:
+            continue
+        metrics.observe("tool_call_duration_seconds", message.metrics.time, tool=message.tool_name)
+        if trace is not None:
+            trace.add(f"tool.{message.tool_name}", message.metrics.time)
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+
+import httpx
+from agno.models.aws import AwsBedrock
+from agno.models.openai import OpenAIChat
+from openai import AsyncOpenAI as AsyncOpenAIClient
+from openai import OpenAI as OpenAIClient
+
+from .flows import FlowScript
+from .lab import shared_runtime
+from .parallel import ParallelToolCalls
+from .routing import DEFAULT_BUDGETS, STAGES, RoutedModel
+from .stub import StubModel, default_script
+
+# Connection pool shared by every agent in the process
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _client_key(params):
+    return tuple(sorted((key, str(value)) for key, value in params.items()))
+
+
+def shared_client(params):
+    """Return the process-wide OpenAI client for these client parameters."""
+    key = _client_key(params)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAIClient(**params, http_client=httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT))
+            _clients[key] = client
+    return client
+
+
+def shared_async_client(params):
+    """
+    Return the async OpenAI client for these client parameters.
+
+    httpx async connections are bound to the event loop that opened them, so
+    one client is kept per running loop.
+    """
+    key = _client_key(params)
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAIClient(**params, http_client=httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT))
+            clients[key] = client
+    return client
+
+
+@dataclass
+class PooledOpenAIChat(ParallelToolCalls, OpenAIChat):
+    """
+    OpenAIChat that reuses the shared, pooled HTTP clients instead of opening its own.
+
+    Independent read-only tool calls of a turn run concurrently, see :class:`ParallelToolCalls`.
+    """
+
+    def get_client(self) -> OpenAIClient:
+        if self.client is None:
+            self.client = shared_client(self._get_client_params())
+        return self.client
+
+    def get_async_client(self) -> AsyncOpenAIClient:
+        return shared_async_client(self._get_client_params())
+
+
+# The models each stage uses unless MODEL_<STAGE> says otherwise
+DEFAULT_MODELS = {stage: "openai:gpt-4o-mini" for stage in STAGES}
+
+
+def provider_model(spec):
+    """
+    Build a model from a ``provider:model id`` spec.
+
+    ``openai:gpt-4o-mini`` is a pooled OpenAIChat and
+    ``bedrock:anthropic.claude-3-haiku-20240307-v1:0`` an AwsBedrock model on
+    the shared bedrock-runtime client of AWS_DEFAULT_REGION that retries
+    throttled and transient errors.
+    """
+    provider, _, model_id = spec.strip().partition(":")
+    if provider == "openai":
+        return PooledOpenAIChat(id=model_id, temperature=0)
+    if provider == "bedrock":
+        return AwsBedrock(id=model_id, temperature=0, client=shared_runtime(os.getenv("AWS_DEFAULT_REGION", "us-east-1"), retries=True))
+    raise ValueError(f"Unknown model provider {provider!r} in {spec!r}, use openai or bedrock")
+
+
+def chat_model(stage="reasoning"):
+    """
+    Return the chat model a pipeline stage uses.
+
+    ``stage`` is one of :data:`STAGES`: ``reasoning`` for the process agent,
+    ``jsx`` and ``json`` for the rendering agents. MODEL_<STAGE> lists the
+    stage's models in order of preference, comma separated ``provider:model
+    id`` specs, and MODEL_<STAGE>_BUDGET its p95 latency budget in seconds;
+    see :class:`RoutedModel` for how the budget picks, hedges and fails over
+    between them.
+
+    Set AGENT_MODEL=stub to run the whole pipeline offline against StubModel;
+    STUB_MODEL_LATENCY (seconds) simulates the provider round trip. With
+    STUB_MODEL_SCRIPT=flows the stub plays the scripted process flows, with
+    STUB_MALFORMED_JSX of the screens sent to the JSON agent fallback.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage {stage!r}, expected one of {', '.join(STAGES)}")
+    if os.getenv("AGENT_MODEL") == "stub":
+        script = default_script
+        if os.getenv("STUB_MODEL_SCRIPT") == "flows":
+            script = FlowScript(malformed_jsx=float(os.getenv("STUB_MALFORMED_JSX", "0")))
+        return StubModel(latency=float(os.getenv("STUB_MODEL_LATENCY", "0")), script=script)
+    specs = os.getenv(f"MODEL_{stage.upper()}") or DEFAULT_MODELS[stage]
+    return RoutedModel(
+        stage=stage,
+        models=[provider_model(spec) for spec in specs.split(",") if spec.strip()],
+        budget=float(os.getenv(f"MODEL_{stage.upper()}_BUDGET") or DEFAULT_BUDGETS[stage]),
+    )
@@ -0,0 +1,91 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+from agno.tools.function import FunctionCall
+
+# agno's own knowledge search only reads the vector db
+READ_ONLY_TOOL_NAMES = frozenset({"search_knowledge_base"})
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def read_only(func):
+    """Tag a tool as read-only: the model's calls to it may run concurrently."""
+    func.read_only = True
+    return func
+
+
+def mutating(func):
+    """Tag a tool as mutating: its calls always run alone, in the order the model made them."""
+    func.read_only = False
+    return func
+
+
+def is_read_only(function_call: FunctionCall) -> bool:
+    """Whether a call may run in parallel. Untagged tools are treated as mutating."""
+    function = function_call.function
+    return function.name in READ_ONLY_TOOL_NAMES or getattr(function.entrypoint, "read_only", False) is True
+
+
+def tool_batches(function_calls: List[FunctionCall]) -> List[List[FunctionCall]]:
+    """
+    Split one model turn's calls into batches that run one after the other.
+
+    Consecutive read-only calls share a batch; every mutating call gets its
+    own, so reads made before or after a write keep their order around it.
+    """
+    batches = []
+    for function_call in function_calls:
+        if batches and is_read_only(function_call) and is_read_only(batches[-1][-1]):
+            batches[-1].append(function_call)
+        else:
+            batches.append([function_call])
+    return batches
+
+
+class ParallelToolCalls:
+    """
+    Model mixin running the independent read-only tool calls of a turn concurrently.
+
+    agno runs a turn's tool calls one by one in ``run`` and gathers all of
+    them, mutations included, in ``arun``. With this mixin both paths run the
+    calls in :func:`tool_batches` order: the calls of a read-only batch run on
+    a bounded thread pool (``TOOL_WORKERS``) or are gathered, and mutating
+    calls run alone. Results are reported in the order the model made the
+    calls. Workers run in a copy of the caller's context, so they share the
+    turn's memo scope.
+    """
+
+    def _run_function_call(self, function_call: FunctionCall):
+        results: List[Message] = []
+        responses = list(super().run_function_calls([function_call], results))
+        return responses, results
+
+    def run_function_calls(
+        self, function_calls: List[FunctionCall], function_call_results: List[Message]
+    ) -> Iterator[ModelResponse]:
+        if self._function_call_stack is None:
+            self._function_call_stack = []
+        for batch in tool_batches(function_calls):
+            if len(batch) == 1:
+                yield from super().run_function_calls(batch, function_call_results)
+                continue
+            futures = [
+                _executor.submit(contextvars.copy_context().run, self._run_function_call, function_call)
+                for function_call in batch
+            ]
+            for future in futures:
+                responses, results = future.result()
+                yield from responses
+                function_call_results.extend(results)
+
+    async def arun_function_calls(self, function_calls: List[FunctionCall], function_call_results: List[Message]):
+        for batch in tool_batches(function_calls):
+            async for response in super().arun_function_calls(batch, function_call_results):
+                yield response
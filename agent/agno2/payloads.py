@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Response formats a client can ask for; "tree" is the plain component tree
+PAYLOAD_FORMATS = ("tree", "interned", "patch")
+
+STYLE_REF = "$style"
+
+
+def tree_digest(tree):
+    """Short digest identifying a component tree, sent so the client can name its base."""
+    canonical = json.dumps(tree, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+
+def payload_size(payload):
+    return len(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode())
+
+
+def intern_styles(values):
+    """
+    Replace the ``style`` props of every node in ``values`` by an index into a shared table.
+
+    The trees repeat the same few style objects on every label, input and
+    row; each distinct style is sent once and nodes carry ``"$style": index``
+    in its place.
+
+    Args:
+        values (list): Component trees (or patch values) to rewrite.
+
+    Returns:
+        tuple: The rewritten values and the list of styles.
+    """
+    styles = []
+    index = {}
+
+    def visit(node):
+        if isinstance(node, list):
+            return [visit(child) for child in node]
+        if not isinstance(node, dict):
+            return node
+        node = dict(node)
+        props = node.get("props")
+        if isinstance(props, dict) and isinstance(props.get("style"), dict):
+            props = dict(props)
+            key = json.dumps(props.pop("style"), sort_keys=True)
+            if key not in index:
+                index[key] = len(styles)
+                styles.append(json.loads(key))
+            props[STYLE_REF] = index[key]
+            node["props"] = props
+        if "children" in node:
+            node["children"] = visit(node["children"])
+        return node
+
+    return [visit(value) for value in values], styles
+
+
+def expand_styles(node, styles):
+    """Inverse of :func:`intern_styles` for one value."""
+    if isinstance(node, list):
+        return [expand_styles(child, styles) for child in node]
+    if not isinstance(node, dict):
+        return node
+    node = dict(node)
+    props = node.get("props")
+    if isinstance(props, dict) and STYLE_REF in props:
+        props = dict(props)
+        props["style"] = styles[props.pop(STYLE_REF)]
+        node["props"] = props
+    if "children" in node:
+        node["children"] = expand_styles(node["children"], styles)
+    return node
+
+
+def _pointer(path, key):
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def diff_tree(old, new, path=""):
+    """
+    Return the JSON Patch (RFC 6902 add, remove and replace operations) turning ``old`` into ``new``.
+
+    Objects are compared key by key and lists index by index, with the
+    trailing elements added or removed, which suits screens that keep their
+    layout from one turn to the next.
+    """
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    if isinstance(old, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+            else:
+                ops.extend(diff_tree(old[key], value, _pointer(path, key)))
+        return ops
+    if isinstance(old, list):
+        ops = []
+        for index in range(min(len(old), len(new))):
+            ops.extend(diff_tree(old[index], new[index], _pointer(path, index)))
+        for index in range(len(old), len(new)):
+            ops.append({"op": "add", "path": _pointer(path, index), "value": new[index]})
+        # Remove from the end so the indexes stay valid
+        for index in range(len(old) - 1, len(new) - 1, -1):
+            ops.append({"op": "remove", "path": _pointer(path, index)})
+        return ops
+    if old != new:
+        return [{"op": "replace", "path": path, "value": new}]
+    return []
+
+
+def apply_patch(tree, ops):
+    """Apply the operations :func:`diff_tree` produces and return the new tree."""
+    tree = json.loads(json.dumps(tree))
+    for op in ops:
+        if op["path"] == "":
+            tree = op["value"]
+            continue
+        keys = [key.replace("~1", "/").replace("~0", "~") for key in op["path"].split("/")[1:]]
+        parent = tree
+        for key in keys[:-1]:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        last = int(keys[-1]) if isinstance(parent, list) else keys[-1]
+        if op["op"] == "remove":
+            del parent[last]
+        elif op["op"] == "add" and isinstance(parent, list):
+            parent.insert(last, op["value"])
+        else:
+            parent[last] = op["value"]
+    return tree
+
+
+class TreeHistory:
+    """
+    The last trees sent to each session, for diffing the next one against.
+
+    The client names the tree it has by digest; a patch is only sent when this
+    process still knows that tree, so a request landing on another worker just
+    gets the full tree.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, digest):
+        with self._lock:
+            key = (session_id, digest)
+            tree = self._entries.get(key)
+            if tree is not None:
+                self._entries.move_to_end(key)
+            return tree
+
+    def put(self, session_id, digest, tree):
+        with self._lock:
+            self._entries[(session_id, digest)] = tree
+            self._entries.move_to_end((session_id, digest))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tree_history = TreeHistory(max_entries=int(os.getenv("TREE_HISTORY_SIZE", "2048")))
+
+
+def encode_tree(tree, session_id, payload_format="tree", base=None):
+    """
+    Build the response fields carrying ``tree`` in the format the client asked for.
+
+    ``tree`` (the default) is the plain ``message`` the app has always
+    received. ``interned`` sends ``message`` with its styles in a ``styles``
+    table, see :func:`intern_styles`. ``patch`` sends the operations turning
+    the client's ``base`` tree into this one, their values interned the same
+    way, or the interned tree when the base is unknown or the patch would not
+    be smaller. Every format but ``tree`` includes the new tree's ``digest``,
+    the client's ``base`` for the next request.
+
+    Returns:
+        dict: The response fields, ``session_id`` excluded.
+    """
+    if payload_format == "tree":
+        return {"message": tree}
+
+    digest = tree_digest(tree)
+    tree_history.put(session_id, digest, tree)
+    (interned,), styles = intern_styles([tree])
+    payload = {"format": "interned", "digest": digest, "styles": styles, "message": interned}
+    if payload_format == "patch" and base is not None:
+        previous = tree_history.get(session_id, base)
+        if previous is not None:
+            ops = diff_tree(previous, tree)
+            values, patch_styles = intern_styles([op.get("value") for op in ops])
+            ops = [dict(op, value=value) if "value" in op else op for op, value in zip(ops, values)]
+            patch = {"format": "patch", "digest": digest, "base": base, "styles": patch_styles, "patch": ops}
+            if payload_size(patch) < payload_size(payload):
+                return patch
+    return payload
+
+
+def decode_tree(payload, previous=None):
+    """Rebuild the component tree from :func:`encode_tree`'s fields, as the app does."""
+    payload_format = payload.get("format", "tree")
+    if payload_format == "tree":
+        return payload["message"]
+    if payload_format == "interned":
+        return expand_styles(payload["message"], payload["styles"])
+    ops = [
+        dict(op, value=expand_styles(op["value"], payload["styles"])) if "value" in op else op
+        for op in payload["patch"]
+    ]
+    return apply_patch(previous, ops)
@@ -0,0 +1,163 @@
+import copy
+import threading
+import time
+from functools import partial
+from collections import deque
+from contextlib import contextmanager
+
+from .agent import start_agent
+from .interface import start_agent_json, start_agent_jsx
+
+# Agent attributes that belong to a session or a single run. They are reset
+# to the template's values every time an agent is checked out.
+SESSION_FIELDS = (
+    "session_id",
+    "session_name",
+    "session_state",
+    "session_metrics",
+    "agent_session",
+    "memory",
+    "extra_data",
+    "images",
+    "videos",
+    "audio",
+    "run_id",
+    "run_input",
+    "run_messages",
+    "run_response",
+    "stream",
+    "stream_intermediate_steps",
+    "additional_context",
+    "add_messages",
+    "search_knowledge",
+)
+
+
+class _Entry:
+    __slots__ = ("factory", "idle", "defaults", "in_use", "hits", "misses", "discarded", "creation_seconds")
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.idle = deque()
+        self.defaults = None
+        self.in_use = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.creation_seconds = 0.0
+
+
+class AgentPool:
+    """
+    Process-wide pool of pre-built agents.
+
+    Building an Agent parses every tool's signature and docstring and opens a
+    new model client. Pooled agents keep their processed tools and share the
+    pooled HTTP client, and only their session state is reset when they are
+    checked out for a request.
+    """
+
+    def __init__(self, max_idle=16):
+        self.max_idle = max_idle
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        """
+        Register an agent factory under a pool name.
+
+        Args:
+            name (str): The name used to check agents out.
+            factory (callable): Builds a new agent; called without a session.
+        """
+        with self._lock:
+            self._entries[name] = _Entry(factory)
+
+    def _create(self, entry):
+        started = time.perf_counter()
+        agent = entry.factory()
+        # Build the tool definitions now so the first request doesn't pay for it
+        agent.update_model()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            entry.misses += 1
+            entry.creation_seconds += elapsed
+            if entry.defaults is None:
+                entry.defaults = {field: copy.deepcopy(getattr(agent, field)) for field in SESSION_FIELDS}
+        return agent
+
+    def warm(self, count=1):
+        """Pre-build ``count`` idle agents for every registered factory."""
+        for entry in list(self._entries.values()):
+            agents = [self._create(entry) for _ in range(count)]
+            with self._lock:
+                entry.idle.extend(agents[: max(0, self.max_idle - len(entry.idle))])
+
+    @contextmanager
+    def checkout(self, name, session_id=None):
+        """
+        Borrow an agent bound to ``session_id`` for the duration of the block.
+
+        Agents are returned to the pool when the block exits normally and
+        discarded if it raises, so a failed run never leaks state into the
+        next request.
+        """
+        entry = self._entries[name]
+        with self._lock:
+            agent = entry.idle.pop() if entry.idle else None
+            if agent is not None:
+                entry.hits += 1
+            entry.in_use += 1
+
+        try:
+            if agent is None:
+                agent = self._create(entry)
+            for field, value in entry.defaults.items():
+                setattr(agent, field, copy.deepcopy(value))
+            agent.session_id = session_id
+            if agent.model is not None:
+                agent.model._function_call_stack = None
+                agent.model.tool_choice = agent.tool_choice
+            yield agent
+        except BaseException:
+            with self._lock:
+                entry.in_use -= 1
+                entry.discarded += 1
+            raise
+
+        with self._lock:
+            entry.in_use -= 1
+            if len(entry.idle) < self.max_idle:
+                entry.idle.append(agent)
+            else:
+                entry.discarded += 1
+
+    def clear(self):
+        """Drop every idle agent, e.g. after the model configuration changed."""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.idle.clear()
+
+    def stats(self):
+        """Return hit/miss counters, creation time and size for every pool."""
+        with self._lock:
+            return {
+                name: {
+                    "hits": entry.hits,
+                    "misses": entry.misses,
+                    "discarded": entry.discarded,
+                    "idle": len(entry.idle),
+                    "in_use": entry.in_use,
+                    "creation_seconds_total": round(entry.creation_seconds, 6),
+                    "creation_seconds_avg": round(entry.creation_seconds / entry.misses, 6) if entry.misses else 0.0,
+                }
+                for name, entry in self._entries.items()
+            }
+
+
+agent_pool = AgentPool()
+agent_pool.register("agent", start_agent)
+agent_pool.register("agent_structured", partial(start_agent, structured=True))
+agent_pool.register("agent_single", partial(start_agent, single_pass=True))
+agent_pool.register("jsx", start_agent_jsx)
+agent_pool.register("json", start_agent_json)
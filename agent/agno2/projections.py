@@ -0,0 +1,161 @@
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Marks a tool view that is open but has no process to project for
+UNROUTED = ""
+
+_view = ContextVar("tool_view", default=None)
+
+# Fields each process needs from the read tools, as dotted paths into the
+# tool's data; a path through a list applies to every item. A tool mapped to
+# None keeps all its fields. Tools a process doesn't list are not projected.
+PROCESS_VIEWS = {
+    "change_bundle": {
+        "get_user_information": ["user_profile.account_status", "subscription.plan_name"],
+        "get_outstanding_invoices": ["invoices.invoice_id", "invoices.amount", "invoices.due_date", "invoices.status"],
+        "get_available_packages": [
+            "current_package",
+            "available_packages.name",
+            "available_packages.price",
+            "available_packages.currency",
+            "available_packages.data.amount",
+            "available_packages.voice.minutes",
+            "available_packages.sms.messages",
+            "available_packages.features",
+        ],
+    },
+    "make_payment": {
+        "get_outstanding_invoices": [
+            "invoices.invoice_id",
+            "invoices.amount",
+            "invoices.due_date",
+            "invoices.status",
+            "invoices.description",
+        ],
+        "get_available_cards": None,
+    },
+    "retrieve_credit": {
+        "get_user_information": ["user_profile.account_status"],
+        "get_information_from_billing_system": [
+            "available_credit",
+            "currency",
+            "credit_status",
+            "last_updated",
+            "voice_balance",
+            "data_balance",
+            "sms_balance",
+            "active_bundles",
+        ],
+    },
+    "retrieve_user_info": {
+        "get_user_information": None,
+    },
+    "retrieve_user_payments": {
+        "get_available_cards": None,
+    },
+}
+
+
+def compact_results():
+    """Whether tool results are compacted; set TOOL_RESULTS=full to send the backend payloads as they are."""
+    return os.getenv("TOOL_RESULTS", "compact") != "full"
+
+
+@contextmanager
+def tool_view(process=None):
+    """
+    Compact the tool results produced in the block for ``process``, typically one agent turn.
+
+    Outside a view, tools return their full payloads.
+    """
+    token = _view.set(process or UNROUTED)
+    try:
+        yield
+    finally:
+        _view.reset(token)
+
+
+def _path_tree(fields):
+    tree = {}
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _select(value, tree):
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_select(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _select(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def project(data, fields):
+    """
+    Return a copy of ``data`` keeping only ``fields``.
+
+    Args:
+        data: A tool's result data.
+        fields (list[str]): Dotted paths, e.g. ``subscription.plan_name``. A path
+            going through a list selects the field in every item.
+
+    Returns:
+        The projected data; ``data`` itself when ``fields`` is None.
+    """
+    if fields is None:
+        return data
+    return _select(data, _path_tree(fields))
+
+
+def _flatten(row, prefix=""):
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict) and value:
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def tabulate(data):
+    """
+    Encode every list of objects in ``data`` as ``{"columns": [...], "rows": [[...], ...]}``.
+
+    Nested objects become dotted column names, so the keys of a list are sent
+    once instead of once per item.
+    """
+    if isinstance(data, dict):
+        return {key: tabulate(value) for key, value in data.items()}
+    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+        flat_rows = [_flatten(item) for item in data]
+        columns = list(dict.fromkeys(column for row in flat_rows for column in row))
+        return {"columns": columns, "rows": [[row.get(column) for column in columns] for row in flat_rows]}
+    return data
+
+
+def compact(tool, data, process=None):
+    """Apply ``process``'s view of ``tool`` to its data and tabulate the lists."""
+    return tabulate(project(data, PROCESS_VIEWS.get(process, {}).get(tool)))
+
+
+def encode(tool, data):
+    """
+    Encode a tool's successful result for the model.
+
+    Inside a :func:`tool_view` the data is compacted for the view's process,
+    with lists in tabular form and JSON separators without spaces.
+    """
+    process = _view.get()
+    if process is None or not compact_results():
+        return json.dumps({"status": "success", "data": data})
+    return json.dumps({"status": "success", "data": compact(tool, data, process or None)}, separators=(",", ":"))
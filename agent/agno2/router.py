@@ -0,0 +1,185 @@
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+from .knowledge import KNOWLEDGE_DIR
+
+FINISHED_MARKER = "FINISHED_PROCESS"
+SEARCH_TOOL = "search_knowledge_base"
+
+_WORD = re.compile(r"[a-z]+")
+STOPWORDS = frozenset(
+    """
+    a an and any are as at be by can do does for from have how i if in is it me my no not of on or our please
+    should so that the their them there they this to up use using want was we what when where which who why
+    will with would you your yes ok okay
+    """.split()
+)
+
+
+def tokenize(text):
+    """Lower-case words without stopwords, with a trailing plural ``s`` dropped."""
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) < 3 or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class _Process:
+    __slots__ = ("name", "text", "weights")
+
+    def __init__(self, name, text, weights):
+        self.name = name
+        self.text = text
+        self.weights = weights
+
+
+class ProcessRouter:
+    """
+    Routes user messages to the knowledge base process they belong to.
+
+    Every process file is scored against the message with a keyword model:
+    idf-weighted term frequencies, with words from the process name and file
+    name counted three times. A session keeps its process until the agent
+    prints FINISHED_PROCESS or another process clearly scores higher, so
+    mid-process replies like a phone number stay routed. The routed procedure
+    is injected into the agent's context and the knowledge search tool is
+    withheld for that turn, saving a model -> tool -> model round trip.
+    """
+
+    def __init__(self, directory=KNOWLEDGE_DIR, min_score=1.0, margin=1.25, switch_ratio=2.0):
+        self.directory = Path(directory)
+        self.min_score = min_score
+        self.margin = margin
+        self.switch_ratio = switch_ratio
+        self._processes = None
+        self._stat_key = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        paths = sorted(self.directory.glob("*.txt"))
+        stat_key = tuple((path.name, path.stat().st_mtime_ns) for path in paths)
+        if stat_key == self._stat_key:
+            return self._processes
+
+        with self._lock:
+            if stat_key != self._stat_key:
+                counts = {}
+                texts = {}
+                for path in paths:
+                    text = path.read_text()
+                    first_line = text.strip().splitlines()[0] if text.strip() else ""
+                    title = first_line.removeprefix("Process Name:")
+                    count = Counter(tokenize(text))
+                    for token in tokenize(f"{title} {path.stem.replace('_', ' ')}"):
+                        count[token] += 3
+                    counts[path.stem] = count
+                    texts[path.stem] = text.strip()
+
+                document_frequency = Counter(token for count in counts.values() for token in count)
+                idf = {token: math.log(len(counts) / df) for token, df in document_frequency.items()}
+                self._processes = {
+                    name: _Process(name, texts[name], {token: idf[token] * (1 + math.log(tf)) for token, tf in count.items()})
+                    for name, count in counts.items()
+                }
+                self._stat_key = stat_key
+        return self._processes
+
+    def warm(self):
+        self._load()
+
+    def names(self):
+        return sorted(self._load())
+
+    def scores(self, message):
+        """Return process name -> score for a message, best first."""
+        tokens = set(tokenize(message))
+        scores = {
+            name: sum(process.weights.get(token, 0.0) for token in tokens)
+            for name, process in self._load().items()
+        }
+        return dict(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+
+    def classify(self, message):
+        """
+        Return the process a message clearly asks for, or None.
+
+        A process is only returned when it scores at least ``min_score`` and
+        ``margin`` times more than the runner-up.
+        """
+        ranked = list(self.scores(message).items())
+        if not ranked or ranked[0][1] < self.min_score:
+            return None
+        if len(ranked) > 1 and ranked[0][1] < self.margin * ranked[1][1]:
+            return None
+        return ranked[0][0]
+
+    def resolve(self, message, active=None):
+        """Return the process for a message given the session's active process."""
+        scores = self.scores(message)
+        best = self.classify(message)
+        if active not in scores:
+            return best
+        if best is not None and best != active and scores[best] >= self.switch_ratio * max(scores[active], self.min_score):
+            return best
+        return active
+
+    def route(self, agent, message):
+        """
+        Prepare a loaded agent for a turn.
+
+        Args:
+            agent (Agent): The process agent, with its session already read from storage.
+            message (str): The user message.
+
+        Returns:
+            str: The routed process name, or None when the agent has to search
+            the knowledge base itself.
+        """
+        state = agent.session_state if agent.session_state is not None else {}
+        active = state.get("process")
+        if active is not None and finished_process(agent):
+            active = None
+
+        process = self.resolve(message, active)
+        # Stored as None rather than removed: agno merges the stored state under this one
+        state["process"] = process
+        agent.session_state = state
+        if process is None:
+            agent.additional_context = None
+        else:
+            agent.additional_context = f"<process>\n{self._load()[process].text}\n</process>"
+
+        # Tools are processed once per pooled agent; pick this turn's set on the model
+        if agent.model is not None and agent._tools_for_model is not None:
+            agent.model.set_tools(
+                [tool for tool in agent._tools_for_model if process is None or _tool_name(tool) != SEARCH_TOOL]
+            )
+        return process
+
+
+def _tool_name(tool):
+    return tool.get("function", {}).get("name")
+
+
+def finished_process(agent):
+    """Whether the agent's last reply concluded its process."""
+    if agent.memory is None or not agent.memory.runs:
+        return False
+    response = agent.memory.runs[-1].response
+    content = response.content if response is not None else None
+    # Structured replies (screen descriptors, single-pass screens) carry it in their
+    # text, and come back from storage as dicts
+    if isinstance(content, dict):
+        content = content.get("text")
+    text = content if isinstance(content, str) else getattr(content, "text", None)
+    return isinstance(text, str) and FINISHED_MARKER in text
+
+
+process_router = ProcessRouter()
@@ -0,0 +1,340 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+
+from .metrics import metrics
+
+# Pipeline stages with their own model: the process agent, the JSX agent and the JSON fallback
+STAGES = ("reasoning", "jsx", "json")
+
+# Seconds; the p95 of one model call each stage should stay under
+DEFAULT_BUDGETS = {"reasoning": 8.0, "jsx": 4.0, "json": 4.0}
+
+# Latency samples older than this are forgotten, so a provider demoted for
+# being slow is tried first again once its bad window has passed
+LATENCY_WINDOW = float(os.getenv("MODEL_LATENCY_WINDOW", "300"))
+MIN_SAMPLES = 20
+
+# Agent settings the routed models need to make the same requests, and the
+# turn's tool calls, so resetting the agent's stack resets the routed models'
+_FORWARDED = (
+    "response_format",
+    "structured_outputs",
+    "tool_choice",
+    "show_tool_calls",
+    "tool_call_limit",
+    "_tools",
+    "_functions",
+    "_function_call_stack",
+)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("MODEL_HEDGE_WORKERS", "16")), thread_name_prefix="hedge")
+
+
+class LatencyWindow:
+    """The model call latencies of one provider at one stage over the last ``max_age`` seconds."""
+
+    def __init__(self, max_age=LATENCY_WINDOW, max_samples=1000):
+        self.max_age = max_age
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def _recent(self):
+        horizon = time.monotonic() - self.max_age
+        with self._lock:
+            while self._samples and self._samples[0][0] < horizon:
+                self._samples.popleft()
+            return sorted(seconds for _, seconds in self._samples)
+
+    def percentile(self, fraction=0.95):
+        """The ``fraction`` percentile, or None with fewer than MIN_SAMPLES recent samples."""
+        samples = self._recent()
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    def stats(self):
+        return {"samples": len(self._recent()), "p95_seconds": self.percentile() or 0.0}
+
+
+# Shared by every agent of a stage, so the pool learns the providers' latencies together
+_windows: Dict[tuple, LatencyWindow] = {}
+_windows_lock = threading.Lock()
+
+
+def latency_window(stage, model):
+    key = (stage, model.provider or model.name, model.id)
+    with _windows_lock:
+        window = _windows.get(key)
+        if window is None:
+            window = _windows[key] = LatencyWindow()
+    return window
+
+
+def route_stats():
+    """p95 and sample count per stage, provider and model, for :meth:`MetricsRegistry.register_stats`."""
+    with _windows_lock:
+        windows = list(_windows.items())
+    return {"/".join(key): window.stats() for key, window in windows}
+
+
+@dataclass
+class RoutedModel(Model):
+    """
+    A stage's models, tried in order of preference within a p95 latency budget.
+
+    The first model answers unless its recent p95 exceeds ``budget``, in which
+    case the next ones are preferred until its slow samples age out. If the
+    chosen model fails before the turn made any tool call, the next one is
+    tried. Stages without tools (JSX, JSON) are also hedged: when the model
+    has not answered within ``budget``, the next one is asked as well and the
+    first answer wins. Stages with tools are never hedged, since both models
+    would run the tools.
+
+    Every model call is recorded in ``provider_call_duration_seconds`` with
+    the stage, provider and model as labels.
+
+    Only whole responses are routed: the provider level methods agno's Model
+    requires (``invoke``, ``parse_provider_response`` and their async and
+    streaming variants) raise TypeError, since a provider call belongs to
+    one of ``models``.
+    """
+
+    id: str = "routed"
+    name: str = "RoutedModel"
+    provider: str = "Routed"
+    stage: str = "reasoning"
+    models: List[Model] = field(default_factory=list)
+    budget: float = 8.0
+
+    def __post_init__(self):
+        super().__post_init__()
+        if not self.models:
+            raise ValueError("RoutedModel needs at least one model")
+        primary = self.models[0]
+        self.id = primary.id
+        self.supports_structured_outputs = primary.supports_structured_outputs
+
+    def get_instructions_for_model(self):
+        return self.models[0].get_instructions_for_model()
+
+    def get_system_message_for_model(self):
+        return self.models[0].get_system_message_for_model()
+
+    def _unsupported(self, method):
+        raise TypeError(
+            f"RoutedModel.{method} is not supported: a routed model answers whole responses with "
+            "response(), aresponse() or their streams, the provider calls are its models'"
+        )
+
+    def invoke(self, *args, **kwargs) -> Any:
+        self._unsupported("invoke")
+
+    async def ainvoke(self, *args, **kwargs) -> Any:
+        self._unsupported("ainvoke")
+
+    def invoke_stream(self, *args, **kwargs) -> Iterator[Any]:
+        self._unsupported("invoke_stream")
+
+    async def ainvoke_stream(self, *args, **kwargs) -> AsyncIterator[Any]:
+        self._unsupported("ainvoke_stream")
+
+    def parse_provider_response(self, response: Any) -> ModelResponse:
+        self._unsupported("parse_provider_response")
+
+    def parse_provider_response_delta(self, response: Any) -> ModelResponse:
+        self._unsupported("parse_provider_response_delta")
+
+    def ordered(self) -> List[Model]:
+        """The models in the order to try them, those over budget last."""
+        within, over = [], []
+        for model in self.models:
+            p95 = latency_window(self.stage, model).percentile()
+            (over if p95 is not None and p95 > self.budget else within).append(model)
+        return within + over
+
+    def _prepare(self, model):
+        for attr in _FORWARDED:
+            setattr(model, attr, getattr(self, attr))
+        return model
+
+    def _record(self, model, messages, start):
+        """Record the calls ``model`` made, the assistant messages it added after ``start``."""
+        window = latency_window(self.stage, model)
+        for message in messages[start:]:
+            if message.role == model.assistant_message_role and message.metrics.time is not None:
+                window.add(message.metrics.time)
+                metrics.observe(
+                    "provider_call_duration_seconds",
+                    message.metrics.time,
+                    stage=self.stage,
+                    provider=model.provider or model.name,
+                    model=model.id,
+                )
+
+    def _answered(self, model):
+        metrics.inc("model_responses_total", stage=self.stage, provider=model.provider or model.name, model=model.id)
+
+    def _failed(self, model, error):
+        metrics.inc(
+            "model_failovers_total",
+            stage=self.stage,
+            provider=model.provider or model.name,
+            model=model.id,
+            error=type(error).__name__,
+        )
+
+    def _attempt(self, model, messages):
+        """Run a whole response on a copy of ``messages``; return the copy and the response."""
+        messages = list(messages)
+        start = len(messages)
+        try:
+            return messages, self._prepare(model).response(messages)
+        finally:
+            self._record(model, messages, start)
+
+    def response(self, messages: List[Message]) -> ModelResponse:
+        models = self.ordered()
+        if self._functions or len(models) == 1:
+            return self._failover(models, messages)
+        return self._hedged(models, messages)
+
+    def _failover(self, models, messages):
+        start = len(messages)
+        for index, model in enumerate(models):
+            try:
+                response = self._prepare(model).response(messages)
+            except Exception as e:
+                self._record(model, messages, start)
+                # Once a tool ran, the turn cannot be replayed on another model
+                if len(messages) > start or index + 1 == len(models):
+                    raise
+                self._failed(model, e)
+                continue
+            self._record(model, messages, start)
+            self._answered(model)
+            return response
+
+    def _hedged(self, models, messages):
+        remaining = iter(models)
+        pending = {}
+
+        def launch():
+            model = next(remaining, None)
+            if model is not None:
+                future = _executor.submit(contextvars.copy_context().run, self._attempt, model, messages)
+                pending[future] = model
+            return model is not None
+
+        launch()
+        error = None
+        while pending:
+            done, _ = wait(pending, timeout=self.budget, return_when=FIRST_COMPLETED)
+            if not done:
+                # Over budget: ask the next model too, the first answer wins
+                if launch():
+                    metrics.inc("model_hedges_total", stage=self.stage)
+                continue
+            for future in done:
+                model = pending.pop(future)
+                if future.exception() is None:
+                    answered, response = future.result()
+                    messages.extend(answered[len(messages) :])
+                    self._answered(model)
+                    return response
+                error = future.exception()
+                self._failed(model, error)
+                if not pending:
+                    launch()
+        raise error
+
+    @staticmethod
+    async def _aresponse(model, messages):
+        try:
+            return await model.aresponse(messages)
+        except NotImplementedError:
+            # Some providers (AwsBedrock) only answer synchronously
+            return await asyncio.to_thread(model.response, messages)
+
+    async def aresponse(self, messages: List[Message]) -> ModelResponse:
+        models = self.ordered()
+        if self._functions or len(models) == 1:
+            start = len(messages)
+            for index, model in enumerate(models):
+                try:
+                    response = await self._aresponse(self._prepare(model), messages)
+                except Exception as e:
+                    self._record(model, messages, start)
+                    if len(messages) > start or index + 1 == len(models):
+                        raise
+                    self._failed(model, e)
+                    continue
+                self._record(model, messages, start)
+                self._answered(model)
+                return response
+        # Hedging runs on threads, which suits the providers without async support too
+        return await asyncio.get_running_loop().run_in_executor(
+            None, contextvars.copy_context().run, self._hedged, models, messages
+        )
+
+    def response_stream(self, messages: List[Message]) -> Iterator[ModelResponse]:
+        """Stream from the first model that starts answering; a stream is never switched once started."""
+        models = self.ordered()
+        start = len(messages)
+        for index, model in enumerate(models):
+            stream = self._prepare(model).response_stream(messages)
+            try:
+                first = next(stream, None)
+            except Exception as e:
+                self._record(model, messages, start)
+                if len(messages) > start or index + 1 == len(models):
+                    raise
+                self._failed(model, e)
+                continue
+            try:
+                if first is not None:
+                    yield first
+                yield from stream
+            finally:
+                self._record(model, messages, start)
+            self._answered(model)
+            return
+
+    async def aresponse_stream(self, messages: List[Message]) -> AsyncIterator[ModelResponse]:
+        models = self.ordered()
+        start = len(messages)
+        for index, model in enumerate(models):
+            stream = self._prepare(model).aresponse_stream(messages).__aiter__()
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                self._record(model, messages, start)
+                if len(messages) > start or index + 1 == len(models):
+                    raise
+                self._failed(model, e)
+                continue
+            try:
+                if first is not None:
+                    yield first
+                    async for response in stream:
+                        yield response
+            finally:
+                self._record(model, messages, start)
+            self._answered(model)
+            return
@@ -0,0 +1,99 @@
+import hashlib
+import threading
+from pathlib import Path
+
+from .jsx import compile_jsx
+
+SCREENS_DIR = Path(__file__).resolve().parent / "data" / "screens"
+
+
+class _Screen:
+    __slots__ = ("path", "stat_key", "digest", "tree")
+
+    def __init__(self, path):
+        self.path = path
+        self.stat_key = None
+        self.digest = None
+        self.tree = None
+
+
+class ScreenRegistry:
+    """
+    Process-wide registry of static screens compiled from JSX templates.
+
+    Every ``<name>.jsx`` file in the screens directory is registered under its
+    file name. Screens are compiled once and served from memory; each lookup
+    does a cheap ``stat`` of the template and recompiles only when the file's
+    content hash changes, so edits are picked up without a restart.
+    """
+
+    def __init__(self, directory=SCREENS_DIR):
+        self.directory = Path(directory)
+        self._screens = {}
+        self._lock = threading.Lock()
+        self.compilations = 0
+
+    def register(self, name, path):
+        """
+        Register a JSX template under a screen name.
+
+        Args:
+            name (str): The name used to look the screen up.
+            path (str | Path): The JSX template file.
+        """
+        with self._lock:
+            self._screens[name] = _Screen(Path(path))
+
+    def discover(self):
+        """Register every template in the screens directory that is not registered yet."""
+        for path in sorted(self.directory.glob("*.jsx")):
+            if path.stem not in self._screens:
+                self.register(path.stem, path)
+
+    def warm(self):
+        """Compile all known screens, typically at process start-up."""
+        self.discover()
+        for name in list(self._screens):
+            self.get(name)
+
+    def names(self):
+        self.discover()
+        return sorted(self._screens)
+
+    def get(self, name):
+        """
+        Return the component tree for a static screen.
+
+        The returned dict is shared between requests and must not be mutated.
+
+        Raises:
+            KeyError: If no template is registered under ``name``.
+        """
+        screen = self._screens.get(name)
+        if screen is None:
+            self.discover()
+            screen = self._screens[name]
+
+        stat = screen.path.stat()
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key == screen.stat_key:
+            return screen.tree
+
+        with self._lock:
+            if stat_key != screen.stat_key:
+                source = screen.path.read_text()
+                digest = hashlib.sha256(source.encode()).hexdigest()
+                if digest != screen.digest:
+                    screen.tree = compile_jsx(source)
+                    screen.digest = digest
+                    self.compilations += 1
+                screen.stat_key = stat_key
+        return screen.tree
+
+
+registry = ScreenRegistry()
+
+
+def get_screen(name):
+    """Return the compiled component tree of the static screen called ``name``."""
+    return registry.get(name)
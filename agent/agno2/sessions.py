@@ -0,0 +1,443 @@
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from agno.storage.base import Storage
+from agno.storage.session.agent import AgentSession
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# The project directory (BASE_DIR in the Django settings), so the default
+# databases do not depend on the working directory
+BASE_DIR = Path(__file__).resolve().parent.parent
+SESSION_DB = str(BASE_DIR / "tmp" / "sessions.db")
+AGNO_SESSION_DB = str(BASE_DIR / "tmp" / "data.db")
+
+# Memory lists that only grow during a session, stored one row per item
+APPEND_ONLY = ("runs", "messages")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    session_id TEXT PRIMARY KEY,
+    agent_id TEXT,
+    user_id TEXT,
+    agent_data TEXT,
+    session_data TEXT,
+    extra_data TEXT,
+    memory TEXT,
+    runs_count INTEGER NOT NULL DEFAULT 0,
+    runs_tail TEXT,
+    messages_count INTEGER NOT NULL DEFAULT 0,
+    messages_tail TEXT,
+    created_at INTEGER,
+    updated_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS {table}_user_id ON {table} (user_id);
+CREATE TABLE IF NOT EXISTS {table}_items (
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (session_id, kind, seq)
+);
+"""
+
+
+def _dumps(value):
+    return json.dumps(value) if value is not None else None
+
+
+def _loads(value):
+    return json.loads(value) if value is not None else None
+
+
+def _digest(encoded):
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def session_version(session):
+    """Return the ``(runs_count, runs_tail, messages_count, messages_tail)`` a session is stored with."""
+    version = []
+    for kind in APPEND_ONLY:
+        items = (session.memory or {}).get(kind) or []
+        version += [len(items), _digest(json.dumps(items[-1])) if items else None]
+    return tuple(version)
+
+
+def detached(session):
+    """
+    Copy a kept session before handing it to an agent.
+
+    agno loads the session state and extra data by reference and updates them
+    during the run; the memory is only read, so it is shared.
+    """
+    return AgentSession(
+        session_id=session.session_id,
+        agent_id=session.agent_id,
+        user_id=session.user_id,
+        agent_data=copy.deepcopy(session.agent_data),
+        session_data=copy.deepcopy(session.session_data),
+        extra_data=copy.deepcopy(session.extra_data),
+        memory=session.memory,
+        created_at=session.created_at,
+        updated_at=session.updated_at,
+    )
+
+
+class AppendOnlySqliteStorage(Storage):
+    """
+    Agent session storage that appends each turn's new runs and messages instead of rewriting the session.
+
+    agno's SqliteStorage writes the whole session, history included, as one
+    blob on every turn. Here the session metadata lives in one small row and
+    the memory's ``runs`` and ``messages`` are stored one row per item, so an
+    upsert inserts only the items appended since the last write. The stored
+    count and a digest of the last item detect a history that was rewritten
+    rather than appended to, in which case that list is written again in full.
+
+    The database runs in WAL mode so readers never wait for the writer, and
+    each thread reuses its own connection. With ``write_behind`` seconds set,
+    upserts are kept in memory, served to reads, and flushed in the
+    background, coalescing the turns of a session between two flushes into one
+    write at the cost of losing them if the process dies.
+    """
+
+    def __init__(self, table_name="agent_sessions", db_file=SESSION_DB, write_behind=0.0):
+        super().__init__(mode="agent")
+        self.table_name = table_name
+        self.db_file = db_file
+        self.write_behind = write_behind
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self.writes = 0
+        self.items_written = 0
+        self.full_rewrites = 0
+        Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+        self.create()
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="session-flush", daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    @property
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_file, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def create(self) -> None:
+        self._db.executescript(SCHEMA.format(table=self.table_name))
+
+    def upgrade_schema(self) -> None:
+        pass
+
+    def drop(self) -> None:
+        with self._pending_lock:
+            self._pending.clear()
+        self._db.executescript(
+            f"DROP TABLE IF EXISTS {self.table_name}_items; DROP TABLE IF EXISTS {self.table_name};"
+        )
+
+    def _session(self, row, items):
+        memory = _loads(row["memory"])
+        if memory is not None:
+            for kind in APPEND_ONLY:
+                memory[kind] = items.get(kind, [])
+        return AgentSession(
+            session_id=row["session_id"],
+            agent_id=row["agent_id"],
+            user_id=row["user_id"],
+            agent_data=_loads(row["agent_data"]),
+            session_data=_loads(row["session_data"]),
+            extra_data=_loads(row["extra_data"]),
+            memory=memory,
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+    def _read_rows(self, where="", params=()):
+        db = self._db
+        db.row_factory = sqlite3.Row
+        try:
+            rows = db.execute(f"SELECT * FROM {self.table_name} {where} ORDER BY created_at DESC", params).fetchall()
+            sessions = []
+            for row in rows:
+                items = {}
+                for kind, data in db.execute(
+                    f"SELECT kind, data FROM {self.table_name}_items WHERE session_id = ? ORDER BY kind, seq",
+                    (row["session_id"],),
+                ):
+                    items.setdefault(kind, []).append(json.loads(data))
+                sessions.append(self._session(row, items))
+            return sessions
+        finally:
+            db.row_factory = None
+
+    def read(self, session_id: str, user_id: Optional[str] = None) -> Optional[AgentSession]:
+        with self._pending_lock:
+            session = self._pending.get(session_id)
+        if session is not None:
+            return detached(session) if user_id is None or session.user_id == user_id else None
+        where, params = "WHERE session_id = ?", (session_id,)
+        if user_id is not None:
+            where, params = where + " AND user_id = ?", params + (user_id,)
+        sessions = self._read_rows(where, params)
+        return sessions[0] if sessions else None
+
+    def version(self, session_id):
+        """
+        The :func:`session_version` of a session, or None.
+
+        A write queued by ``write_behind`` counts as soon as it is queued, so
+        the version this process last wrote is never older than its own turn.
+        """
+        with self._pending_lock:
+            session = self._pending.get(session_id)
+        if session is not None:
+            return session_version(session)
+        row = self._db.execute(
+            f"SELECT runs_count, runs_tail, messages_count, messages_tail FROM {self.table_name} WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def get_all_sessions(self, user_id: Optional[str] = None, agent_id: Optional[str] = None) -> List[AgentSession]:
+        self.flush()
+        conditions, params = [], []
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if agent_id is not None:
+            conditions.append("agent_id = ?")
+            params.append(agent_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._read_rows(where, tuple(params))
+
+    def get_all_session_ids(self, user_id: Optional[str] = None, agent_id: Optional[str] = None) -> List[str]:
+        return [session.session_id for session in self.get_all_sessions(user_id=user_id, agent_id=agent_id)]
+
+    def upsert(self, session: AgentSession) -> Optional[AgentSession]:
+        if self.write_behind:
+            with self._pending_lock:
+                self._pending[session.session_id] = session
+            return session
+        self._write(session)
+        return session
+
+    def _write(self, session):
+        memory = dict(session.memory) if session.memory is not None else None
+        lists = {kind: (memory.pop(kind, None) or []) if memory is not None else [] for kind in APPEND_ONLY}
+        now = int(time.time())
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                f"SELECT runs_count, runs_tail, messages_count, messages_tail FROM {self.table_name} WHERE session_id = ?",
+                (session.session_id,),
+            ).fetchone()
+            stored = {"runs": row[0:2], "messages": row[2:4]} if row is not None else {}
+            counts = {}
+            for kind, items in lists.items():
+                count, tail = stored.get(kind, (0, None))
+                start = count
+                if count > len(items) or (count and _digest(json.dumps(items[count - 1])) != tail):
+                    # The list was rewritten, not appended to
+                    db.execute(
+                        f"DELETE FROM {self.table_name}_items WHERE session_id = ? AND kind = ?",
+                        (session.session_id, kind),
+                    )
+                    start = 0
+                    self.full_rewrites += 1
+                encoded = [json.dumps(item) for item in items[start:]]
+                db.executemany(
+                    f"INSERT OR REPLACE INTO {self.table_name}_items (session_id, kind, seq, data) VALUES (?, ?, ?, ?)",
+                    [(session.session_id, kind, start + i, data) for i, data in enumerate(encoded)],
+                )
+                self.items_written += len(encoded)
+                if encoded:
+                    tail = _digest(encoded[-1])
+                elif not items:
+                    tail = None
+                counts[kind] = (len(items), tail)
+
+            db.execute(
+                f"""
+                INSERT INTO {self.table_name} (
+                    session_id, agent_id, user_id, agent_data, session_data, extra_data, memory,
+                    runs_count, runs_tail, messages_count, messages_tail, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    agent_id = excluded.agent_id,
+                    user_id = excluded.user_id,
+                    agent_data = excluded.agent_data,
+                    session_data = excluded.session_data,
+                    extra_data = excluded.extra_data,
+                    memory = excluded.memory,
+                    runs_count = excluded.runs_count,
+                    runs_tail = excluded.runs_tail,
+                    messages_count = excluded.messages_count,
+                    messages_tail = excluded.messages_tail,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    session.session_id,
+                    session.agent_id,
+                    session.user_id,
+                    _dumps(session.agent_data),
+                    _dumps(session.session_data),
+                    _dumps(session.extra_data),
+                    _dumps(memory),
+                    *counts["runs"],
+                    *counts["messages"],
+                    session.created_at or now,
+                    now,
+                ),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.writes += 1
+
+    def flush(self):
+        """Write every pending session; a no-op without write-behind."""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending = list(self._pending.values())
+            for session in pending:
+                self._write(session)
+                with self._pending_lock:
+                    # A newer upsert may have replaced it while it was written
+                    if self._pending.get(session.session_id) is session:
+                        del self._pending[session.session_id]
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.write_behind)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Session flush failed")
+
+    def delete_session(self, session_id: Optional[str] = None):
+        if session_id is None:
+            return
+        with self._pending_lock:
+            self._pending.pop(session_id, None)
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        db.execute(f"DELETE FROM {self.table_name}_items WHERE session_id = ?", (session_id,))
+        db.execute(f"DELETE FROM {self.table_name} WHERE session_id = ?", (session_id,))
+        db.execute("COMMIT")
+
+    def _trim(self, db, session_id, kind, keep, keep_first):
+        """Keep the last ``keep`` items of a list (and its first one if ``keep_first``), renumbered from 0."""
+        rows = db.execute(
+            f"SELECT data FROM {self.table_name}_items WHERE session_id = ? AND kind = ? ORDER BY seq",
+            (session_id, kind),
+        ).fetchall()
+        kept = rows[-keep:] if keep else []
+        if keep_first and rows and (not kept or rows[0] is not kept[0]):
+            kept = [rows[0], *kept]
+        db.execute(f"DELETE FROM {self.table_name}_items WHERE session_id = ? AND kind = ?", (session_id, kind))
+        db.executemany(
+            f"INSERT INTO {self.table_name}_items (session_id, kind, seq, data) VALUES (?, ?, ?, ?)",
+            [(session_id, kind, seq, data) for seq, (data,) in enumerate(kept)],
+        )
+        db.execute(f"UPDATE {self.table_name} SET {kind}_count = ? WHERE session_id = ?", (len(kept), session_id))
+        return len(rows) - len(kept)
+
+    def compact(self, keep_runs=None, keep_messages=None, max_age=None, vacuum=False):
+        """
+        Trim old history and sessions, then checkpoint the WAL.
+
+        Args:
+            keep_runs (int): Keep only the last ``keep_runs`` runs of every
+                session; older runs are never replayed to the model.
+            keep_messages (int): Keep only the system message and the last
+                ``keep_messages`` messages agno logs in the session memory.
+            max_age (float): Delete sessions not updated for ``max_age`` seconds.
+            vacuum (bool): Also rebuild the database file to return the freed pages.
+
+        Returns:
+            dict: ``{"sessions_deleted", "runs_deleted", "messages_deleted"}``.
+        """
+        self.flush()
+        db = self._db
+        summary = {"sessions_deleted": 0, "runs_deleted": 0, "messages_deleted": 0}
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if max_age is not None:
+                cutoff = int(time.time() - max_age)
+                db.execute(
+                    f"DELETE FROM {self.table_name}_items WHERE session_id IN "
+                    f"(SELECT session_id FROM {self.table_name} WHERE updated_at < ?)",
+                    (cutoff,),
+                )
+                summary["sessions_deleted"] = db.execute(
+                    f"DELETE FROM {self.table_name} WHERE updated_at < ?", (cutoff,)
+                ).rowcount
+            for kind, keep in (("runs", keep_runs), ("messages", keep_messages)):
+                if keep is None:
+                    continue
+                # The system message stays first, where agno looks for it
+                keep_first = kind == "messages"
+                session_ids = db.execute(
+                    f"SELECT session_id FROM {self.table_name} WHERE {kind}_count > ?", (keep + keep_first,)
+                ).fetchall()
+                for (session_id,) in session_ids:
+                    summary[f"{kind}_deleted"] += self._trim(db, session_id, kind, keep, keep_first)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if vacuum:
+            db.execute("VACUUM")
+        return summary
+
+    def stats(self):
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "writes": self.writes,
+            "items_written": self.items_written,
+            "full_rewrites": self.full_rewrites,
+            "pending": pending,
+        }
+
+
+def create_session_storage():
+    """
+    Build the agent session storage from the environment.
+
+    SESSION_STORAGE=agno keeps agno's SqliteStorage in tmp/data.db; otherwise
+    sessions go to an :class:`AppendOnlySqliteStorage` in SESSION_DB (default
+    tmp/sessions.db), with SESSION_WRITE_BEHIND seconds of write-behind.
+    """
+    if os.getenv("SESSION_STORAGE") == "agno":
+        from agno.storage.agent.sqlite import SqliteAgentStorage
+
+        return SqliteAgentStorage(table_name="agent_sessions", db_file=AGNO_SESSION_DB)
+    return AppendOnlySqliteStorage(
+        db_file=os.getenv("SESSION_DB") or SESSION_DB,
+        write_behind=float(os.getenv("SESSION_WRITE_BEHIND", "0")),
+    )
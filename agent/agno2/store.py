@@ -0,0 +1,105 @@
+import copy
+import itertools
+import threading
+
+CARD_FIELDS = ("card_number", "expiration_date", "payment_method_id")
+
+
+class _Subscriber:
+    __slots__ = ("lock", "invoices", "cards", "plan")
+
+    def __init__(self, invoices):
+        self.lock = threading.Lock()
+        self.invoices = {invoice["invoice_id"]: invoice for invoice in invoices}
+        self.cards = {}
+        self.plan = None
+
+
+class SubscriberStore:
+    """
+    Outstanding invoices and payment methods, keyed by subscriber.
+
+    Each subscriber holds a dict of invoices by ``invoice_id`` and a dict of
+    cards by ``payment_method_id``, so every lookup and mutation is O(1) in
+    the number of subscribers and touches only that subscriber's data under
+    its own lock. Subscribers are created on first access with a copy of
+    ``seed_invoices``.
+    """
+
+    def __init__(self, seed_invoices=()):
+        self.seed_invoices = list(seed_invoices)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._card_ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscriber(self, user_id):
+        subscriber = self._subscribers.get(user_id)
+        if subscriber is None:
+            with self._lock:
+                subscriber = self._subscribers.get(user_id)
+                if subscriber is None:
+                    subscriber = _Subscriber(copy.deepcopy(self.seed_invoices))
+                    self._subscribers[user_id] = subscriber
+        return subscriber
+
+    def invoices(self, user_id):
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            return [dict(invoice) for invoice in subscriber.invoices.values()]
+
+    def invoice(self, user_id, invoice_id):
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            invoice = subscriber.invoices.get(invoice_id)
+            return dict(invoice) if invoice is not None else None
+
+    def add_invoice(self, user_id, invoice):
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            subscriber.invoices[invoice["invoice_id"]] = dict(invoice)
+
+    def pay_invoice(self, user_id, invoice_id):
+        """Remove an outstanding invoice and return it marked as paid, or None if it is not outstanding."""
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            invoice = subscriber.invoices.pop(invoice_id, None)
+        if invoice is None:
+            return None
+        invoice["status"] = "paid"
+        return invoice
+
+    def cards(self, user_id):
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            return [{field: card[field] for field in CARD_FIELDS} for card in subscriber.cards.values()]
+
+    def card(self, user_id, payment_method_id):
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            card = subscriber.cards.get(payment_method_id)
+            return {field: card[field] for field in CARD_FIELDS} if card is not None else None
+
+    def add_card(self, user_id, card_number, expiration_date):
+        """Store a card under a new, process-unique ``payment_method_id`` and return it."""
+        payment_method_id = f"card_{next(self._card_ids):06d}"
+        card = {
+            "user_id": user_id,
+            "card_number": card_number,
+            "expiration_date": expiration_date,
+            "payment_method_id": payment_method_id,
+        }
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            subscriber.cards[payment_method_id] = card
+        return {field: card[field] for field in CARD_FIELDS}
+
+    def plan(self, user_id):
+        return self.subscriber(user_id).plan
+
+    def set_plan(self, user_id, plan):
+        subscriber = self.subscriber(user_id)
+        with subscriber.lock:
+            subscriber.plan = plan
@@ -0,0 +1,147 @@
+import asyncio
+import html
+import json
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+
+from .parallel import ParallelToolCalls
+from .tokens import count_tokens
+
+
+def _last_user_message(messages: List[Message]) -> str:
+    for message in reversed(messages):
+        if message.role == "user":
+            return message.get_content_string()
+    return ""
+
+
+def escape_jsx_text(text: str) -> str:
+    """Escape text so it can be placed between JSX tags."""
+    return html.escape(text, quote=False).replace("{", "&#123;").replace("}", "&#125;")
+
+
+def echo_tree(text: str) -> dict:
+    """The component tree of the stub's screens: the text, a message input and a Send button."""
+    return {
+        "type": "View",
+        "children": [
+            {"type": "Text", "children": text},
+            {"type": "TextInput", "props": {"name": "message", "onChangeText": "storeData"}},
+            {"type": "Button", "props": {"title": "Send", "onPress": "handleSubmit"}},
+        ],
+    }
+
+
+def default_script(messages: List[Message]) -> str:
+    """
+    Reply deterministically based on the agent the stub is plugged into.
+
+    The JSX agent gets a small screen echoing its input, agents with a
+    response model get the equivalent screen descriptor or single-pass
+    screen, the JSON agent gets a tree of the text in the JSX it is given and
+    every other agent gets the user message echoed back as text.
+    """
+    system = messages[0].get_content_string() if messages and messages[0].role == "system" else ""
+    text = _last_user_message(messages)
+    if "<json_fields>" in system and '"screen"' in system:
+        return json.dumps({"text": f"You said: {text}", "screen": echo_tree(f"You said: {text}")})
+    if "<json_fields>" in system:
+        return json.dumps(
+            {
+                "kind": "form",
+                "text": f"You said: {text}",
+                "fields": [{"name": "message", "label": "Message"}],
+                "actions": ["Send"],
+            }
+        )
+    if "React Native JSX" in system:
+        return (
+            f"<View><Text>{escape_jsx_text(text)}</Text>"
+            '<TextInput name="message" onChangeText={storeData} />'
+            '<Button title="Send" onPress={handleSubmit} /></View>'
+        )
+    if "converts JSX to a JSON object" in system:
+        screen_text = " ".join(html.unescape(re.sub(r"<[^>]*>?", " ", text)).split())
+        return json.dumps({"type": "View", "children": [{"type": "Text", "children": screen_text}]})
+    return f"You said: {text}"
+
+
+@dataclass
+class StubModel(ParallelToolCalls, Model):
+    """
+    Offline stand-in for OpenAIChat that replies from a script after a fixed latency.
+
+    ``script`` receives the messages sent to the model and returns either the
+    reply text or a dict with ``content`` and/or OpenAI style ``tool_calls``.
+    """
+
+    id: str = "stub"
+    name: str = "StubModel"
+    provider: str = "Stub"
+
+    latency: float = 0.0
+    chunk_size: int = 16
+    script: Callable[[List[Message]], Any] = default_script
+
+    def _reply(self, messages: List[Message]) -> Dict[str, Any]:
+        reply = self.script(messages)
+        if isinstance(reply, str):
+            reply = {"content": reply}
+        prompt = "".join(m.get_content_string() for m in messages)
+        completion = reply.get("content") or ""
+        reply["usage"] = {
+            "prompt_tokens": count_tokens(prompt),
+            "completion_tokens": count_tokens(completion),
+        }
+        return reply
+
+    def invoke(self, messages: List[Message]) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def ainvoke(self, messages: List[Message]) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+    def _chunks(self, reply: Dict[str, Any]) -> List[Dict[str, Any]]:
+        content = reply.get("content") or ""
+        chunks = [{"content": content[i : i + self.chunk_size]} for i in range(0, len(content), self.chunk_size)]
+        if reply.get("tool_calls"):
+            chunks.append({"tool_calls": reply["tool_calls"]})
+        chunks.append({"usage": reply["usage"]})
+        return chunks
+
+    def invoke_stream(self, messages: List[Message]):
+        if self.latency:
+            time.sleep(self.latency)
+        yield from self._chunks(self._reply(messages))
+
+    async def ainvoke_stream(self, messages: List[Message]):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for chunk in self._chunks(self._reply(messages)):
+            yield chunk
+
+    def parse_provider_response(self, response: Dict[str, Any]) -> ModelResponse:
+        return ModelResponse(
+            role="assistant",
+            content=response.get("content"),
+            tool_calls=response.get("tool_calls") or [],
+            response_usage=response.get("usage"),
+        )
+
+    def parse_provider_response_delta(self, response: Dict[str, Any]) -> ModelResponse:
+        return ModelResponse(
+            content=response.get("content"),
+            tool_calls=response.get("tool_calls") or [],
+            response_usage=response.get("usage"),
+        )
+
@@ -0,0 +1,3 @@
+def count_tokens(text: str) -> int:
+    """Rough token estimate, 4 characters per token, for budgets and offline usage metrics."""
+    return max(1, len(text) // 4) if text else 0
@@ -1,7 +1,57 @@
+import functools
 import json
-import uuid
 
+from .backend import BackendError, backend
+from .memo import invalidate, memoized
+from .parallel import mutating, read_only
+from .projections import encode
 
+
+def _not_found(user_id):
+    return json.dumps({"status": "error", "data": {"message": f"Client {user_id} not found"}})
+
+
+@memoized
+def _account(user_id):
+    return backend.account(user_id)
+
+
+def _account_section(user_id, name, default=None):
+    account = _account(user_id)
+    return default if account is None else account[name]
+
+
+@memoized
+def _available_packages(user_id):
+    """Return the user's current plan name and the packages, current one first, or None for unknown users."""
+    user = _account_section(user_id, "user")
+    if user is None:
+        return None
+    current_plan_name = user["subscription"]["plan_name"]
+    packages = [
+        dict(package, is_current=package["name"] == current_plan_name)
+        for package in backend.get_packages()
+    ]
+    # The current package is listed first
+    packages.sort(key=lambda package: not package["is_current"])
+    return current_plan_name, packages
+
+
+def backend_errors(func):
+    """Report backend failures to the model as an error result instead of failing the run."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except BackendError as e:
+            return json.dumps({"status": "error", "data": {"message": f"Backend system unavailable: {e}"}})
+
+    return wrapper
+
+
+@read_only
+@backend_errors
 def get_information_from_billing_system(user_id: str) -> dict:
     """
     Use this function to get credit information from the telco billing system.
@@ -15,43 +65,14 @@ def get_information_from_billing_system(user_id: str) -> dict:
             - Voice, data, and SMS balances
             - Active subscriptions and bundles
     """
-    return json.dumps(
-        {
-            "status": "success",
-            "data": {
-                "user_id": user_id,
-                "available_credit": 100.00,
-                "last_updated": "2024-03-20T10:30:00Z",
-                "credit_status": "normal",
-                "pending_transactions": 0,
-                "currency": "USD",
-                "voice_balance": 50.00,
-                "data_balance": "2.5GB",
-                "sms_balance": 100,
-                "active_bundles": [
-                    {
-                        "name": "Premium Data",
-                        "remaining": "1.5GB",
-                        "expiry": "2024-03-25T23:59:59Z",
-                    }
-                ],
-            },
-        }
-    )
-
-
-global_outstanding_invoices = [
-    {
-        "invoice_id": "INV-2024-0342",
-        "issue_date": "2024-03-01T00:00:00Z",
-        "due_date": "2024-03-15T23:59:59Z",
-        "amount": 89.99,
-        "status": "overdue",
-        "description": "Monthly service charge - March 2024",
-    },
-]
+    credit = _account_section(user_id, "credit")
+    if credit is None:
+        return _not_found(user_id)
+    return encode("get_information_from_billing_system", credit)
 
 
+@read_only
+@backend_errors
 def get_outstanding_invoices(user_id: str) -> dict:
     """
     Use this function to get information about outstanding invoices from the telco billing system.
@@ -66,14 +87,11 @@ def get_outstanding_invoices(user_id: str) -> dict:
             - List of invoices with details (invoice ID, date, amount, due date, status)
             - Payment history
     """
-    return json.dumps(
-        {
-            "status": "success",
-            "data": {"user_id": user_id, "invoices": global_outstanding_invoices},
-        }
-    )
+    return encode("get_outstanding_invoices", {"user_id": user_id, "invoices": _account_section(user_id, "invoices", [])})
 
 
+@read_only
+@backend_errors
 def get_user_information(user_id: str) -> dict:
     """
     Use this function to retrieve user information from the telco customer database.
@@ -94,54 +112,14 @@ def get_user_information(user_id: str) -> dict:
             - Device information (ID, model, IMEI, status)
             - User preferences (language, timezone, notifications)
     """
-    return json.dumps(
-        {
-            "status": "success",
-            "data": {
-                "user_profile": {
-                    "customer_id": "CUST123456",
-                    "full_name": "John Doe",
-                    "email": "john.doe@example.com",
-                    "user_id": user_id,
-                    "account_status": "active",
-                    "registration_date": "2023-01-15T00:00:00Z",
-                },
-                "subscription": {
-                    "plan_name": "Premium Plus",
-                    "plan_type": "postpaid",
-                    "start_date": "2023-01-15T00:00:00Z",
-                    "renewal_date": "2024-01-15T00:00:00Z",
-                    "auto_renewal": True,
-                },
-                "services": {"voice": True, "data": True, "sms": True, "roaming": True},
-                "billing": {
-                    "billing_address": {
-                        "street": "123 Main St",
-                        "city": "New York",
-                        "state": "NY",
-                        "zip": "10001",
-                        "country": "USA",
-                    },
-                    "payment_method": "credit_card",
-                    "billing_cycle": "monthly",
-                },
-            },
-        }
-    )
-
-
-# global_payment_methods = []
-
-global_payment_methods = [
-    # {
-    #     "user_id": "asasd",
-    #     "card_number": "1111 1111 1111 1111",
-    #     "expiration_date": "12/2025",
-    #     "payment_method_id": "card_1111",
-    # }
-]
+    user = _account_section(user_id, "user")
+    if user is None:
+        return _not_found(user_id)
+    return encode("get_user_information", user)
 
 
+@read_only
+@backend_errors
 def get_available_cards(user_id: str) -> dict:
     """
     Use this function retrieve the available card that can be used to pay the invoice
@@ -155,21 +133,11 @@ def get_available_cards(user_id: str) -> dict:
             - expiration_date
             - payment_method_id
     """
-
-    payment_methods = [
-        {
-            "card_number": x.get("card_number"),
-            "expiration_date": x.get("expiration_date"),
-            "payment_method_id": x.get("payment_method_id"),
-        }
-        for x in global_payment_methods
-    ]
-
-    return json.dumps(
-        {"status": "success", "data": {"payment_methods": payment_methods}}
-    )
+    return encode("get_available_cards", {"payment_methods": _account_section(user_id, "payment_methods", [])})
 
 
+@mutating
+@backend_errors
 def add_card(user_id: str, card_number: str, expiration_date: str) -> dict:
     """
     Use this function to add a card to the payment system.
@@ -182,30 +150,22 @@ def add_card(user_id: str, card_number: str, expiration_date: str) -> dict:
     Returns:
         dict: JSON object containing the result of the operation and the added payment method.
     """
-    new_payment_method = {
-        "user_id": user_id,
-        "card_number": card_number,
-        "expiration_date": expiration_date,
-        "payment_method_id": "card_1111",
-    }
-
-    global_payment_methods.append(new_payment_method)
+    added_card = backend.add_card(user_id, card_number, expiration_date)
+    invalidate(user_id)
 
     return json.dumps(
         {
             "status": "success",
             "data": {
                 "message": "Card added successfully",
-                "added_card": {
-                    "card_number": card_number,
-                    "expiration_date": expiration_date,
-                    "payment_method_id": "card_1111",
-                },
+                "added_card": added_card,
             },
         }
     )
 
 
+@mutating
+@backend_errors
 def make_payment(user_id: str, invoice_id: str, payment_method_id: str = None) -> dict:
     """
     Use this function to pay an outstanding invoice in the telco billing system.
@@ -224,14 +184,10 @@ def make_payment(user_id: str, invoice_id: str, payment_method_id: str = None) -
             - Amount paid
             - Updated invoice status
     """
-    # Find the invoice in the global outstanding invoices
-    invoice_to_pay = None
-    for invoice in global_outstanding_invoices:
-        if invoice["invoice_id"] == invoice_id:
-            invoice_to_pay = invoice
-            break
+    paid = backend.pay_invoice(user_id, invoice_id, payment_method_id)
+    invalidate(user_id)
 
-    if not invoice_to_pay:
+    if not paid:
         return json.dumps(
             {
                 "status": "error",
@@ -241,24 +197,21 @@ def make_payment(user_id: str, invoice_id: str, payment_method_id: str = None) -
             }
         )
 
-    # Update the invoice status
-    invoice_to_pay["status"] = "paid"
-
-    # Remove the invoice from outstanding invoices
-    global_outstanding_invoices.remove(invoice_to_pay)
-
+    invoice, transaction_id = paid
     return json.dumps(
         {
             "status": "success",
             "data": {
                 "message": "Payment processed successfully",
-                "transaction_id": f"TXN-{uuid.uuid4().hex[:8].upper()}",
-                "invoice_status": invoice_to_pay["status"],
+                "transaction_id": transaction_id,
+                "invoice_status": invoice["status"],
             },
         }
     )
 
 
+@read_only
+@backend_errors
 def validate_phone_number(phone_number: str) -> dict:
     """
     Use this function to validate if a phone number is valid in the system.
@@ -271,8 +224,8 @@ def validate_phone_number(phone_number: str) -> dict:
             - is_valid: Boolean indicating if the phone number is valid
             - message: Description of the validation result
     """
-    # Check if the phone number starts with +1
-    is_valid = phone_number.startswith("+1")
+    # Also fetches the account the next tools of the process will read
+    is_valid = _account(phone_number) is not None
 
     if is_valid:
         return json.dumps(
@@ -290,6 +243,8 @@ def validate_phone_number(phone_number: str) -> dict:
         )
 
 
+@read_only
+@backend_errors
 def get_available_packages(user_id: str) -> dict:
     """
     Use this function to retrieve available telco packages for a user.
@@ -303,104 +258,19 @@ def get_available_packages(user_id: str) -> dict:
             - List of packages with details (name, price, data, voice, SMS, features)
             - Current active package is listed first
     """
-    # Get user information to determine current package
-    user_info = json.loads(get_user_information(user_id))
-    current_plan_name = user_info["data"]["subscription"]["plan_name"]
-    
-    # Define available packages
-    packages = [
-        {
-            "package_id": "PKG-001",
-            "name": "Premium Plus",
-            "price": 89.99,
-            "currency": "USD",
-            "billing_cycle": "monthly",
-            "data": {
-                "amount": "Unlimited",
-                "high_speed_cap": "50GB",
-                "throttle_speed": "3Mbps"
-            },
-            "voice": {
-                "minutes": "Unlimited",
-                "international": True
-            },
-            "sms": {
-                "messages": "Unlimited",
-                "international": True
-            },
-            "features": [
-                "5G Access",
-                "Mobile Hotspot (30GB)",
-                "HD Streaming",
-                "International Roaming"
-            ],
-            "is_current": True
-        },
-        {
-            "package_id": "PKG-002",
-            "name": "Standard",
-            "price": 59.99,
-            "currency": "USD",
-            "billing_cycle": "monthly",
-            "data": {
-                "amount": "25GB",
-                "high_speed_cap": "25GB",
-                "throttle_speed": "2Mbps"
-            },
-            "voice": {
-                "minutes": "Unlimited",
-                "international": False
-            },
-            "sms": {
-                "messages": "Unlimited",
-                "international": False
-            },
-            "features": [
-                "5G Access",
-                "Mobile Hotspot (10GB)",
-                "SD Streaming"
-            ],
-            "is_current": False
-        },
-        {
-            "package_id": "PKG-003",
-            "name": "Basic",
-            "price": 39.99,
-            "currency": "USD",
-            "billing_cycle": "monthly",
-            "data": {
-                "amount": "10GB",
-                "high_speed_cap": "10GB",
-                "throttle_speed": "1Mbps"
-            },
-            "voice": {
-                "minutes": 1000,
-                "international": False
-            },
-            "sms": {
-                "messages": 1000,
-                "international": False
-            },
-            "features": [
-                "4G Access",
-                "Mobile Hotspot (5GB)"
-            ],
-            "is_current": False
-        }
-    ]
-    
-    return json.dumps(
-        {
-            "status": "success",
-            "data": {
-                "user_id": user_id,
-                "current_package": current_plan_name,
-                "available_packages": packages
-            }
-        }
+    available = _available_packages(user_id)
+    if available is None:
+        return _not_found(user_id)
+    current_plan_name, packages = available
+
+    return encode(
+        "get_available_packages",
+        {"user_id": user_id, "current_package": current_plan_name, "available_packages": packages},
     )
 
 
+@mutating
+@backend_errors
 def activate_package(user_id: str, package_name: str) -> dict:
     """
     Use this function to activate a new telco package for a user.
@@ -418,9 +288,10 @@ def activate_package(user_id: str, package_name: str) -> dict:
             - Prorated billing information
     """
     # Get available packages to validate the requested package
-    available_packages_response = json.loads(get_available_packages(user_id))
-    available_packages = available_packages_response["data"]["available_packages"]
-    current_package = available_packages_response["data"]["current_package"]
+    available = _available_packages(user_id)
+    if available is None:
+        return _not_found(user_id)
+    current_package, available_packages = available
     
     # Find the requested package
     package_to_activate = None
@@ -450,7 +321,10 @@ def activate_package(user_id: str, package_name: str) -> dict:
                 },
             }
         )
-        
+
+    backend.activate_package(user_id, package_to_activate["package_id"])
+    invalidate(user_id)
+
     return json.dumps(
         {
             "status": "success",
@@ -459,3 +333,4 @@ def activate_package(user_id: str, package_name: str) -> dict:
             },
         }
     )
+
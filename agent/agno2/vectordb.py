@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import threading
+import uuid
+from hashlib import md5
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from agno.document import Document
+from agno.embedder.base import Embedder
+from agno.vectordb.base import VectorDb
+
+# Each write is a new generation of both files; the manifest names the current one
+MANIFEST_FILE = "index.json"
+VECTORS_FILE = "vectors-{generation}.f32"
+DOCUMENTS_FILE = "documents-{generation}.json"
+
+
+class LocalVectorDb(VectorDb):
+    """
+    In-process vector store for small knowledge bases.
+
+    Embeddings are L2-normalised and kept in a float32 matrix memory-mapped
+    from ``<path>/vectors-<generation>.f32``; the chunks themselves are in
+    ``<path>/documents-<generation>.json``. Search is an exact brute-force
+    cosine scan, which for a few hundred chunks is a single matrix-vector
+    product and needs no index. A write creates a new generation of both
+    files and then atomically replaces ``<path>/index.json``, which names the
+    current one, so readers in other processes pick up matching documents
+    and vectors on their next search.
+    """
+
+    def __init__(self, path, embedder: Optional[Embedder] = None):
+        if embedder is None:
+            from agno.embedder.openai import OpenAIEmbedder
+
+            embedder = OpenAIEmbedder()
+        self.path = Path(path)
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+        self._lock = threading.Lock()
+        self._generation = None
+        self._records = []
+        self._vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+
+    @property
+    def _manifest_path(self):
+        return self.path / MANIFEST_FILE
+
+    def _read_manifest(self):
+        try:
+            return json.loads(self._manifest_path.read_text())
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        """Map the index from disk if a new generation was written since it was last loaded."""
+        # A writer may delete the generation just read from the manifest; read it again then
+        for _ in range(3):
+            manifest = self._read_manifest()
+            if manifest is None:
+                self._generation = None
+                self._records = []
+                self._vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+                return
+            generation = manifest["generation"]
+            if generation == self._generation:
+                return
+            try:
+                records = json.loads((self.path / DOCUMENTS_FILE.format(generation=generation)).read_text())
+                if records:
+                    vectors = np.memmap(
+                        self.path / VECTORS_FILE.format(generation=generation),
+                        dtype=np.float32,
+                        mode="r",
+                        shape=(len(records), self.dimensions),
+                    )
+                else:
+                    vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+            except FileNotFoundError:
+                continue
+            self._records, self._vectors, self._generation = records, vectors, generation
+            return
+        raise RuntimeError(f"The vector index in {self.path} keeps changing while it is loaded")
+
+    def _save(self, records, vectors):
+        self.path.mkdir(parents=True, exist_ok=True)
+        previous = self._read_manifest()
+        generation = uuid.uuid4().hex
+        np.ascontiguousarray(vectors, dtype=np.float32).tofile(self.path / VECTORS_FILE.format(generation=generation))
+        (self.path / DOCUMENTS_FILE.format(generation=generation)).write_text(json.dumps(records))
+        # The manifest is replaced last: readers see the old generation or the new one, never a mix
+        tmp_manifest = self._manifest_path.with_suffix(".tmp")
+        tmp_manifest.write_text(json.dumps({"generation": generation, "count": len(records)}))
+        os.replace(tmp_manifest, self._manifest_path)
+        # Keep the previous generation for readers that are loading it right now
+        self._remove_generations(keep={generation, previous and previous["generation"]})
+        self._load()
+
+    def _remove_generations(self, keep=()):
+        for path in [*self.path.glob(VECTORS_FILE.format(generation="*")), *self.path.glob(DOCUMENTS_FILE.format(generation="*"))]:
+            if path.stem.split("-", 1)[1] not in keep:
+                path.unlink(missing_ok=True)
+
+    def _normalize(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector, axis=-1, keepdims=True)
+        return vector / np.where(norm == 0, 1, norm)
+
+    def create(self) -> None:
+        with self._lock:
+            if not self._manifest_path.exists():
+                self._save([], np.zeros((0, self.dimensions), dtype=np.float32))
+
+    async def async_create(self) -> None:
+        await asyncio.to_thread(self.create)
+
+    def exists(self) -> bool:
+        return self._manifest_path.exists()
+
+    async def async_exists(self) -> bool:
+        return self.exists()
+
+    def drop(self) -> None:
+        with self._lock:
+            self._manifest_path.unlink(missing_ok=True)
+            self._remove_generations()
+            self._load()
+
+    async def async_drop(self) -> None:
+        await asyncio.to_thread(self.drop)
+
+    def delete(self) -> bool:
+        with self._lock:
+            self._save([], np.zeros((0, self.dimensions), dtype=np.float32))
+        return True
+
+    def delete_names(self, names) -> None:
+        """Remove every chunk of the named documents."""
+        names = set(names)
+        with self._lock:
+            self._load()
+            keep = [i for i, record in enumerate(self._records) if record["name"] not in names]
+            if len(keep) != len(self._records):
+                self._save([self._records[i] for i in keep], self._vectors[keep])
+
+    def _content_hash(self, document):
+        return md5(document.content.encode()).hexdigest()
+
+    def doc_exists(self, document: Document) -> bool:
+        with self._lock:
+            self._load()
+            content_hash = self._content_hash(document)
+            return any(record["content_hash"] == content_hash for record in self._records)
+
+    async def async_doc_exists(self, document: Document) -> bool:
+        return self.doc_exists(document)
+
+    def name_exists(self, name: str) -> bool:
+        with self._lock:
+            self._load()
+            return any(record["name"] == name for record in self._records)
+
+    def id_exists(self, id: str) -> bool:
+        with self._lock:
+            self._load()
+            return any(record["id"] == id for record in self._records)
+
+    def insert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None, batch_size: int = 100) -> None:
+        """Embed and append documents; the index is rewritten once for the whole call."""
+        self.upsert(documents, filters)
+
+    async def async_insert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        await asyncio.to_thread(self.insert, documents, filters)
+
+    def upsert_available(self) -> bool:
+        return True
+
+    def upsert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        if not documents:
+            return
+        new_records = []
+        new_vectors = []
+        for document in documents:
+            document.embed(embedder=self.embedder)
+            content_hash = self._content_hash(document)
+            new_records.append(
+                {
+                    "id": document.id or content_hash,
+                    "name": document.name,
+                    "meta_data": document.meta_data,
+                    "filters": filters,
+                    "content": document.content,
+                    "usage": document.usage,
+                    "content_hash": content_hash,
+                }
+            )
+            new_vectors.append(document.embedding)
+
+        with self._lock:
+            self._load()
+            replaced = {record["id"] for record in new_records}
+            keep = [i for i, record in enumerate(self._records) if record["id"] not in replaced]
+            records = [self._records[i] for i in keep] + new_records
+            vectors = np.concatenate([self._vectors[keep], self._normalize(new_vectors)])
+            self._save(records, vectors)
+
+    async def async_upsert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        await asyncio.to_thread(self.upsert, documents, filters)
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return self.vector_search(query, limit, filters)
+
+    async def async_search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return await asyncio.to_thread(self.vector_search, query, limit, filters)
+
+    def vector_search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Return the ``limit`` chunks closest to ``query`` by cosine similarity."""
+        return self.search_embedding(self.embedder.get_embedding(query), limit, filters)
+
+    def search_embedding(self, embedding, limit=5, filters=None):
+        """Like :meth:`vector_search`, for a query that is already embedded."""
+        with self._lock:
+            self._load()
+            records, vectors = self._records, self._vectors
+        if not records:
+            return []
+
+        scores = vectors @ self._normalize(embedding)
+        if filters:
+            allowed = np.array([_matches(record["filters"], filters) for record in records])
+            scores = np.where(allowed, scores, -np.inf)
+        limit = min(limit, len(records))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [
+            Document(
+                id=records[i]["id"],
+                name=records[i]["name"],
+                meta_data=records[i]["meta_data"],
+                content=records[i]["content"],
+                embedder=self.embedder,
+                embedding=vectors[i].tolist(),
+                usage=records[i]["usage"],
+            )
+            for i in top
+            if scores[i] != -np.inf
+        ]
+
+    def get_count(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._records)
+
+
+def _matches(record_filters, filters):
+    record_filters = record_filters or {}
+    return all(record_filters.get(key) == value for key, value in filters.items())
@@ -0,0 +1,35 @@
+from django.apps import AppConfig
+
+
+def warm_up():
+    """
+    Compile the static screens, index the processes and build the agents.
+
+    Called by the WSGI and ASGI entry points, so a serving process does it
+    once at start-up instead of on the first request, while management
+    commands (test, migrate, sync_knowledge, ...) skip it.
+    """
+    from agno2.pool import agent_pool
+    from agno2.router import process_router
+    from agno2.screens import registry
+
+    registry.warm()
+    process_router.warm()
+    agent_pool.warm()
+
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        from agno2.agent import storage
+        from agno2.cache import render_cache
+        from agno2.metrics import metrics
+        from agno2.pool import agent_pool
+        from agno2.routing import route_stats
+
+        metrics.register_stats('pool', agent_pool.stats, label='agent')
+        metrics.register_stats('render_cache', render_cache.stats)
+        metrics.register_stats('model_route', route_stats, label='route')
+        if hasattr(storage, 'stats'):
+            metrics.register_stats('sessions', storage.stats)
@@ -0,0 +1,182 @@
+import os
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+
+# --screens choices and the AGENT_SCREENS value they run with
+SCREEN_MODES = {'text': '', 'structured': 'structured', 'single': 'single'}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+def server_timing(header):
+    """Parse a ``Server-Timing`` header into stage -> milliseconds."""
+    timings = {}
+    for entry in filter(None, (part.strip() for part in header.split(','))):
+        name, _, duration = entry.partition(';dur=')
+        timings[name] = float(duration or 0)
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the scripted process flows (pay an invoice, change the bundle, ...) through the "
+        "talk endpoint against the offline stub model and report latency per stage, model calls, "
+        "tokens, allocations and requests per second, per screen pipeline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Conversations per flow')
+        parser.add_argument('--flow', action='append', dest='flows', help='Only replay this flow (repeatable)')
+        parser.add_argument(
+            '--screens', action='append', choices=SCREEN_MODES,
+            help='Screen pipeline to replay the flows with (repeatable, default: text and single)',
+        )
+        parser.add_argument('--latency', type=float, default=0.0, help='Simulated model latency in seconds')
+        parser.add_argument('--malformed-jsx', type=float, default=0.0, help='Share of screens sent to the JSON agent fallback')
+        parser.add_argument('--no-allocations', action='store_true', help='Skip the tracemalloc pass')
+
+    def handle(self, *args, **options):
+        os.environ['AGENT_MODEL'] = 'stub'
+        os.environ['STUB_MODEL_SCRIPT'] = 'flows'
+        os.environ['STUB_MODEL_LATENCY'] = str(options['latency'])
+        os.environ['STUB_MALFORMED_JSX'] = str(options['malformed_jsx'])
+        setup_test_environment()
+
+        from agno2.agent import storage
+        from agno2.backend import MemoryBackend
+        from agno2.tools import backend
+        from agno2.cache import render_cache
+        from agno2.flows import FLOWS, flow_messages
+        from agno2.metrics import metrics
+        from agno2.pool import agent_pool
+        from api.views import agent_name
+
+        flows = options['flows'] or list(FLOWS)
+        unknown = sorted(set(flows) - set(FLOWS))
+        if unknown:
+            raise CommandError(f"Unknown flows: {', '.join(unknown)} (known: {', '.join(FLOWS)})")
+        modes = options['screens'] or ['text', 'single']
+
+        # Agents built at start-up use the real model
+        agent_pool.clear()
+        client = Client()
+        session_ids = []
+
+        def usage(agents):
+            """Model calls and tokens so far of the pipeline's agents."""
+            return {
+                'calls': sum(metrics.histogram_count('model_call_duration_seconds', agent=agent) for agent in agents),
+                **{
+                    direction: sum(metrics.counter('tokens_total', agent=agent, type=direction) for agent in agents)
+                    for direction in ('input', 'output')
+                },
+            }
+
+        def conversation(flow, traced=False):
+            """Replay one conversation; return the request latencies, Server-Timings and allocations."""
+            session_id = f"bench-{uuid.uuid4()}"
+            session_ids.append(session_id)
+            phone = f"+1555{uuid.uuid4().int % 10**7:07d}"
+            if isinstance(backend, MemoryBackend):
+                backend.add_subscriber(phone)
+            latencies, timings, allocations = [], [], []
+            for message in flow_messages(flow, phone):
+                if traced:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                started = time.perf_counter()
+                response = client.post('/api/', {'message': message, 'session_id': session_id}, content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"{flow}: {message!r} failed with {response.status_code}: {response.content[:200]!r}")
+                timings.append(server_timing(response['Server-Timing']))
+                if traced:
+                    allocations.append(tracemalloc.get_traced_memory()[1] - before)
+            return latencies, timings, allocations
+
+        def replay(flow, agents):
+            """Replay a flow; return the latencies, wall time, model usage and KiB allocated per turn."""
+            before = usage(agents)
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(options['iterations']):
+                flow_latencies, timings, _ = conversation(flow)
+                latencies += flow_latencies
+                for timing in timings:
+                    for stage, milliseconds in timing.items():
+                        stages.setdefault(stage, {}).setdefault(mode, []).append(milliseconds)
+            wall = time.perf_counter() - started
+            after = usage(agents)
+
+            allocated = None
+            if not options['no_allocations']:
+                tracemalloc.start()
+                try:
+                    _, _, allocations = conversation(flow, traced=True)
+                finally:
+                    tracemalloc.stop()
+                allocated = statistics.mean(allocations) / 1024
+            return latencies, wall, {key: after[key] - before[key] for key in after}, allocated
+
+        self.stdout.write(
+            f"{options['iterations']} conversations per flow, stub latency {options['latency']}s per model call, "
+            f"{options['malformed_jsx']:.0%} malformed JSX"
+        )
+        header = f"{'calls':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'in tok':>9}{'out tok':>9}{'KiB':>8}"
+        stages = {}
+        totals = {}
+        try:
+            for mode in modes:
+                os.environ['AGENT_SCREENS'] = SCREEN_MODES[mode]
+                # Cached screens would skip the JSX agent
+                render_cache.clear()
+                agents = (agent_name(), 'jsx', 'json')
+                self.stdout.write(f"\n{mode} screens")
+                self.stdout.write(f"{'flow':<26}{'turns':>7}{header}")
+                mode_latencies, mode_wall, mode_usage = [], 0.0, {}
+                for flow in flows:
+                    latencies, wall, used, allocated = replay(flow, agents)
+                    mode_latencies += latencies
+                    mode_wall += wall
+                    for key, value in used.items():
+                        mode_usage[key] = mode_usage.get(key, 0) + value
+                    self.stdout.write(f"{flow:<26}{len(latencies):>7}{self.row(latencies, wall, used, allocated)}")
+                totals[mode] = (mode_latencies, mode_wall, mode_usage)
+        finally:
+            os.environ.pop('AGENT_SCREENS', None)
+            for session_id in session_ids:
+                storage.delete_session(session_id)
+
+        if len(modes) > 1:
+            self.stdout.write(f"\n{'pipeline':<26}{'turns':>7}{header}")
+            for mode, (latencies, wall, used) in totals.items():
+                self.stdout.write(f"{mode:<26}{len(latencies):>7}{self.row(latencies, wall, used, None)}")
+
+        self.stdout.write('')
+        self.stdout.write(f"{'stage, mean ms':<40}" + ''.join(f"{mode:>12}" for mode in modes))
+        for stage, by_mode in sorted(stages.items(), key=lambda item: -sum(map(sum, item[1].values()))):
+            self.stdout.write(
+                f"{stage:<40}"
+                + ''.join(f"{statistics.mean(by_mode[mode]):>12.2f}" if mode in by_mode else f"{'-':>12}" for mode in modes)
+            )
+        self.stdout.write("\nModel calls, tokens and KiB allocated are per turn")
+
+    @staticmethod
+    def row(latencies, wall, used, allocated):
+        turns = len(latencies)
+        return (
+            f"{used['calls'] / turns:>7.2f}{turns / wall:>9.1f}"
+            f"{statistics.median(latencies) * 1e3:>9.2f}{percentile(latencies, 0.95) * 1e3:>9.2f}"
+            f"{used['input'] / turns:>9.0f}{used['output'] / turns:>9.0f}"
+            + (f"{allocated:>8.0f}" if allocated is not None else f"{'-':>8}")
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Trim the stored session history to what the agents can still replay, delete "
+        "stale sessions and checkpoint the session database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-runs', type=int, default=15, help='Runs kept per session (the agent replays at most 15)')
+        parser.add_argument('--keep-messages', type=int, default=100, help='Logged model messages kept per session, besides the system message')
+        parser.add_argument('--max-age-days', type=float, default=None, help='Delete sessions not updated for this many days')
+        parser.add_argument('--vacuum', action='store_true', help='Rebuild the database file to return freed pages')
+
+    def handle(self, *args, **options):
+        from agno2.agent import storage
+
+        if not hasattr(storage, 'compact'):
+            raise CommandError('The session storage does not support compaction (SESSION_STORAGE=agno)')
+
+        max_age_days = options['max_age_days']
+        summary = storage.compact(
+            keep_runs=options['keep_runs'],
+            keep_messages=options['keep_messages'],
+            max_age=max_age_days * 86400 if max_age_days is not None else None,
+            vacuum=options['vacuum'],
+        )
+        self.stdout.write(
+            f"Deleted {summary['sessions_deleted']} sessions, {summary['runs_deleted']} runs "
+            f"and {summary['messages_deleted']} messages"
+        )
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the talk endpoint against the offline stub model, comparing the "
+        "sync view on a fixed pool of WSGI worker threads with the async view under ASGI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per run')
+        parser.add_argument('--concurrency', type=int, default=25, help='Concurrent clients')
+        parser.add_argument('--workers', type=int, default=4, help='WSGI worker threads')
+        parser.add_argument('--latency', type=float, default=0.2, help='Simulated model latency in seconds')
+
+    def handle(self, *args, **options):
+        os.environ['AGENT_MODEL'] = 'stub'
+        os.environ['STUB_MODEL_LATENCY'] = str(options['latency'])
+        setup_test_environment()
+
+        from agno2.agent import storage
+        from agno2.pool import agent_pool
+
+        # Agents built at start-up use the real model
+        agent_pool.clear()
+
+        session_ids = []
+
+        def payload():
+            session_id = f"loadtest-{uuid.uuid4()}"
+            session_ids.append(session_id)
+            return {'message': 'I want to pay my invoices', 'session_id': session_id}
+
+        def wsgi_request():
+            started = time.perf_counter()
+            response = Client().post('/api/', payload(), content_type='application/json')
+            assert response.status_code == 200, response.content
+            return time.perf_counter() - started
+
+        def run_wsgi():
+            # Each worker thread handles one request at a time, like a sync worker
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                futures = [executor.submit(wsgi_request) for _ in range(options['requests'])]
+                return [future.result() for future in futures]
+
+        async def run_asgi():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            client = AsyncClient()
+
+            async def asgi_request():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post('/api/async/', payload(), content_type='application/json')
+                    assert response.status_code == 200, response.content
+                    return time.perf_counter() - started
+
+            return await asyncio.gather(*(asgi_request() for _ in range(options['requests'])))
+
+        self.stdout.write(
+            f"{options['requests']} requests, stub latency {options['latency']}s per model call, "
+            f"{options['workers']} WSGI workers, {options['concurrency']} concurrent ASGI clients"
+        )
+        self.stdout.write(f"{'mode':<8}{'wall s':>10}{'req/s':>10}{'p50 s':>10}{'p95 s':>10}")
+        try:
+            for mode, run in (('wsgi', run_wsgi), ('asgi', lambda: asyncio.run(run_asgi()))):
+                started = time.perf_counter()
+                latencies = sorted(run())
+                wall = time.perf_counter() - started
+                p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+                self.stdout.write(
+                    f"{mode:<8}{wall:>10.2f}{len(latencies) / wall:>10.1f}"
+                    f"{statistics.median(latencies):>10.3f}{p95:>10.3f}"
+                )
+        finally:
+            for session_id in session_ids:
+                storage.delete_session(session_id)
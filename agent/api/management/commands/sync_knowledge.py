@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Index the process files of the knowledge base, re-embedding only the files "
+        "that changed since the last sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manifest', default=None, help='Manifest of indexed files (default: tmp/knowledge_manifest.json)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Texts per embedding request and rows per insert')
+        parser.add_argument('--recreate', action='store_true', help='Drop the index and re-embed every file')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    def handle(self, *args, **options):
+        from agno2.agent import knowledge_base
+        from agno2.knowledge import MANIFEST_PATH, sync_knowledge
+
+        summary = sync_knowledge(
+            knowledge_base,
+            manifest_path=options['manifest'] or MANIFEST_PATH,
+            batch_size=options['batch_size'],
+            recreate=options['recreate'],
+            dry_run=options['dry_run'],
+        )
+
+        for key in ('added', 'updated', 'removed', 'unchanged'):
+            names = summary[key]
+            self.stdout.write(f"{key:<10}{len(names):>4}  {', '.join(names)}")
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing was written')
+        else:
+            self.stdout.write(f"Embedded {summary['chunks']} chunks in {summary['seconds']:.2f}s")
@@ -1,5 +1,10 @@
 from rest_framework import serializers
 
+from agno2.payloads import PAYLOAD_FORMATS
+
 class MessageInputSerializer(serializers.Serializer):
     message = serializers.CharField(required=True)
-    session_id = serializers.CharField(required=False) 
\ No newline at end of file
+    session_id = serializers.CharField(required=False) 
+    # Opt-in compact screens: "interned" styles, or a "patch" against the tree with digest "base"
+    format = serializers.ChoiceField(choices=PAYLOAD_FORMATS, required=False, default='tree')
+    base = serializers.CharField(required=False, allow_blank=True)
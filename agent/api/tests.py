@@ -1,3 +1,1244 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import boto3
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from django.test import SimpleTestCase
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+from agno.embedder.base import Embedder
+from agno.embedder.openai import OpenAIEmbedder
+from agno.document import Document
+from agno.document.reader.text_reader import TextReader
+
+from agno2.agent import storage
+from agno2.interface import start_agent_jsx
+from agno2.pool import AgentPool, agent_pool
+from agno2.cache import RenderCache
+from agno2.descriptors import ScreenDescriptor, render_descriptor, render_screen
+from agno2.knowledge import embed_batch, sync_knowledge
+from agno2.vectordb import LocalVectorDb
+from agno2.router import ProcessRouter, process_router
+from agno2.agent import start_agent
+from agno2.backend import BackendError, HttpBackend, MemoryBackend, TelcoBackend
+from agno2.store import SubscriberStore
+from concurrent.futures import ThreadPoolExecutor
+from agno2 import tools
+from agno2.memo import memo_scope
+from agno2.projections import project, tabulate, tool_view
+from agno2.history import CompactMemory, extract_facts, remember_facts
+from agno2.sessions import AppendOnlySqliteStorage
+from agno2.affinity import SessionCache, shard_for
+from agno2.metrics import MetricsRegistry, metrics, record_run, request_trace, span
+from agno2.flows import flow_messages
+from agno2.lab import BedrockClient
+from agno2.models import chat_model
+from agno2.routing import RoutedModel, latency_window
+from agno2.payloads import apply_patch, decode_tree, diff_tree, encode_tree, intern_styles, tree_digest
+from agno2.components import Component, ComponentError, SinglePassScreen, TreeStreamParser, parse_tree, repair_json
+from agno2.router import finished_process
+from agno.storage.session.agent import AgentSession
+from agno.memory.agent import AgentRun
+from agno.models.message import Message
+from agno.run.response import RunResponse
+from agno2.parallel import mutating, read_only
+from agno2.stub import StubModel, default_script
+from agno.agent import Agent
+import threading
+import time
+import httpx
+from agno2.bench import FIXTURES_DIR, load_jsx_fixtures
+from agno2.jsx import compile_jsx, JSXSyntaxError, JSXStreamParser
+from agno2.screens import ScreenRegistry, get_screen
+
+
+class JSXCompilerTests(SimpleTestCase):
+    def test_golden_fixtures(self):
+        fixtures = load_jsx_fixtures()
+        self.assertTrue(fixtures)
+        for name, source in fixtures.items():
+            with self.subTest(fixture=name):
+                expected = json.loads((FIXTURES_DIR / f"{name}.json").read_text())
+                self.assertEqual(compile_jsx(source), expected)
+
+    def test_inline_children_are_concatenated(self):
+        tree = compile_jsx('<Text>Total: {89.99} {"USD"}</Text>')
+        self.assertEqual(tree, {"type": "Text", "children": "Total: 89.99 USD"})
+
+    def test_unknown_expressions_are_kept_as_source(self):
+        tree = compile_jsx("<Button title={label.toUpperCase()} onPress={handleSubmit} />")
+        self.assertEqual(tree["props"], {"title": "label.toUpperCase()", "onPress": "handleSubmit"})
+
+    def test_invalid_jsx_raises(self):
+        for source in ["<View><Text>hi</View>", "<View>", "no markup here", "<View/><View/>"]:
+            with self.subTest(source=source):
+                with self.assertRaises(JSXSyntaxError):
+                    compile_jsx(source)
+
+
+class JSXStreamParserTests(SimpleTestCase):
+    def test_completed_children_are_emitted_while_streaming(self):
+        source = (FIXTURES_DIR / "fenced_payment.jsx").read_text()
+        parser = JSXStreamParser()
+        emitted = []
+        for start in range(0, len(source), 5):
+            emitted.extend(parser.feed(source[start : start + 5]))
+
+        tree = parser.close()
+        self.assertEqual(tree, compile_jsx(source))
+        self.assertEqual([index for index, _ in emitted], list(range(len(tree["children"]))))
+        self.assertEqual([node for _, node in emitted], tree["children"])
+
+    def test_incomplete_child_is_not_emitted(self):
+        parser = JSXStreamParser()
+        self.assertEqual(parser.feed('<View><Text>Hello</Text><Button title="Pay'), [(0, {"type": "Text", "children": "Hello"})])
+        self.assertEqual(parser.feed('" onPress={handleSubmit} />'), [(1, {"type": "Button", "props": {"title": "Pay", "onPress": "handleSubmit"}})])
+
+
+class ScreenRegistryTests(SimpleTestCase):
+    def test_screens_are_compiled_once_and_recompiled_on_change(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "done.jsx"
+            path.write_text("<Text>Done</Text>")
+            registry = ScreenRegistry(directory)
+            registry.warm()
+
+            self.assertEqual(registry.get("done"), {"type": "Text", "children": "Done"})
+            self.assertIs(registry.get("done"), registry.get("done"))
+            self.assertEqual(registry.compilations, 1)
+
+            path.write_text("<Text>All done</Text>")
+            os.utime(path, ns=(0, 0))
+            self.assertEqual(registry.get("done"), {"type": "Text", "children": "All done"})
+            self.assertEqual(registry.compilations, 2)
+
+    def test_unknown_screen_raises(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(KeyError):
+                ScreenRegistry(directory).get("missing")
+
+
+class AgentPoolTests(SimpleTestCase):
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_checked_out_agents_do_not_share_session_state(self):
+        pool = AgentPool()
+        pool.register("jsx", start_agent_jsx)
+        with pool.checkout("jsx", "session-a") as agent:
+            agent.run("first")
+            first = agent
+            self.assertEqual(len(agent.memory.runs), 1)
+        with pool.checkout("jsx", "session-b") as agent:
+            self.assertIs(agent, first)
+            self.assertEqual(agent.session_id, "session-b")
+            self.assertIsNone(agent.memory)
+            self.assertIsNone(agent.run_response)
+
+        stats = pool.stats()["jsx"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["idle"], stats["in_use"]), (1, 1, 1, 0))
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_agents_are_discarded_when_the_run_fails(self):
+        pool = AgentPool()
+        pool.register("jsx", start_agent_jsx)
+        with self.assertRaises(RuntimeError):
+            with pool.checkout("jsx"):
+                raise RuntimeError("model failed")
+        self.assertEqual(pool.stats()["jsx"]["idle"], 0)
+        self.assertEqual(pool.stats()["jsx"]["discarded"], 1)
+
+
+class RenderCacheTests(SimpleTestCase):
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_keys_ignore_whitespace_but_not_instructions(self):
+        cache = RenderCache()
+        agent = start_agent_jsx()
+        key = cache.key_for(agent, "Please give me\n  your phone number")
+        self.assertEqual(key, cache.key_for(agent, " Please give me your phone number "))
+        agent.instructions = ["Render everything as a list"]
+        self.assertNotEqual(key, cache.key_for(agent, "Please give me your phone number"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = RenderCache(max_entries=2)
+        cache.set("a", {"type": "Text", "children": "a"})
+        cache.set("b", {"type": "Text", "children": "b"})
+        cache.get("a")
+        cache.set("c", {"type": "Text", "children": "c"})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"type": "Text", "children": "a"})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 2))
+
+    def test_sqlite_tier_survives_a_new_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = Path(directory) / "render_cache.sqlite3"
+            RenderCache(db_path=db_path).set("a", {"type": "Text", "children": "a"})
+            cache = RenderCache(db_path=db_path)
+            self.assertEqual(cache.get("a"), {"type": "Text", "children": "a"})
+            self.assertEqual(cache.get("a"), {"type": "Text", "children": "a"})
+            self.assertEqual((cache.stats()["disk_hits"], cache.stats()["hits"]), (1, 1))
+
+
+class ScreenDescriptorTests(SimpleTestCase):
+    def test_form_is_rendered_locally(self):
+        descriptor = ScreenDescriptor(
+            kind="form",
+            text="Please give me your phone number",
+            fields=[{"name": "phone_number", "label": "Phone number", "kind": "phone"}],
+            actions=["Continue"],
+        )
+        tree = render_descriptor(descriptor)
+        self.assertEqual([child["type"] for child in tree["children"]], ["Text", "Text", "TextInput", "Button"])
+        self.assertEqual(tree["children"][2]["props"]["name"], "phone_number")
+        self.assertEqual(tree["children"][2]["props"]["keyboardType"], "phone-pad")
+        self.assertEqual(tree["children"][3]["props"], {"title": "Continue", "onPress": "handleSubmit"})
+
+    def test_choice_rows_become_buttons(self):
+        descriptor = ScreenDescriptor(
+            kind="choice",
+            text="Pick a package",
+            rows=[{"title": "Standard", "details": ["$59.99"]}, {"title": "Basic", "details": ["$39.99"]}],
+        )
+        buttons = render_descriptor(descriptor)["children"][1:]
+        self.assertEqual([button["props"]["title"] for button in buttons], ["Standard $59.99", "Basic $39.99"])
+        self.assertEqual([button["props"]["value"] for button in buttons], ["Standard", "Basic"])
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_picked_choice_reaches_the_next_turn(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        descriptor = ScreenDescriptor(kind="choice", text="Pick a package", rows=[{"title": "Standard"}, {"title": "Basic"}])
+        picked = render_descriptor(descriptor)["children"][2]["props"]
+
+        # What the app sends when the row is pressed: storeData(name, value), then handleSubmit
+        message = json.dumps({picked["name"]: picked["value"]})
+        response = APIClient().post("/api/", {"message": message, "session_id": session_id}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(storage.read(session_id).memory["runs"][0]["message"]["content"], '{"choice": "Basic"}')
+
+    def test_freeform_screens_are_left_to_the_jsx_agent(self):
+        descriptor = ScreenDescriptor(kind="freeform", text="Your payment was processed", actions=["Done"])
+        self.assertIsNone(render_descriptor(descriptor))
+        self.assertEqual(descriptor.as_text(), "Your payment was processed\n<default_action>Done</default_action>")
+
+
+class CountingEmbedder(Embedder):
+    """Embeds a text as counts of a few keywords and records every text it embedded."""
+
+    KEYWORDS = ("pay", "credit", "package")
+
+    def __init__(self):
+        super().__init__(dimensions=len(self.KEYWORDS))
+        self.texts = []
+
+    def get_embedding(self, text):
+        self.texts.append(text)
+        return [float(text.lower().count(keyword)) for keyword in self.KEYWORDS]
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+class KnowledgeSyncTests(SimpleTestCase):
+    def test_only_changed_files_are_embedded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "docs").mkdir()
+            (root / "docs" / "pay.txt").write_text("Pay an invoice")
+            (root / "docs" / "credit.txt").write_text("Retrieve credit")
+            vector_db = LocalVectorDb(root / "index", embedder=CountingEmbedder())
+            knowledge_base = SimpleNamespace(path=root / "docs", formats=[".txt"], reader=TextReader(), vector_db=vector_db)
+            manifest = root / "manifest.json"
+
+            summary = sync_knowledge(knowledge_base, manifest)
+            self.assertEqual((summary["added"], summary["chunks"]), (["credit", "pay"], 2))
+
+            summary = sync_knowledge(knowledge_base, manifest)
+            self.assertEqual((summary["unchanged"], summary["chunks"]), (["credit", "pay"], 0))
+            self.assertEqual(len(vector_db.embedder.texts), 2)
+
+            (root / "docs" / "pay.txt").write_text("Pay an invoice with a card")
+            (root / "docs" / "credit.txt").unlink()
+            summary = sync_knowledge(knowledge_base, manifest)
+            self.assertEqual((summary["updated"], summary["removed"], summary["chunks"]), (["pay"], ["credit"], 1))
+            self.assertEqual([document.name for document in vector_db.search("pay", limit=5)], ["pay"])
+            self.assertEqual(list(json.loads(manifest.read_text())["files"]), ["pay"])
+
+    def test_openai_embeddings_are_requested_in_batches(self):
+        client = mock.Mock()
+        client.embeddings.create.side_effect = lambda **params: SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(i)]) for i in range(len(params["input"]))]
+        )
+        embedder = OpenAIEmbedder(openai_client=client)
+        embeddings = embed_batch(embedder, ["a", "b", "a", "c"], batch_size=2)
+        self.assertEqual(embeddings, {"a": [0.0], "b": [1.0], "c": [0.0]})
+        self.assertEqual([call.kwargs["input"] for call in client.embeddings.create.call_args_list], [["a", "b"], ["c"]])
+
+
+class LocalVectorDbTests(SimpleTestCase):
+    def test_search_ranks_by_cosine_similarity_and_persists(self):
+        with tempfile.TemporaryDirectory() as directory:
+            vector_db = LocalVectorDb(directory, embedder=CountingEmbedder())
+            vector_db.create()
+            vector_db.insert([
+                Document(name="make_payment", id="make_payment", content="Pay an invoice, pay now"),
+                Document(name="retrieve_credit", id="retrieve_credit", content="Check your credit"),
+                Document(name="change_bundle", id="change_bundle", content="Pick a package to pay for"),
+            ])
+            results = vector_db.search("I want to pay", limit=2)
+            self.assertEqual([document.name for document in results], ["make_payment", "change_bundle"])
+
+            reopened = LocalVectorDb(directory, embedder=CountingEmbedder())
+            self.assertEqual(reopened.get_count(), 3)
+            self.assertEqual(reopened.search("credit", limit=1)[0].name, "retrieve_credit")
+
+            vector_db.delete_names(["retrieve_credit"])
+            self.assertFalse(reopened.name_exists("retrieve_credit"))
+
+    def test_readers_never_mix_generations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            vector_db = LocalVectorDb(directory, embedder=CountingEmbedder())
+            vector_db.insert([Document(name="make_payment", id="make_payment", content="Pay an invoice")])
+            reader = LocalVectorDb(directory, embedder=CountingEmbedder())
+            self.assertEqual(reader.get_count(), 1)
+
+            # A write that has not replaced the manifest yet is invisible to readers
+            with mock.patch("agno2.vectordb.os.replace"):
+                vector_db.insert([Document(name="retrieve_credit", id="retrieve_credit", content="Check your credit")])
+            self.assertEqual(reader.get_count(), 1)
+            self.assertEqual(reader.search("credit", limit=5)[0].name, "make_payment")
+
+            vector_db.insert([Document(name="change_bundle", id="change_bundle", content="Pick a package")])
+            self.assertEqual(reader.get_count(), 2)
+            self.assertEqual(len(list(Path(directory).glob("documents-*.json"))), 2)
+
+
+class ProcessRouterTests(SimpleTestCase):
+    def test_messages_are_classified_against_the_process_documents(self):
+        self.assertEqual(process_router.classify("I want to pay my invoices"), "make_payment")
+        self.assertEqual(process_router.classify("I want to change my package"), "change_bundle")
+        self.assertEqual(process_router.classify("What is my credit?"), "retrieve_credit")
+        self.assertIsNone(process_router.classify("+1555123456"))
+
+    def test_active_process_is_kept_until_another_clearly_wins(self):
+        self.assertEqual(process_router.resolve("+1555123456", active="make_payment"), "make_payment")
+        self.assertEqual(process_router.resolve("The first one please", active="change_bundle"), "change_bundle")
+        self.assertEqual(process_router.resolve("I want to change my package", active="make_payment"), "change_bundle")
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_routed_turns_skip_the_knowledge_search_tool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            (Path(directory) / "make_payment.txt").write_text("Process Name: Pay an invoice\n\n1. Ask for the phone number")
+            (Path(directory) / "retrieve_credit.txt").write_text("Process Name: Retrieve credit\n\n1. Ask for the phone number")
+            router = ProcessRouter(directory)
+            agent = start_agent()
+            agent.update_model()
+
+            def tool_names():
+                return [tool["function"]["name"] for tool in agent.model._tools]
+
+            self.assertEqual(router.route(agent, "I want to pay an invoice"), "make_payment")
+            self.assertIn("Pay an invoice", agent.additional_context)
+            self.assertNotIn("search_knowledge_base", tool_names())
+
+            self.assertEqual(router.route(agent, "+1555123456"), "make_payment")
+            self.assertEqual(agent.session_state["process"], "make_payment")
+
+            agent.session_state = {}
+            self.assertIsNone(router.route(agent, "hello"))
+            self.assertIsNone(agent.additional_context)
+            self.assertIn("search_knowledge_base", tool_names())
+
+
+class SubscriberStoreTests(SimpleTestCase):
+    def test_subscribers_do_not_share_invoices_or_cards(self):
+        store = SubscriberStore([{"invoice_id": "INV-1", "status": "overdue"}])
+        self.assertEqual(store.pay_invoice("+1555", "INV-1")["status"], "paid")
+        self.assertIsNone(store.pay_invoice("+1555", "INV-1"))
+        self.assertEqual(store.invoices("+1666"), [{"invoice_id": "INV-1", "status": "overdue"}])
+
+        card = store.add_card("+1555", "4111", "12/2030")
+        self.assertEqual(store.cards("+1555"), [card])
+        self.assertEqual(store.cards("+1666"), [])
+
+    def test_concurrent_cards_get_unique_ids(self):
+        store = SubscriberStore()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            cards = list(executor.map(lambda i: store.add_card(f"+1555{i % 4}", "4111", "12/2030"), range(200)))
+        self.assertEqual(len({card["payment_method_id"] for card in cards}), 200)
+        self.assertEqual(sum(len(store.cards(f"+1555{i}")) for i in range(4)), 200)
+
+
+class BackendTests(SimpleTestCase):
+    def test_tools_read_and_mutate_through_the_backend(self):
+        with mock.patch.object(tools, "backend", MemoryBackend()):
+            invoices = json.loads(tools.get_outstanding_invoices("+15551234567"))["data"]["invoices"]
+            self.assertEqual([invoice["invoice_id"] for invoice in invoices], ["INV-2024-0342"])
+            paid = json.loads(tools.make_payment("+15551234567", "INV-2024-0342"))
+            self.assertEqual(paid["data"]["invoice_status"], "paid")
+            self.assertEqual(json.loads(tools.get_outstanding_invoices("+15551234567"))["data"]["invoices"], [])
+            self.assertEqual(json.loads(tools.activate_package("+15551234567", "Basic"))["status"], "success")
+            self.assertEqual(json.loads(tools.get_available_packages("+15551234567"))["data"]["current_package"], "Basic")
+            self.assertFalse(json.loads(tools.validate_phone_number("555"))["data"]["is_valid"])
+            self.assertTrue(json.loads(tools.validate_phone_number("+15550000000"))["data"]["is_valid"])
+        with mock.patch.object(tools, "backend", MemoryBackend(subscribers=["+15551234567"])):
+            self.assertTrue(json.loads(tools.validate_phone_number("+15551234567"))["data"]["is_valid"])
+            self.assertFalse(json.loads(tools.validate_phone_number("+15550000000"))["data"]["is_valid"])
+
+    def test_incomplete_backends_fail_on_construction(self):
+        class ReadOnlyBackend(TelcoBackend):
+            def fetch_account(self, user_id):
+                return None
+
+            def fetch_packages(self):
+                return []
+
+        with self.assertRaises(TypeError):
+            ReadOnlyBackend()
+
+    def test_unexpected_payment_response_is_a_backend_error(self):
+        def handler(request):
+            if request.method == "GET":
+                return httpx.Response(200, json={"user": {}, "credit": {}, "invoices": [], "payment_methods": []})
+            return httpx.Response(200, json={"status": "queued"})
+
+        backend = HttpBackend("http://backend.test", transport=httpx.MockTransport(handler))
+        with self.assertRaisesRegex(BackendError, "queued"):
+            backend.pay_invoice("+15551234567", "INV-1")
+        with mock.patch.object(tools, "backend", backend):
+            self.assertEqual(json.loads(tools.make_payment("+15551234567", "INV-1"))["status"], "error")
+
+    def test_account_is_fetched_once_per_turn(self):
+        requests = []
+
+        def handler(request):
+            requests.append((request.method, request.url.path))
+            if request.method == "GET":
+                return httpx.Response(200, json={"user": {}, "credit": {}, "invoices": [{"invoice_id": "INV-1"}], "payment_methods": []})
+            return httpx.Response(200, json={"invoice": {"invoice_id": "INV-1", "status": "paid"}, "transaction_id": "TXN-1"})
+
+        backend = HttpBackend("http://backend.test", transport=httpx.MockTransport(handler))
+        with mock.patch.object(tools, "backend", backend):
+            tools.validate_phone_number("+15551234567")
+            tools.get_outstanding_invoices("+15551234567")
+            tools.get_available_cards("+15551234567")
+            tools.make_payment("+15551234567", "INV-1")
+            tools.get_outstanding_invoices("+15551234567")
+        self.assertEqual(requests, [
+            ("GET", "/accounts/+15551234567"),
+            ("POST", "/accounts/+15551234567/invoices/INV-1/payments"),
+            ("GET", "/accounts/+15551234567"),
+        ])
+
+    def test_backend_failures_are_reported_to_the_model(self):
+        def handler(request):
+            raise httpx.ConnectTimeout("timed out", request=request)
+
+        backend = HttpBackend("http://backend.test", transport=httpx.MockTransport(handler))
+        with mock.patch.object(tools, "backend", backend):
+            result = json.loads(tools.get_outstanding_invoices("+15551234567"))
+        self.assertEqual(result["status"], "error")
+        self.assertIn("timed out", result["data"]["message"])
+
+
+class MemoScopeTests(SimpleTestCase):
+    def test_reads_are_shared_within_a_turn_and_refreshed_after_writes(self):
+        backend = MemoryBackend()
+        with mock.patch.object(tools, "backend", backend), memo_scope() as scope:
+            tools.validate_phone_number("+15551234567")
+            tools.get_user_information("+15551234567")
+            tools.get_available_cards("+15551234567")
+            self.assertEqual(backend.account_fetches, 1)
+            tools.add_card("+15551234567", "4111111111111111", "12/2030")
+            cards = json.loads(tools.get_available_cards("+15551234567"))["data"]["payment_methods"]
+            self.assertEqual([card["card_number"] for card in cards], ["4111111111111111"])
+            self.assertEqual(backend.account_fetches, 2)
+        self.assertEqual(scope.hits, 2)
+
+    def test_activate_package_reuses_the_package_lookup(self):
+        backend = MemoryBackend()
+        with mock.patch.object(tools, "backend", backend), memo_scope():
+            tools.get_available_packages("+15551234567")
+            with mock.patch.object(backend, "fetch_packages", side_effect=AssertionError("packages fetched twice")):
+                self.assertEqual(json.loads(tools.activate_package("+15551234567", "Standard"))["status"], "success")
+            self.assertEqual(json.loads(tools.get_available_packages("+15551234567"))["data"]["current_package"], "Standard")
+
+    def test_reads_outside_a_scope_are_not_memoized(self):
+        backend = MemoryBackend()
+        with mock.patch.object(tools, "backend", backend):
+            tools.validate_phone_number("+15551234567")
+            tools.get_user_information("+15551234567")
+        self.assertEqual(backend.account_fetches, 2)
+
+
+class ProjectionTests(SimpleTestCase):
+    def test_project_selects_dotted_paths_through_lists(self):
+        data = {"user_id": "+1555", "packages": [{"name": "Basic", "data": {"amount": "10GB", "cap": "10GB"}, "price": 39.99}]}
+        self.assertEqual(project(data, ["packages.name", "packages.data.amount"]), {"packages": [{"name": "Basic", "data": {"amount": "10GB"}}]})
+        self.assertIs(project(data, None), data)
+
+    def test_tabulate_sends_list_keys_once(self):
+        rows = [{"id": "a", "data": {"amount": 1}}, {"id": "b", "data": {"amount": 2}, "extra": True}]
+        self.assertEqual(tabulate({"rows": rows, "n": 2}), {
+            "rows": {"columns": ["id", "data.amount", "extra"], "rows": [["a", 1, None], ["b", 2, True]]},
+            "n": 2,
+        })
+
+    def test_tools_return_the_process_view(self):
+        with mock.patch.object(tools, "backend", MemoryBackend()):
+            full = tools.get_user_information("+15551234567")
+            with tool_view("retrieve_credit"):
+                compact = tools.get_user_information("+15551234567")
+            with tool_view(None):
+                invoices = json.loads(tools.get_outstanding_invoices("+15551234567"))["data"]["invoices"]
+        self.assertEqual(json.loads(compact), {"status": "success", "data": {"user_profile": {"account_status": "active"}}})
+        self.assertLess(len(compact), len(full) / 4)
+        self.assertEqual(invoices["rows"][0][invoices["columns"].index("invoice_id")], "INV-2024-0342")
+
+
+def tool_run(text, tool_name, tool_args, result, reply):
+    tool_call = {"id": "call_1", "type": "function", "function": {"name": tool_name, "arguments": json.dumps(tool_args)}}
+    return AgentRun(response=RunResponse(content=reply, messages=[
+        Message(role="user", content=text),
+        Message(role="assistant", tool_calls=[tool_call]),
+        Message(role="tool", tool_call_id="call_1", tool_name=tool_name, tool_args=tool_args, content=json.dumps(result)),
+        Message(role="assistant", content=reply),
+    ]))
+
+
+class CompactHistoryTests(SimpleTestCase):
+    def test_older_runs_lose_tool_traffic_and_history_fits_the_budget(self):
+        runs = [tool_run(f"message {i}", "get_available_cards", {"user_id": "+1555"}, {"status": "success", "data": {"payment_methods": ["x" * 400]}}, f"reply {i} " + "y" * 200) for i in range(10)]
+        memory = CompactMemory(runs=runs, token_budget=300)
+        history = memory.get_messages_from_last_n_runs()
+        self.assertEqual([message.role for message in history[-4:]], ["user", "assistant", "tool", "assistant"])
+        self.assertNotIn("tool", [message.role for message in history[:-4]])
+        self.assertTrue(history[-1].content.startswith("reply 9 "))
+        self.assertEqual(history[0].content, "message 8")
+        self.assertEqual(len(CompactMemory(runs=runs, token_budget=100_000).get_messages_from_last_n_runs()), 4 + 2 * 9)
+
+    def test_latest_run_is_kept_when_it_alone_exceeds_the_budget(self):
+        earlier = tool_run("hello", "validate_phone_number", {"phone_number": "+1555"}, {"status": "success", "data": {"is_valid": True}}, "Which invoice?")
+        invoices = {"status": "success", "data": {"invoices": [{"invoice_id": f"INV-{i}", "amount": 10} for i in range(200)]}}
+        latest = tool_run("show my invoices", "get_user_invoices", {"user_id": "+1555"}, invoices, "Here are your invoices")
+        history = CompactMemory(runs=[earlier, latest], token_budget=300).get_messages_from_last_n_runs()
+        self.assertEqual(
+            [(message.role, message.content) for message in history],
+            [("user", "hello"), ("assistant", "Which invoice?"), ("user", "show my invoices"), ("assistant", "Here are your invoices")],
+        )
+
+    def test_facts_survive_until_the_process_finishes(self):
+        validate = tool_run("+1555", "validate_phone_number", {"phone_number": "+1555"}, {"status": "success", "data": {"is_valid": True}}, "Which invoice?")
+        payment = tool_run("INV-1", "make_payment", {"user_id": "+1555", "invoice_id": "INV-1", "payment_method_id": "card_1"}, {"status": "success", "data": {"transaction_id": "TXN-1"}}, "Paid. FINISHED_PROCESS")
+        self.assertEqual(extract_facts(payment.response.messages), {"invoice_id": "INV-1", "payment_method_id": "card_1", "transaction_id": "TXN-1", "last_step": "make_payment"})
+
+        agent = SimpleNamespace(session_state={"process": "make_payment"}, memory=CompactMemory(runs=[validate]), additional_context="<process>\npay\n</process>")
+        remember_facts(agent)
+        self.assertEqual(agent.session_state["facts"], {"phone_number": "+1555", "last_step": "validate_phone_number"})
+        self.assertTrue(agent.additional_context.endswith('<facts>\n{"phone_number": "+1555", "last_step": "validate_phone_number"}\n</facts>'))
+
+        agent.memory.runs.append(payment)
+        self.assertEqual(remember_facts(agent), {"phone_number": "+1555"})
+
+    def test_selection_survives_compaction_before_the_payment(self):
+        validate = tool_run("+1555", "validate_phone_number", {"phone_number": "+1555"}, {"status": "success", "data": {"is_valid": True}}, "Which invoice?")
+        pick = AgentRun(response=RunResponse(content="Which card?", messages=[
+            Message(role="user", content='{"choice": "INV-2024-0342"}'),
+            Message(role="assistant", content="Which card do you want to pay INV-2024-0342 with? " + "z" * 400),
+        ]))
+        card = AgentRun(response=RunResponse(content="Paying now", messages=[
+            Message(role="user", content="The one ending 1111, card_1"),
+            Message(role="assistant", content="Paying now " + "z" * 400),
+        ]))
+        agent = SimpleNamespace(session_state={"process": "make_payment"}, memory=CompactMemory(runs=[], token_budget=150), additional_context=None)
+        for run in (validate, pick, card):
+            agent.memory.runs.append(run)
+            agent.additional_context = None
+            facts = remember_facts(agent)
+
+        # The invoice choice is no longer in the replayed history, only in the facts
+        history = " ".join(message.get_content_string() for message in agent.memory.get_messages_from_last_n_runs())
+        self.assertNotIn('"choice"', history)
+        self.assertEqual(facts["invoice_id"], "INV-2024-0342")
+        self.assertEqual(facts["payment_method_id"], "card_1")
+        self.assertIn('"invoice_id": "INV-2024-0342"', agent.additional_context)
+
+
+def agent_session(session_id, runs, state=None):
+    return AgentSession(
+        session_id=session_id,
+        agent_id="agent",
+        memory={"runs": [{"response": {"content": run}} for run in runs], "messages": [{"role": "system", "content": "sys"}]},
+        session_data={"session_state": state or {}},
+    )
+
+
+class AppendOnlySqliteStorageTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_file = str(Path(directory.name) / "sessions.db")
+
+    def test_turns_append_only_their_new_runs(self):
+        storage = AppendOnlySqliteStorage(db_file=self.db_file)
+        storage.upsert(agent_session("s1", ["a", "b"]))
+        storage.upsert(agent_session("s1", ["a", "b", "c"], {"process": "make_payment"}))
+        self.assertEqual(storage.stats()["items_written"], 3 + 1)
+        session = AppendOnlySqliteStorage(db_file=self.db_file).read("s1")
+        self.assertEqual([run["response"]["content"] for run in session.memory["runs"]], ["a", "b", "c"])
+        self.assertEqual(session.memory["messages"], [{"role": "system", "content": "sys"}])
+        self.assertEqual(session.session_data["session_state"], {"process": "make_payment"})
+
+        storage.upsert(agent_session("s1", ["a", "x"]))
+        self.assertEqual(storage.stats()["full_rewrites"], 1)
+        self.assertEqual([run["response"]["content"] for run in storage.read("s1").memory["runs"]], ["a", "x"])
+        storage.delete_session("s1")
+        self.assertIsNone(storage.read("s1"))
+
+    def test_write_behind_coalesces_turns(self):
+        storage = AppendOnlySqliteStorage(db_file=self.db_file, write_behind=3600)
+        for turn in range(1, 4):
+            storage.upsert(agent_session("s1", ["run"] * turn))
+        self.assertEqual(len(storage.read("s1").memory["runs"]), 3)
+        self.assertEqual(storage.stats(), {"writes": 0, "items_written": 0, "full_rewrites": 0, "pending": 1})
+        storage.flush()
+        self.assertEqual(storage.stats()["writes"], 1)
+        self.assertEqual(len(AppendOnlySqliteStorage(db_file=self.db_file).read("s1").memory["runs"]), 3)
+
+    def test_compact_keeps_the_last_runs(self):
+        storage = AppendOnlySqliteStorage(db_file=self.db_file)
+        storage.upsert(agent_session("s1", list("abcde")))
+        storage.upsert(agent_session("s2", ["a"]))
+        self.assertEqual(storage.compact(keep_runs=2, keep_messages=0), {"sessions_deleted": 0, "runs_deleted": 3, "messages_deleted": 0})
+        session = storage.read("s1")
+        self.assertEqual([run["response"]["content"] for run in session.memory["runs"]], ["d", "e"])
+        # The next turn appends to the trimmed history
+        storage.upsert(agent_session("s1", list("def")))
+        self.assertEqual(storage.stats()["full_rewrites"], 0)
+        self.assertEqual(len(storage.read("s1").memory["runs"]), 3)
+        self.assertEqual(storage.compact(max_age=-1)["sessions_deleted"], 2)
+        self.assertEqual(storage.get_all_session_ids(), [])
+
+
+class SessionCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_file = str(Path(directory.name) / "sessions.db")
+
+    def test_back_to_back_turns_skip_the_storage_load(self):
+        cache = SessionCache(AppendOnlySqliteStorage(db_file=self.db_file))
+        cache.upsert(agent_session("s1", ["a"], {"process": "make_payment"}))
+        with mock.patch.object(cache.storage, "read", side_effect=AssertionError("loaded from storage")):
+            session = cache.read("s1")
+            session.session_data["session_state"]["process"] = None
+            self.assertEqual(cache.read("s1").session_data["session_state"], {"process": "make_payment"})
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_queued_writes_are_not_stale(self):
+        cache = SessionCache(AppendOnlySqliteStorage(db_file=self.db_file, write_behind=3600))
+        cache.upsert(agent_session("s1", ["a"]))
+        with mock.patch.object(cache.storage, "read", side_effect=AssertionError("loaded from storage")):
+            for turn in range(2, 5):
+                self.assertEqual(len(cache.read("s1").memory["runs"]), turn - 1)
+                cache.upsert(agent_session("s1", ["a"] * turn))
+        cache.flush()
+        self.assertEqual(len(cache.read("s1").memory["runs"]), 4)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["stale"]), (4, 0))
+
+    def test_turns_written_by_another_worker_are_reloaded(self):
+        cache = SessionCache(AppendOnlySqliteStorage(db_file=self.db_file))
+        cache.upsert(agent_session("s1", ["a"]))
+        AppendOnlySqliteStorage(db_file=self.db_file).upsert(agent_session("s1", ["a", "b"]))
+        self.assertEqual(len(cache.read("s1").memory["runs"]), 2)
+        self.assertEqual(cache.stats()["stale"], 1)
+
+    def test_only_the_workers_shard_is_cached_and_evicted_lru(self):
+        session_ids = [f"s{i}" for i in range(20)]
+        owned = [session_id for session_id in session_ids if shard_for(session_id, 2) == 0]
+        cache = SessionCache(AppendOnlySqliteStorage(db_file=self.db_file), max_sessions=2, shard=0, shards=2)
+        for session_id in session_ids:
+            cache.upsert(agent_session(session_id, ["a"]))
+            self.assertIsNotNone(cache.read(session_id))
+        stats = cache.stats()
+        self.assertEqual(stats["bypassed"], len(session_ids) - len(owned))
+        self.assertEqual((stats["hits"], stats["entries"], stats["evictions"]), (len(owned), 2, len(owned) - 2))
+
+
+class ParallelToolCallsTests(SimpleTestCase):
+    def setUp(self):
+        self.log = []
+        lock = threading.Lock()
+
+        def tracked(name):
+            with lock:
+                self.log.append(("start", name))
+            time.sleep(0.05)
+            with lock:
+                self.log.append(("end", name))
+            return name
+
+        @read_only
+        def invoices(user_id: str) -> str:
+            """Invoices."""
+            return tracked("invoices")
+
+        @read_only
+        def cards(user_id: str) -> str:
+            """Cards."""
+            return tracked("cards")
+
+        @mutating
+        def pay(user_id: str) -> str:
+            """Pay."""
+            return tracked("pay")
+
+        def call(index, name):
+            return {"id": f"call_{index}", "type": "function", "function": {"name": name, "arguments": '{"user_id": "+1555"}'}}
+
+        def script(messages):
+            if messages[-1].role == "tool":
+                return "done"
+            return {"content": "", "tool_calls": [call(1, "invoices"), call(2, "cards"), call(3, "pay"), call(4, "invoices")]}
+
+        self.agent = Agent(model=StubModel(script=script), tools=[invoices, cards, pay], telemetry=False)
+
+    def assertScheduled(self, response):
+        self.assertEqual([message.tool_name for message in response.messages if message.role == "tool"], ["invoices", "cards", "pay", "invoices"])
+        # Both reads start before either ends; the payment runs alone, between the reads around it
+        self.assertEqual({event for event, _ in self.log[:2]}, {"start"})
+        self.assertEqual(self.log[4:], [("start", "pay"), ("end", "pay"), ("start", "invoices"), ("end", "invoices")])
+
+    def test_reads_run_concurrently_and_mutations_alone(self):
+        self.assertScheduled(self.agent.run("pay"))
+
+    async def test_async_gather_keeps_mutations_alone(self):
+        self.assertScheduled(await self.agent.arun("pay"))
+
+    def test_agent_tools_are_tagged(self):
+        for tool in start_agent().tools:
+            self.assertIn(getattr(tool, "read_only", None), (True, False), tool.__name__)
+
+
+class TalkAgentViewTests(SimpleTestCase):
+    def test_new_session_returns_welcome_screen(self):
+        response = APIClient().post("/api/", {"message": "hi", "session_id": "NEW"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data["session_id"], "NEW")
+        self.assertEqual(response.data["message"], compile_jsx((FIXTURES_DIR / "welcome.jsx").read_text()))
+
+    def test_stream_new_session_sends_welcome_screen(self):
+        response = APIClient().post("/api/stream/", {"message": "hi", "session_id": "NEW"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join(response.streaming_content).decode()
+        events = [block.split("\n")[0].removeprefix("event: ") for block in body.strip().split("\n\n")]
+        self.assertEqual(events, ["session", "tree", "done"])
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    async def test_stream_is_asynchronous_under_asgi(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        response = await AsyncClient().post("/api/stream/", {"message": "hi", "session_id": session_id}, content_type="application/json")
+        self.assertTrue(response.is_async)
+        events = []
+        async for block in response.streaming_content:
+            events.append(block.decode().split("\n")[0].removeprefix("event: "))
+        self.assertEqual(events[0], "session")
+        self.assertIn("token", events)
+        self.assertEqual(events[-3:], ["tree", "timing", "done"])
+
+    async def test_async_new_session_returns_welcome_screen(self):
+        response = await AsyncClient().post("/api/async/", {"message": "hi", "session_id": "NEW"}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"]["type"], "View")
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    async def test_async_pipeline_keeps_session_history(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        client = AsyncClient()
+        for message in ["I want to pay my invoices", "+1555123456"]:
+            response = await client.post("/api/async/", {"message": message, "session_id": session_id}, content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["message"]["children"][0], {"type": "Text", "children": f"You said: {message}"})
+        session = storage.read(session_id)
+        self.assertEqual(len(session.memory["runs"]), 2)
+        self.assertEqual(session.session_data["session_state"]["process"], "make_payment")
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub", "AGENT_SCREENS": "structured"})
+    def test_structured_screens_skip_the_jsx_agent(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        jsx_misses = agent_pool.stats()["jsx"]["misses"]
+        response = APIClient().post("/api/", {"message": "I want to pay", "session_id": session_id}, format="json")
+        self.assertEqual(response.status_code, 200)
+        children = response.data["message"]["children"]
+        self.assertEqual(children[0]["children"], "You said: I want to pay")
+        self.assertEqual(children[2]["props"]["name"], "message")
+        self.assertEqual(agent_pool.stats()["jsx"]["misses"], jsx_misses)
+
+
+class MetricsTests(SimpleTestCase):
+    def test_render_counters_histograms_and_stats(self):
+        registry = MetricsRegistry()
+        registry.describe("tokens_total", "Model tokens.")
+        registry.inc("tokens_total", 12, agent="main", type="input")
+        registry.inc("tokens_total", 3, agent="main", type="input")
+        registry.observe("stage_duration_seconds", 0.02, stage="agent")
+        registry.register_stats("pool", lambda: {"main": {"idle": 2, "warm": True}}, label="agent")
+        text = registry.render()
+        self.assertIn("# HELP agent_tokens_total Model tokens.", text)
+        self.assertIn('agent_tokens_total{agent="main",type="input"} 15', text)
+        self.assertIn('agent_stage_duration_seconds_bucket{stage="agent",le="0.01"} 0', text)
+        self.assertIn('agent_stage_duration_seconds_bucket{stage="agent",le="0.025"} 1', text)
+        self.assertIn('agent_stage_duration_seconds_count{stage="agent"} 1', text)
+        self.assertIn('agent_pool_idle{agent="main"} 2', text)
+        self.assertNotIn("agent_pool_warm", text)
+
+    def test_spans_and_tool_calls_are_added_to_the_request_trace(self):
+        tool = Message(role="tool", tool_name="get_user_invoices", content="{}")
+        tool.metrics.time = 0.25
+        run = RunResponse(messages=[tool], metrics={"time": [0.5], "input_tokens": [100], "output_tokens": [20]})
+        tokens = metrics.counter("tokens_total", agent="trace-test", type="input")
+        with request_trace("test") as trace:
+            with span("agent"):
+                pass
+            record_run("trace-test", run)
+        names = list(trace.totals())
+        self.assertEqual(names, ["agent", "tool.get_user_invoices", "total"])
+        self.assertIn("tool.get_user_invoices;dur=250.0", trace.server_timing())
+        self.assertEqual(metrics.counter("tokens_total", agent="trace-test", type="input"), tokens + 100)
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_talk_view_sets_server_timing_and_exports_metrics(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        client = APIClient()
+        response = client.post("/api/", {"message": "I want to pay", "session_id": session_id}, format="json")
+        self.assertEqual(response.status_code, 200)
+        stages = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        self.assertIn("agent", stages)
+        self.assertIn("agent.session", stages)
+        self.assertEqual(stages[-1], "total")
+
+        response = client.get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertIn('agent_request_duration_seconds_count{view="talk"}', text)
+        self.assertIn('agent_stage_duration_seconds_bucket{stage="agent",le="+Inf"}', text)
+
+
+class ScriptedFlowTests(SimpleTestCase):
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub", "STUB_MODEL_SCRIPT": "flows", "STUB_MALFORMED_JSX": "1"})
+    def test_make_payment_flow_pays_the_invoice_through_the_json_fallback(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        phone = f"+1555{uuid.uuid4().int % 10**7:07d}"
+        tools.backend.add_subscriber(phone)
+        json_misses = agent_pool.stats()["json"]["misses"]
+        client = APIClient()
+        for message in flow_messages("make_payment", phone):
+            response = client.post("/api/", {"message": message, "session_id": session_id}, format="json")
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["message"]["children"][0]["type"], "Text")
+        self.assertIn("invoice INV-2024-0342 is paid", response.data["message"]["children"][0]["children"])
+        self.assertGreater(agent_pool.stats()["json"]["misses"], json_misses)
+
+        runs = storage.read(session_id).memory["runs"]
+        tool_names = [message["tool_name"] for message in runs[-1]["response"]["messages"] if message["role"] == "tool" and not message.get("from_history")]
+        self.assertEqual(tool_names, ["add_card", "make_payment"])
+        self.assertEqual(tools.backend.get_invoices(phone), [])
+
+
+class SinglePassTests(SimpleTestCase):
+    def test_component_tree_drops_empty_props_and_children(self):
+        screen = SinglePassScreen.model_validate(
+            {
+                "text": "Done. FINISHED_PROCESS",
+                "screen": {"type": "View", "props": {}, "children": [{"type": "Text", "children": "Done."}, {"type": "Button", "props": {"title": "OK", "onPress": "handleSubmit"}}]},
+            }
+        )
+        self.assertEqual(
+            screen.screen.as_tree(),
+            {"type": "View", "children": [{"type": "Text", "children": "Done."}, {"type": "Button", "props": {"title": "OK", "onPress": "handleSubmit"}}]},
+        )
+        with self.assertRaises(ValueError):
+            Component.model_validate({"type": "ScrollView"})
+
+        # Finished either way: as the run's model, or as the dict it is stored as
+        for content in (screen, screen.model_dump()):
+            agent = SimpleNamespace(memory=SimpleNamespace(runs=[SimpleNamespace(response=RunResponse(content=content))]))
+            self.assertTrue(finished_process(agent))
+
+    def test_single_pass_screens_are_validated(self):
+        screen = SinglePassScreen.model_validate(
+            {
+                "text": "Hi",
+                "screen": {"type": "View", "children": [{"type": "Text", "children": "Hi"}, {"type": "Button", "props": {"onPress": "handleSubmit"}}]},
+            }
+        )
+        with self.assertLogs("agno2.descriptors", "WARNING") as logs:
+            self.assertEqual(render_screen(screen), {"type": "View", "children": [{"type": "Text", "children": "Hi"}]})
+        self.assertIn("dropped Button without title", logs.output[0])
+
+        screen.screen = Component.model_validate({"type": "Button", "props": {"onPress": "handleSubmit"}})
+        with self.assertLogs("agno2.descriptors", "WARNING"):
+            self.assertIsNone(render_screen(screen))
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub", "AGENT_SCREENS": "single"})
+    def test_single_pass_screens_skip_the_jsx_agent(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        jsx_misses = agent_pool.stats()["jsx"]["misses"]
+        response = APIClient().post("/api/", {"message": "I want to pay", "session_id": session_id}, format="json")
+        self.assertEqual(response.status_code, 200)
+        children = response.data["message"]["children"]
+        self.assertEqual(children[0], {"type": "Text", "children": "You said: I want to pay"})
+        self.assertEqual(children[1]["props"]["name"], "message")
+        self.assertEqual(agent_pool.stats()["jsx"]["misses"], jsx_misses)
+        self.assertNotIn("jsx", response["Server-Timing"])
+
+
+class ComponentTreeTests(SimpleTestCase):
+    def test_common_defects_are_repaired_locally(self):
+        tree = {"type": "View", "children": [{"type": "Text", "children": "Pay"}, {"type": "Button", "props": {"title": "Pay", "onPress": "handleSubmit"}}]}
+        for text in [
+            '```json\n{"type": "View", "children": [{"type": "Text", "children": "Pay"}, {"type": "Button", "props": {"title": "Pay", "onPress": "handleSubmit",},},]}\n```',
+            'Here it is: {"type": "View", "children": [{"type": "Text", "children": "Pay"}, {"type": "Button", "props": {"title": "Pay", "onPress": "handleSubmit"}}',
+            '{"type": "View", "children": [{"type": "Text", "children": "Pay"}, {"type": "Button", "props": {"title": "Pay", "onPress": "handleSubmit"}}, {"ty',
+        ]:
+            problems = []
+            self.assertEqual(parse_tree(text, problems), tree)
+            self.assertEqual(problems, ["repaired malformed JSON"])
+        self.assertEqual(repair_json('{"a": "unterminated'), '{"a": "unterminated"}')
+
+    def test_invalid_subtrees_are_dropped_and_props_cleaned(self):
+        problems = []
+        tree = parse_tree(
+            '{"type": "View", "children": [{"type": "Modal"}, {"type": "TextInput", "props": {"placeholder": "Phone"}}, '
+            '{"type": "Text", "props": {"onPress": "x"}, "children": ["Total: ", 12]}]}',
+            problems,
+        )
+        self.assertEqual(tree, {"type": "View", "children": [{"type": "Text", "children": "Total: 12"}]})
+        self.assertEqual(len(problems), 3)
+        with self.assertRaises(ComponentError):
+            parse_tree('{"type": "Modal", "children": []}')
+        with self.assertRaises(ComponentError):
+            parse_tree("Sorry, I cannot do that")
+
+    def test_valid_children_are_emitted_while_streaming(self):
+        source = (
+            '{"type": "View", "props": {"style": {"padding": 16}}, "children": [{"type": "Text", "children": "a [ {b"}, '
+            '{"type": "Bogus"}, {"type": "View", "children": [{"type": "Text", "children": "c"}]}, '
+            '{"type": "Button", "props": {"title": "Send", "onPress": "handleSubmit"}'
+        )
+        parser = TreeStreamParser()
+        emitted = []
+        for start in range(0, len(source), 5):
+            emitted.extend(parser.feed(source[start : start + 5]))
+        self.assertEqual([index for index, _ in emitted], [0, 2])
+        tree = parser.close()
+        self.assertEqual([node for _, node in emitted], tree["children"][:2])
+        self.assertEqual(tree["children"][2], {"type": "Button", "props": {"title": "Send", "onPress": "handleSubmit"}})
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub", "STUB_MODEL_SCRIPT": "flows", "STUB_MALFORMED_JSX": "1"})
+    def test_stream_falls_back_to_the_streamed_json_agent(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        session_id = f"test-{uuid.uuid4()}"
+        self.addCleanup(storage.delete_session, session_id)
+        response = APIClient().post("/api/stream/", {"message": "I want to pay my invoice", "session_id": session_id}, format="json")
+        body = b"".join(response.streaming_content).decode()
+        events = [
+            (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+            for block in body.strip().split("\n\n")
+        ]
+        self.assertIn(("token", "json"), [(name, data.get("stage")) for name, data in events])
+        tree = next(data["message"] for name, data in events if name == "tree")
+        self.assertEqual(tree, {"type": "View", "children": [{"type": "Text", "children": "Sure. What is the phone number on your account?"}]})
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_unrepairable_trees_show_the_error_screen(self):
+        def broken_renderers(messages):
+            system = messages[0].get_content_string()
+            if "React Native JSX" in system:
+                return "<View><Text>"
+            if "converts JSX to a JSON object" in system:
+                return "no tree here"
+            return default_script(messages)
+
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        failures = metrics.counter("render_failures_total")
+        with mock.patch("agno2.models.default_script", broken_renderers):
+            for path in ("/api/", "/api/stream/"):
+                session_id = f"test-{uuid.uuid4()}"
+                self.addCleanup(storage.delete_session, session_id)
+                response = APIClient().post(path, {"message": f"hi {uuid.uuid4()}", "session_id": session_id}, format="json")
+                self.assertEqual(response.status_code, 200)
+                if path == "/api/":
+                    tree = response.data["message"]
+                else:
+                    body = b"".join(response.streaming_content).decode()
+                    self.assertNotIn("event: error", body)
+                    tree = json.loads(body.split("event: tree\ndata: ")[1].split("\n")[0])["message"]
+                self.assertEqual(tree, get_screen("error"))
+        self.assertEqual(metrics.counter("render_failures_total"), failures + 2)
+
+
+class PayloadTests(SimpleTestCase):
+    def test_patch_round_trips_between_fixture_screens(self):
+        trees = [compile_jsx(source) for source in load_jsx_fixtures().values()]
+        for old, new in zip(trees, trees[1:] + trees[:1]):
+            self.assertEqual(apply_patch(old, diff_tree(old, new)), new)
+        self.assertEqual(diff_tree(trees[0], trees[0]), [])
+
+    def test_styles_are_interned_once(self):
+        style = {"fontSize": 16, "marginBottom": 8}
+        tree = {"type": "View", "children": [{"type": "Text", "props": {"style": dict(style)}, "children": str(i)} for i in range(3)]}
+        (interned,), styles = intern_styles([tree])
+        self.assertEqual(styles, [style])
+        self.assertEqual(interned["children"][2]["props"], {"$style": 0})
+        self.assertEqual(decode_tree({"format": "interned", "styles": styles, "message": interned}), tree)
+
+    def test_patch_is_only_sent_against_a_known_base(self):
+        session_id = f"test-{uuid.uuid4()}"
+        rows = [{"type": "Text", "props": {"style": {"fontSize": 16}}, "children": f"Invoice {i}"} for i in range(20)]
+        first = {"type": "View", "children": rows + [{"type": "Button", "props": {"title": "Pay", "onPress": "handleSubmit"}}]}
+        second = {"type": "View", "children": rows + [{"type": "Button", "props": {"title": "Pay now", "onPress": "handleSubmit"}}]}
+
+        self.assertEqual(encode_tree(first, session_id), {"message": first})
+        sent = encode_tree(first, session_id, "interned")
+        self.assertEqual(sent["digest"], tree_digest(first))
+        unknown = encode_tree(second, session_id, "patch", base="0" * 16)
+        self.assertEqual(unknown["format"], "interned")
+
+        patch = encode_tree(second, session_id, "patch", base=sent["digest"])
+        self.assertEqual(patch["format"], "patch")
+        self.assertEqual(patch["patch"], [{"op": "replace", "path": "/children/20/props/title", "value": "Pay now"}])
+        self.assertEqual(decode_tree(patch, first), second)
+        self.assertEqual(patch["digest"], tree_digest(second))
+
+    @mock.patch.dict(os.environ, {"AGENT_MODEL": "stub"})
+    def test_talk_view_sends_patches_when_asked(self):
+        agent_pool.clear()
+        self.addCleanup(agent_pool.clear)
+        client = APIClient()
+        welcome = client.post("/api/", {"message": "NEW", "session_id": "NEW", "format": "interned"}, format="json").data
+        self.assertEqual(welcome["format"], "interned")
+        session_id = welcome["session_id"]
+        self.addCleanup(storage.delete_session, session_id)
+        screen = decode_tree(welcome)
+
+        for message in ["I want to pay", "I want to pay now"]:
+            data = client.post("/api/", {"message": message, "session_id": session_id, "format": "patch", "base": tree_digest(screen)}, format="json").data
+            screen = decode_tree(data, screen)
+            self.assertEqual(data["digest"], tree_digest(screen))
+        self.assertEqual(data["format"], "patch")
+        self.assertEqual(screen["children"][0], {"type": "Text", "children": "You said: I want to pay now"})
+        self.assertEqual(client.post("/api/", {"message": "hi", "session_id": session_id, "format": "binary"}, format="json").status_code, 400)
+
+
+def bedrock_body(data):
+    raw = json.dumps(data).encode()
+    return StreamingBody(io.BytesIO(raw), len(raw))
+
+
+class BedrockClientTests(SimpleTestCase):
+    def setUp(self):
+        self.runtime = boto3.client(
+            "bedrock-runtime", region_name="us-east-1", aws_access_key_id="test", aws_secret_access_key="test"
+        )
+        self.stubber = Stubber(self.runtime)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.model_id = f"test-{uuid.uuid4()}"
+        self.client = BedrockClient(model_id=self.model_id, client=self.runtime, max_attempts=3)
+        sleep = mock.patch("agno2.lab.time.sleep")
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def expect(self, prompt):
+        return {
+            "body": json.dumps({"prompt": prompt, "temperature": 0.2, "top_p": 0.9}),
+            "modelId": self.model_id,
+            "accept": "application/json",
+            "contentType": "application/json",
+        }
+
+    def test_infer_records_latency_and_tokens(self):
+        self.stubber.add_response(
+            "invoke_model",
+            {"body": bedrock_body({"generation": "Hello", "prompt_token_count": 12, "generation_token_count": 2}), "contentType": "application/json"},
+            self.expect("Say hello"),
+        )
+        with self.assertNoLogs("agno2.lab", level="INFO"):
+            self.assertEqual(self.client.infer("Say hello"), "Hello")
+        self.stubber.assert_no_pending_responses()
+        self.assertEqual(metrics.histogram_count("bedrock_call_duration_seconds", model=self.model_id), 1)
+        self.assertEqual(metrics.counter("bedrock_tokens_total", model=self.model_id, type="input"), 12)
+        self.assertEqual(metrics.counter("bedrock_tokens_total", model=self.model_id, type="output"), 2)
+
+    def test_throttling_is_retried_with_backoff(self):
+        self.stubber.add_client_error("invoke_model", "ThrottlingException", http_status_code=429)
+        self.stubber.add_client_error("invoke_model", "ServiceUnavailableException", http_status_code=503)
+        self.stubber.add_response("invoke_model", {"body": bedrock_body({"generation": "ok"}), "contentType": "application/json"})
+        self.assertEqual(self.client.infer("hi"), "ok")
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertLessEqual(self.sleep.call_args_list[1].args[0], 0.5)
+        self.assertEqual(metrics.counter("bedrock_retries_total", model=self.model_id, code="ThrottlingException"), 1)
+
+    def test_errors_are_raised(self):
+        self.stubber.add_client_error("invoke_model", "ValidationException", http_status_code=400)
+        with self.assertRaises(ClientError):
+            self.client.infer("hi")
+        self.sleep.assert_not_called()
+        for _ in range(3):
+            self.stubber.add_client_error("invoke_model", "ThrottlingException", http_status_code=429)
+        with self.assertRaises(ClientError):
+            self.client.infer("hi")
+        self.assertEqual(metrics.counter("bedrock_errors_total", model=self.model_id, code="ThrottlingException"), 1)
+
+    def test_infer_many_keeps_the_prompts_order(self):
+        runtime = mock.Mock()
+
+        def invoke_model(body, **kwargs):
+            return {"body": bedrock_body({"generation": json.loads(body)["prompt"].upper()})}
+
+        runtime.invoke_model.side_effect = invoke_model
+        client = BedrockClient(model_id=self.model_id, client=runtime)
+        prompts = [f"prompt {i}" for i in range(20)]
+        self.assertEqual(client.infer_many(prompts), [prompt.upper() for prompt in prompts])
+        self.assertEqual(client.inference_counter, 20)
+
+        runtime.invoke_model.side_effect = [ClientError({"Error": {"Code": "ValidationException"}}, "InvokeModel")]
+        results = client.infer_many(["bad"], return_exceptions=True)
+        self.assertIsInstance(results[0], ClientError)
+
+    def test_stream_yields_the_generation(self):
+        events = [
+            {"chunk": {"bytes": json.dumps({"generation": "Hel", "prompt_token_count": 7}).encode()}},
+            {"chunk": {"bytes": json.dumps({"generation": "lo", "generation_token_count": 2}).encode()}},
+            {"chunk": {"bytes": json.dumps({"generation": "", "amazon-bedrock-invocationMetrics": {"inputTokenCount": 7, "outputTokenCount": 2}}).encode()}},
+        ]
+        # The Stubber cannot build event streams; the parsed events are what the client iterates
+        with mock.patch.object(self.runtime, "invoke_model_with_response_stream", return_value={"body": events}) as invoke:
+            self.assertEqual("".join(self.client.infer_stream("Say hello")), "Hello")
+        invoke.assert_called_once_with(**self.expect("Say hello"))
+        self.assertEqual(metrics.counter("bedrock_tokens_total", model=self.model_id, type="output"), 2)
+        self.assertEqual(metrics.histogram_count("bedrock_first_token_seconds", model=self.model_id), 1)
+
+        with mock.patch.object(self.runtime, "invoke_model_with_response_stream", return_value={"body": [{"modelStreamErrorException": {"message": "boom"}}]}):
+            with self.assertRaises(RuntimeError):
+                list(self.client.infer_stream("hi"))
+
+
+class ModelRoutingTests(SimpleTestCase):
+    def stub(self, latency=0.0, script=None):
+        # Latency windows are shared by model id
+        return StubModel(id=f"stub-{uuid.uuid4()}", latency=latency, **({"script": script} if script else {}))
+
+    def jsx_messages(self):
+        return [Message(role="system", content="Convert text to React Native JSX"), Message(role="user", content="Pay")]
+
+    def test_slow_model_is_hedged_within_the_budget(self):
+        slow, fast = self.stub(latency=1.0), self.stub()
+        model = RoutedModel(stage="jsx", models=[slow, fast], budget=0.05)
+        messages = self.jsx_messages()
+        response = model.response(messages)
+        self.assertIn("<Text>Pay</Text>", response.content)
+        self.assertEqual(len(messages), 3)
+        self.assertEqual(metrics.counter("model_responses_total", stage="jsx", provider="Stub", model=fast.id), 1)
+        self.assertEqual(metrics.histogram_count("provider_call_duration_seconds", stage="jsx", provider="Stub", model=fast.id), 1)
+
+    def test_provider_calls_are_left_to_the_routed_models(self):
+        model = RoutedModel(stage="jsx", models=[self.stub()])
+        with self.assertRaisesRegex(TypeError, "RoutedModel.invoke is not supported"):
+            model.invoke(self.jsx_messages())
+        with self.assertRaisesRegex(TypeError, "parse_provider_response_delta"):
+            model.parse_provider_response_delta({})
+
+    def test_models_over_budget_are_tried_last(self):
+        primary, secondary = self.stub(), self.stub()
+        model = RoutedModel(stage="json", models=[primary, secondary], budget=0.5)
+        self.assertEqual(model.ordered(), [primary, secondary])
+        for _ in range(20):
+            latency_window("json", primary).add(1.0)
+        self.assertEqual(model.ordered(), [secondary, primary])
+
+    def test_failover_before_any_tool_call(self):
+        def broken(messages):
+            raise RuntimeError("provider unavailable")
+
+        def lookup(phone_number: str) -> str:
+            """Look the subscriber up."""
+            return "{}"
+
+        failing, working = self.stub(script=broken), self.stub()
+        agent = Agent(model=RoutedModel(stage="reasoning", models=[failing, working]), tools=[lookup], telemetry=False)
+        self.assertEqual(agent.run("hello").content, "You said: hello")
+        self.assertEqual(
+            metrics.counter("model_failovers_total", stage="reasoning", provider="Stub", model=failing.id, error="RuntimeError"), 1
+        )
+
+    def test_pooled_turns_start_with_an_empty_tool_call_stack(self):
+        def lookup(phone_number: str) -> str:
+            """Look the subscriber up."""
+            return "{}"
+
+        def script(messages):
+            if messages[-1].role == "tool":
+                return "done"
+            call = {"id": "call_1", "type": "function", "function": {"name": "lookup", "arguments": '{"phone_number": "+1555"}'}}
+            return {"content": "", "tool_calls": [call]}
+
+        inner = self.stub(script=script)
+
+        def start_routed_agent():
+            return Agent(model=RoutedModel(stage="reasoning", models=[inner]), tools=[lookup], telemetry=False)
+
+        pool = AgentPool()
+        pool.register("main", start_routed_agent)
+        for turn in ("first", "second"):
+            with pool.checkout("main") as agent:
+                self.assertEqual(agent.run(turn).content, "done")
+            self.assertEqual(len(inner._function_call_stack), 1)
+
+    @mock.patch.dict(
+        os.environ,
+        {"MODEL_JSX": "openai:gpt-4o-mini, bedrock:anthropic.claude-3-haiku-20240307-v1:0", "MODEL_JSX_BUDGET": "1.5"},
+    )
+    def test_chat_model_reads_the_stage_models(self):
+        os.environ.pop("AGENT_MODEL", None)
+        model = chat_model("jsx")
+        self.assertEqual([(m.provider, m.id) for m in model.models], [("OpenAI", "gpt-4o-mini"), ("AwsBedrock", "anthropic.claude-3-haiku-20240307-v1:0")])
+        # agno does not retry, so its Bedrock client does; BedrockClient keeps retrying itself
+        self.assertEqual(model.models[1].client.meta.config.retries["mode"], "standard")
+        self.assertEqual(BedrockClient().bedrock_runtime.meta.config.retries["total_max_attempts"], 1)
+        self.assertEqual(model.budget, 1.5)
+        self.assertEqual(chat_model("reasoning").budget, 8.0)
+        with self.assertRaises(ValueError):
+            chat_model("render")
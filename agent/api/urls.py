@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import TalkAgentView
+from .views import TalkAgentView, TalkAgentStreamView, AsyncTalkAgentView, metrics_view
 
 urlpatterns = [
     path('', TalkAgentView.as_view(), name='talk-agent'),
+    path('stream/', TalkAgentStreamView.as_view(), name='talk-agent-stream'),
+    path('async/', AsyncTalkAgentView.as_view(), name='talk-agent-async'),
+    path('metrics/', metrics_view, name='metrics'),
 ] 
\ No newline at end of file
@@ -1,12 +1,239 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from agno2.agent import start_agent
-from agno2.interface import start_agent_jsx, start_agent_json
+from agno2.agent import run_agent, arun_agent
+from agno2.pool import agent_pool
+from agno2.cache import render_cache
+from agno2.descriptors import single_pass_screens, structured_screens, render_screen, screen_text
+from agno.run.response import RunEvent
+from agno2.jsx import compile_jsx, JSXSyntaxError, JSXStreamParser
+from agno2.components import ComponentError, TreeStreamParser, parse_tree
+from agno2.screens import get_screen
+from agno2.metrics import Trace, metrics, record_run, request_trace, span
+from agno2.payloads import encode_tree, payload_size
 from .serializers import MessageInputSerializer
+import asyncio
+import contextlib
+import contextvars
 import uuid
-from textwrap import dedent
 import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Static screen shown when the JSON agent's tree cannot be repaired
+ERROR_SCREEN = 'error'
+
+
+def error_screen(e):
+    logger.warning("The JSON agent's tree cannot be repaired, showing the error screen: %s", e)
+    metrics.inc('render_failures_total')
+    return get_screen(ERROR_SCREEN)
+
+
+def cacheable(tree):
+    """Whether a rendered tree may go in the render cache; the error screen never does, the next render may succeed."""
+    return tree is not get_screen(ERROR_SCREEN)
+
+
+def json_tree(content):
+    """
+    Parse the JSON agent's output into a valid component tree, repairing it locally if needed.
+
+    Output that cannot be repaired is replaced by the error screen.
+    """
+    problems = []
+    try:
+        tree = parse_tree(content, problems)
+    except ComponentError as e:
+        return error_screen(e)
+    if problems:
+        logger.warning("Repaired the JSON agent's tree: %s", '; '.join(problems))
+    return tree
+
+
+def stream_json_tree(jsx_text, trace):
+    """
+    Streamed counterpart of the JSON agent fallback, for :func:`stream_talk`.
+
+    Yields the agent's tokens and each top-level component as soon as it is
+    complete and valid, and returns the repaired tree, or the error screen.
+    """
+    parser = TreeStreamParser()
+    with span('json', trace), agent_pool.checkout('json') as agent_json:
+        for chunk in agent_json.run(jsx_text, stream=True):
+            if not chunk.content:
+                continue
+            yield sse_event('token', {'stage': 'json', 'text': chunk.content})
+            for index, node in parser.feed(chunk.content):
+                yield sse_event('partial', {'index': index, 'node': node})
+        record_run('json', agent_json.run_response, trace)
+    try:
+        tree = parser.close()
+    except ComponentError as e:
+        return error_screen(e)
+    if parser.problems:
+        logger.warning("Repaired the JSON agent's tree: %s", '; '.join(parser.problems))
+    return tree
+
+
+def jsx_to_json(jsx_text):
+    """
+    Convert the JSX produced by the JSX agent into the component tree.
+
+    The local compiler handles the JSX our agent emits; the JSON agent is only
+    used as a fallback when the compiler rejects the input.
+    """
+    try:
+        return compile_jsx(jsx_text)
+    except JSXSyntaxError as e:
+        logger.warning('JSX compiler failed, falling back to the JSON agent: %s', e)
+        with span('json'), agent_pool.checkout('json') as agent_json:
+            response_json = agent_json.run(jsx_text)
+        record_run('json', response_json)
+        return json_tree(response_json.content)
+
+
+async def ajsx_to_json(jsx_text):
+    """Async counterpart of jsx_to_json, using arun for the JSON agent fallback."""
+    try:
+        return compile_jsx(jsx_text)
+    except JSXSyntaxError as e:
+        logger.warning('JSX compiler failed, falling back to the JSON agent: %s', e)
+        with span('json'), agent_pool.checkout('json') as agent_json:
+            response_json = await agent_json.arun(jsx_text)
+        record_run('json', response_json)
+        return json_tree(response_json.content)
+
+
+def agent_name():
+    """Pool name of the process agent, depending on the screen mode."""
+    if single_pass_screens():
+        return 'agent_single'
+    return 'agent_structured' if structured_screens() else 'agent'
+
+
+def tree_fields(tree, session_id, options):
+    """Response fields carrying the screen in the format the client opted into, see encode_tree."""
+    fields = encode_tree(tree, session_id, options.get('format', 'tree'), options.get('base') or None)
+    metrics.inc('payload_bytes_total', payload_size(fields), format=fields.get('format', 'tree'))
+    return {**fields, 'session_id': session_id}
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def astream(events):
+    """
+    Iterate a blocking event generator from async code, one step at a time on a worker thread.
+
+    Under ASGI, Django collects a sync iterator completely before sending
+    it; an async iterator lets every Server-Sent Event out as it is yielded.
+    Every step runs in the same context, so the pipeline's context variables
+    are reset where they were set.
+    """
+    context = contextvars.copy_context()
+    done = object()
+    try:
+        while True:
+            event = await asyncio.to_thread(context.run, next, events, done)
+            if event is done:
+                return
+            yield event
+    finally:
+        # The client went away: finish the pipeline so its agents go back to the pool
+        with contextlib.suppress(RuntimeError, ValueError):
+            context.run(events.close)
+
+
+def stream_talk(message_text, session_id, options=None):
+    """
+    Run the agent pipeline and yield its progress as Server-Sent Events.
+
+    ``options`` are the request's ``format`` and ``base``, which apply to the
+    ``tree`` event.
+
+    Events, in order: ``session``, then ``tool_call`` and ``token`` while the
+    agent reasons, ``token`` and ``partial`` (each completed top-level
+    component) while the UI is rendered, and finally ``tree``, ``timing``
+    (the stage durations in milliseconds) and ``done``.
+    """
+    options = options or {}
+    if session_id == 'NEW':
+        session_id = str(uuid.uuid4())
+        yield sse_event('session', {'session_id': session_id})
+        yield sse_event('tree', tree_fields(get_screen('welcome'), session_id, options))
+        yield sse_event('done', {})
+        return
+
+    yield sse_event('session', {'session_id': session_id})
+    # The generator may be resumed in another context, so the trace is passed explicitly
+    trace = Trace()
+    started = time.perf_counter()
+    name = agent_name()
+    try:
+        with span('agent', trace), agent_pool.checkout(name, session_id) as agent:
+            if agent.response_model is None:
+                for chunk in run_agent(agent, message_text, stream=True, stream_intermediate_steps=True):
+                    if chunk.event == RunEvent.tool_call_started.value and chunk.tools:
+                        tool_call = chunk.tools[-1]
+                        yield sse_event('tool_call', {
+                            'tool_name': tool_call.get('tool_name'),
+                            'tool_args': tool_call.get('tool_args'),
+                        })
+                    elif chunk.event == RunEvent.run_response.value and chunk.content:
+                        yield sse_event('token', {'stage': 'agent', 'text': chunk.content})
+            else:
+                # Screen descriptors are only usable once complete
+                run_agent(agent, message_text)
+            agent_content = agent.run_response.content
+            record_run(name, agent.run_response, trace)
+
+        with span('descriptor', trace):
+            component_tree = render_screen(agent_content)
+        if component_tree is None:
+            agent_text = screen_text(agent_content)
+            with agent_pool.checkout('jsx') as agent_jsx:
+                cache_key = render_cache.key_for(agent_jsx, agent_text)
+                component_tree = render_cache.get(cache_key)
+                if component_tree is None:
+                    parser = JSXStreamParser()
+                    with span('jsx', trace):
+                        for chunk in agent_jsx.run(agent_text, stream=True):
+                            if not chunk.content:
+                                continue
+                            yield sse_event('token', {'stage': 'jsx', 'text': chunk.content})
+                            for index, node in parser.feed(chunk.content):
+                                yield sse_event('partial', {'index': index, 'node': node})
+                    record_run('jsx', agent_jsx.run_response, trace)
+
+            if component_tree is None:
+                try:
+                    with span('compile', trace):
+                        component_tree = compile_jsx(parser.buffer)
+                except JSXSyntaxError as e:
+                    logger.warning('JSX compiler failed, falling back to the JSON agent: %s', e)
+                    component_tree = yield from stream_json_tree(parser.buffer, trace)
+                if cacheable(component_tree):
+                    render_cache.set(cache_key, component_tree)
+        yield sse_event('tree', tree_fields(component_tree, session_id, options))
+    except Exception as e:
+        logger.exception('Error while streaming')
+        yield sse_event('error', {'detail': str(e)})
+    elapsed = time.perf_counter() - started
+    trace.add('total', elapsed)
+    metrics.observe('request_duration_seconds', elapsed, view='stream')
+    yield sse_event('timing', {name: round(seconds * 1000, 1) for name, seconds in trace.totals().items()})
+    yield sse_event('done', {})
+
 
 class TalkAgentView(APIView):
     """
@@ -21,47 +248,67 @@ class TalkAgentView(APIView):
 
             if session_id == 'NEW':
                 session_id = str(uuid.uuid4())
-                jsx_text = dedent("""
-                   <View>
-                        <Text>What do you want do to today?</Text>
-                        <TextInput 
-                            name="message"
-                            placeholder="Write here what you want" 
-                            onChangeText={storeData}
-                        />
-                        <Button title="Let's go!" onPress={handleSubmit} />
-                    </View>
-                """)
-                agent_json = start_agent_json()
-                response_json = agent_json.run(jsx_text)
-                print("*******  JSON")
-                print(response_json.get_content_as_string())
-
-                return Response({'message': json.loads(response_json.content), 'session_id': session_id}, status=status.HTTP_200_OK)
-
-            agent = start_agent(session_id)
-
-            # response = agent.print_response(message_text)
-            response = agent.run(message_text)
-            print("*******  AGENT")
-            print(response.get_content_as_string())
-
-            agent_jsx = start_agent_jsx()
-            response_jsx = agent_jsx.run(response.content)
-            print("*******  JSX")
-            print(response_jsx.get_content_as_string())
-
-            agent_json = start_agent_json()
-            response_json = agent_json.run(response_jsx.content)
-            print("*******  JSON")
-            print(response_json.get_content_as_string())
-            
-            
-            return Response({'message': json.loads(response_json.content), 'session_id': session_id}, status=status.HTTP_200_OK)
+
+                return Response(tree_fields(get_screen('welcome'), session_id, serializer.validated_data), status=status.HTTP_200_OK)
+
+            with request_trace('talk') as trace:
+                name = agent_name()
+                with span('agent'), agent_pool.checkout(name, session_id) as agent:
+                    # response = agent.print_response(message_text)
+                    response = run_agent(agent, message_text)
+                record_run(name, response)
+                logger.debug('Agent answered: %s', response.get_content_as_string())
+
+                # Known process steps come back as a screen descriptor and are rendered locally
+                with span('descriptor'):
+                    component_tree = render_screen(response.content)
+                if component_tree is None:
+                    agent_text = screen_text(response.content)
+                    # Same assistant text renders the same screen, skip both LLM calls on a hit
+                    with agent_pool.checkout('jsx') as agent_jsx:
+                        cache_key = render_cache.key_for(agent_jsx, agent_text)
+                        component_tree = render_cache.get(cache_key)
+                        if component_tree is None:
+                            with span('jsx'):
+                                response_jsx = agent_jsx.run(agent_text)
+                            record_run('jsx', response_jsx)
+                    if component_tree is None:
+                        logger.debug('JSX agent answered: %s', response_jsx.get_content_as_string())
+
+                        with span('compile'):
+                            component_tree = jsx_to_json(response_jsx.content)
+                        if cacheable(component_tree):
+                            render_cache.set(cache_key, component_tree)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Component tree: %s', json.dumps(component_tree))
+
+            response = Response(tree_fields(component_tree, session_id, serializer.validated_data), status=status.HTTP_200_OK)
+            response['Server-Timing'] = trace.server_timing()
+            return response
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TalkAgentStreamView(APIView):
+    """
+    API endpoint for talking to an agent, streamed as Server-Sent Events
+    """
+    def post(self, request, format=None):
+        serializer = MessageInputSerializer(data=request.data)
+
+        if serializer.is_valid():
+            events = stream_talk(serializer.validated_data['message'], serializer.validated_data['session_id'], serializer.validated_data)
+            if isinstance(request._request, ASGIRequest):
+                events = astream(events)
+            response = StreamingHttpResponse(events, content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # Stop reverse proxies from buffering the stream
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 
 # {
 #     "message": " I want to pay my invoices",
@@ -78,4 +325,64 @@ class TalkAgentView(APIView):
 # {
 #     "message": " +123456543",
 #     "session_id": "session_2"
-# }
\ No newline at end of file
+# }
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncTalkAgentView(View):
+    """
+    Async API endpoint for talking to an agent
+
+    Served without tying up a worker thread while the models run when the
+    project is deployed under ASGI (agent_project.asgi).
+    """
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MessageInputSerializer(data=data)
+
+        if serializer.is_valid():
+            message_text = serializer.validated_data['message']
+            session_id = serializer.validated_data['session_id']
+
+            if session_id == 'NEW':
+                session_id = str(uuid.uuid4())
+
+                return JsonResponse(tree_fields(get_screen('welcome'), session_id, serializer.validated_data), status=status.HTTP_200_OK)
+
+            with request_trace('async') as trace:
+                name = agent_name()
+                with span('agent'), agent_pool.checkout(name, session_id) as agent:
+                    response = await arun_agent(agent, message_text)
+                record_run(name, response)
+
+                with span('descriptor'):
+                    component_tree = render_screen(response.content)
+                if component_tree is None:
+                    agent_text = screen_text(response.content)
+                    with agent_pool.checkout('jsx') as agent_jsx:
+                        cache_key = render_cache.key_for(agent_jsx, agent_text)
+                        component_tree = await render_cache.aget(cache_key)
+                        if component_tree is None:
+                            with span('jsx'):
+                                response_jsx = await agent_jsx.arun(agent_text)
+                            record_run('jsx', response_jsx)
+
+                    if component_tree is None:
+                        with span('compile'):
+                            component_tree = await ajsx_to_json(response_jsx.content)
+                        if cacheable(component_tree):
+                            await render_cache.aset(cache_key, component_tree)
+
+            response = JsonResponse(tree_fields(component_tree, session_id, serializer.validated_data), status=status.HTTP_200_OK)
+            response['Server-Timing'] = trace.server_timing()
+            return response
+
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: stage, tool and model timings, tokens, and the pool and cache stats."""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
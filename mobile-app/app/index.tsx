@@ -8,6 +8,7 @@ import { ThemedView } from '@/components/ThemedView';
 import { TextInput } from 'react-native';
 
 import DynamicComponentRenderer from '@/components/DynamicComponentRenderer';
+import { decodeScreen } from '@/utils/uiPayload';
 
 interface ComponentData {
   // Add any specific properties your dynamic components expect
@@ -17,6 +18,9 @@ interface ComponentData {
 
 let formData: Record<string, string> = {}
 let sessionId = ''
+// The last screen and its digest, which the server diffs the next screen against
+let lastScreen: any = null
+let lastDigest = ''
 
 export default function HomeScreen() {
 
@@ -33,7 +37,8 @@ export default function HomeScreen() {
         },
         body: JSON.stringify({
           message: 'NEW',
-          session_id: 'NEW'
+          session_id: 'NEW',
+          format: 'interned'
         })
       });
       const data = await response.json();
@@ -41,12 +46,14 @@ export default function HomeScreen() {
       // Reset state before setting new UI data
       formData = {};
       sessionId = data.session_id;
+      lastScreen = decodeScreen(data, null, '');
+      lastDigest = data.digest ?? '';
       
       // Use a slight delay to ensure proper re-rendering
       // This forces React to see the component as "new" even if structure is similar
       setUiData('');
       setTimeout(() => {
-        setUiData(data.message);
+        setUiData(lastScreen);
       }, 10);
     } catch (error) {
       console.error('Error fetching UI data:', error);
@@ -73,19 +80,23 @@ export default function HomeScreen() {
         },
         body: JSON.stringify({
             session_id: sessionId,
-            message: JSON.stringify(formData)
+            message: JSON.stringify(formData),
+            format: 'patch',
+            base: lastDigest
           })
       });
       const data = await response.json();
       
       // Reset form data
       formData = {};
+      lastScreen = decodeScreen(data, lastScreen, lastDigest);
+      lastDigest = data.digest ?? '';
       
       // Force re-render with empty state briefly to clean the component tree and 
       // ensure state is reset
       setUiData('');
       setTimeout(() => {
-        setUiData(data.message);
+        setUiData(lastScreen);
       }, 10);
     } catch (error) {
       console.error('Error submitting form:', error);
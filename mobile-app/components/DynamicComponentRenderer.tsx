@@ -32,9 +32,17 @@ const ComponentMap: ComponentMapType = {
   TouchableOpacity: TouchableOpacity,
 };
 
-// Helper function to handle actions
-const handleAction = (actionName: string, parentProps: Record<string, any>): (() => void) => {
+// Helper function to handle actions. A button with a name and a value (a picked
+// choice row) stores the value in the form before running the action
+const handleAction = (
+  actionName: string,
+  parentProps: Record<string, any>,
+  props: Record<string, any> = {}
+): (() => void) => {
   return () => {
+    if (props.name && props.value !== undefined && typeof parentProps.storeData === 'function') {
+      parentProps.storeData(props.name, String(props.value));
+    }
     if (typeof parentProps[actionName] === 'function') {
       parentProps[actionName]();
     } else {
@@ -66,7 +74,7 @@ const DynamicComponentRenderer: React.FC<DynamicComponentRendererProps> = ({ com
   
   // Handle special props like onPress
   if (props.onPress && typeof parentProps[props.onPress] === 'function') {
-    mergedProps.onPress = handleAction(props.onPress, parentProps);
+    mergedProps.onPress = handleAction(props.onPress, parentProps, props);
   }
   
   // // Add parentProps for StatefulTextInput
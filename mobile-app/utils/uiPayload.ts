@@ -0,0 +1,95 @@
+// Decoding of the compact screen payloads the agent API sends when a request
+// opts in with `format: 'interned'` or `format: 'patch'` (see agno2/payloads.py)
+
+export interface ComponentData {
+  type: string;
+  props?: Record<string, any>;
+  children?: ComponentData | ComponentData[] | string;
+}
+
+interface PatchOperation {
+  op: 'add' | 'remove' | 'replace';
+  path: string;
+  value?: any;
+}
+
+export interface ScreenPayload {
+  session_id: string;
+  format?: 'tree' | 'interned' | 'patch';
+  digest?: string;
+  base?: string;
+  styles?: Record<string, any>[];
+  message?: any;
+  patch?: PatchOperation[];
+}
+
+const STYLE_REF = '$style';
+
+// Put the shared style objects back in place of their `$style` indexes
+const expandStyles = (node: any, styles: Record<string, any>[]): any => {
+  if (Array.isArray(node)) {
+    return node.map((child) => expandStyles(child, styles));
+  }
+  if (!node || typeof node !== 'object') {
+    return node;
+  }
+  const expanded = { ...node };
+  if (expanded.props && STYLE_REF in expanded.props) {
+    const { [STYLE_REF]: ref, ...props } = expanded.props;
+    expanded.props = { ...props, style: styles[ref] };
+  }
+  if ('children' in expanded) {
+    expanded.children = expandStyles(expanded.children, styles);
+  }
+  return expanded;
+};
+
+const applyPatch = (tree: any, operations: PatchOperation[]): any => {
+  let result = JSON.parse(JSON.stringify(tree));
+  for (const operation of operations) {
+    if (operation.path === '') {
+      result = operation.value;
+      continue;
+    }
+    const keys = operation.path.split('/').slice(1).map((key) => key.replace(/~1/g, '/').replace(/~0/g, '~'));
+    let parent = result;
+    for (const key of keys.slice(0, -1)) {
+      parent = Array.isArray(parent) ? parent[Number(key)] : parent[key];
+    }
+    const last = keys[keys.length - 1];
+    if (Array.isArray(parent)) {
+      const index = Number(last);
+      if (operation.op === 'remove') {
+        parent.splice(index, 1);
+      } else if (operation.op === 'add') {
+        parent.splice(index, 0, operation.value);
+      } else {
+        parent[index] = operation.value;
+      }
+    } else if (operation.op === 'remove') {
+      delete parent[last];
+    } else {
+      parent[last] = operation.value;
+    }
+  }
+  return result;
+};
+
+// Rebuild the screen from a response, given the tree the previous response produced.
+// Throws when a patch is against another tree than `previous`.
+export const decodeScreen = (payload: ScreenPayload, previous: any, previousDigest: string): any => {
+  const styles = payload.styles ?? [];
+  if (payload.format === 'interned') {
+    return expandStyles(payload.message, styles);
+  }
+  if (payload.format === 'patch') {
+    if (payload.base !== previousDigest) {
+      throw new Error(`Patch against ${payload.base}, the screen is ${previousDigest}`);
+    }
+    const operations = (payload.patch ?? []).map((operation) =>
+      'value' in operation ? { ...operation, value: expandStyles(operation.value, styles) } : operation
+    );
+    return applyPatch(previous, operations);
+  }
+  return payload.message;
+};